@@ -0,0 +1,88 @@
+"""
+Compare latency and Gemini token usage of fused and fan-out call modes.
+
+Usage (from backend/, with GEMINI_API_KEY set):
+
+    python -m benchmarks.fused_calls path/to/video.mp4 [--runs 3] [--pipeline reel|sentiment|both]
+
+The video is uploaded to Gemini once up front, so the timings cover only the
+analysis calls. Every run skips per-stage cache reads, and the modes alternate
+so that API latency drift affects both equally.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from cache import content_hash, get_cache
+from routes.video import (
+    REEL_FUSED_PIPELINE,
+    REEL_PIPELINE,
+    SENTIMENT_FUSED_PIPELINE,
+    SENTIMENT_PIPELINE,
+)
+from services.gemini_files import get_file_registry
+from services.pipeline import Pipeline, PipelineContext
+
+PIPELINE_PAIRS = {
+    "reel": (REEL_PIPELINE, REEL_FUSED_PIPELINE),
+    "sentiment": (SENTIMENT_PIPELINE, SENTIMENT_FUSED_PIPELINE),
+}
+
+
+async def _timed_run(pipeline: Pipeline, video_path: str, video_hash: str) -> dict:
+    """Run a pipeline once without stage cache reads; return latency and usage totals."""
+    ctx = PipelineContext(video_path, video_hash, "benchmark", use_stage_cache=False)
+    start = time.time()
+    await pipeline.run(ctx)
+    totals = {"seconds": time.time() - start}
+    for usage in ctx.usage.values():
+        for key, value in usage.items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _summary(label: str, samples: list[dict]) -> str:
+    def median(key: str) -> float:
+        return statistics.median(sample.get(key, 0) for sample in samples)
+
+    return (
+        f"{label:<16} {median('seconds'):8.2f}s  requests {median('requests'):4.0f}  "
+        f"prompt {median('prompt_tokens'):8.0f}  output {median('output_tokens'):7.0f}  "
+        f"total {median('total_tokens'):8.0f}"
+    )
+
+
+async def main(video_path: str, runs: int, pipelines: list[str]) -> None:
+    video_hash = content_hash(video_path)
+    # Upload once; both modes reuse the registered file
+    await get_file_registry().acquire(video_hash, video_path)
+
+    for name in pipelines:
+        fanout, fused = PIPELINE_PAIRS[name]
+        samples: dict[str, list[dict]] = {fanout.name: [], fused.name: []}
+        for run in range(runs):
+            print(f"{name}: run {run + 1}/{runs}")
+            for pipeline in (fanout, fused) if run % 2 == 0 else (fused, fanout):
+                samples[pipeline.name].append(
+                    await _timed_run(pipeline, video_path, video_hash)
+                )
+
+        print()
+        print(f"Medians over {runs} runs:")
+        for label, pipeline_samples in samples.items():
+            print(_summary(label, pipeline_samples))
+        print()
+
+    await get_cache().close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("video_path")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--pipeline", choices=["reel", "sentiment", "both"], default="both")
+    args = parser.parse_args()
+    names = ["reel", "sentiment"] if args.pipeline == "both" else [args.pipeline]
+    asyncio.run(main(args.video_path, args.runs, names))
@@ -0,0 +1,90 @@
+"""
+Compare Gemini upload + processing time with and without the upload proxy.
+
+Usage (from backend/, with GEMINI_API_KEY set):
+
+    python -m benchmarks.upload_proxy path/to/video.mp4 [--runs 3] [--backend ffmpeg|opencv]
+
+Each run uploads the original file and a freshly transcoded proxy, waits for
+Gemini to finish processing both, and deletes the uploads afterwards. Proxy
+settings come from the TRANSCODE_* environment variables.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from config import client
+from services.gemini_files import _delete_file, upload_and_wait, upload_metrics
+from services.transcode import (
+    TRANSCODE_FPS,
+    TRANSCODE_MAX_HEIGHT,
+    TRANSCODE_VIDEO_BITRATE,
+    _select_backend,
+    proxy_path_for,
+    remove_proxy,
+    transcode,
+)
+
+
+async def _timed_upload(file_path: str) -> tuple[float, float]:
+    """Return (upload seconds, processing seconds) for one upload."""
+    myfile = await upload_and_wait(client, file_path)
+    await _delete_file(client, myfile.name)
+    return upload_metrics.last_upload_seconds, upload_metrics.last_processing_seconds
+
+
+def _summary(label: str, samples: list[tuple[float, float]]) -> str:
+    uploads = [u for u, _ in samples]
+    processing = [p for _, p in samples]
+    totals = [u + p for u, p in samples]
+    return (
+        f"{label:<10} upload {statistics.median(uploads):6.2f}s  "
+        f"processing {statistics.median(processing):6.2f}s  "
+        f"total {statistics.median(totals):6.2f}s (median of {len(samples)})"
+    )
+
+
+async def main(video_path: str, runs: int, backend: str | None) -> None:
+    backend = backend or _select_backend()
+    if backend is None:
+        raise SystemExit("ffmpeg is not on PATH; pass --backend opencv for a video-only proxy")
+
+    proxy_path = proxy_path_for(video_path)
+    original_samples = []
+    proxy_samples = []
+    transcode_seconds = []
+    try:
+        for run in range(runs):
+            print(f"Run {run + 1}/{runs}")
+            original_samples.append(await _timed_upload(video_path))
+
+            start = time.time()
+            await transcode(video_path, proxy_path, backend)
+            transcode_seconds.append(time.time() - start)
+            proxy_samples.append(await _timed_upload(proxy_path))
+    finally:
+        original_size = os.path.getsize(video_path)
+        proxy_size = os.path.getsize(proxy_path) if os.path.exists(proxy_path) else 0
+        remove_proxy(proxy_path)
+
+    print()
+    print(
+        f"Proxy: backend={backend} max_height={TRANSCODE_MAX_HEIGHT} "
+        f"fps={TRANSCODE_FPS:g} bitrate={TRANSCODE_VIDEO_BITRATE}"
+    )
+    print(f"Size: original {original_size} bytes, proxy {proxy_size} bytes")
+    print(_summary("original", original_samples))
+    print(_summary("proxy", proxy_samples))
+    print(f"transcode  {statistics.median(transcode_seconds):6.2f}s (median)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("video_path")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--backend", choices=["ffmpeg", "opencv"], default=None)
+    args = parser.parse_args()
+    asyncio.run(main(args.video_path, args.runs, args.backend))
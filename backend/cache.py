@@ -1,110 +1,806 @@
 """
-Simple in-memory cache with file persistence for URL-based analysis results.
+Byte-bounded in-memory LRU cache with disk persistence for analysis results.
+
+The disk tier is either one file per entry (CACHE_BACKEND=file) or a single
+SQLite database (CACHE_BACKEND=sqlite). Payloads are written with the compact
+binary codec from `cache_codec`; legacy plain-JSON entries are still readable.
+
+Entries are content-addressed: keys are built from a SHA-256 of the video bytes
+plus the model and prompt version, so the same clip fetched from a different URL,
+re-uploaded, or re-posted on another platform resolves to the same entry.
+
+Entries have a soft and a hard TTL. Within CACHE_TTL they are fresh; between
+CACHE_TTL and CACHE_HARD_TTL `aget_stale` still returns them (flagged stale) so
+callers can serve them immediately and `refresh` them in the background. Entries
+are only dropped once they pass the hard TTL: on read, and by a sweep of the disk
+tier when the write-behind writer starts and every CACHE_EXPIRY_INTERVAL.
+
+Async callers use `aget`/`aset`/`ainvalidate`: disk reads and serialization run in
+a worker thread, and writes are buffered and flushed to disk in batches by a
+background task (write-behind), so the event loop never waits on cache I/O.
 """
 
+import asyncio
 import hashlib
 import json
+import logging
+import sqlite3
+import threading
 import time
 import os
-from typing import Optional, Any
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
 from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from cache_codec import CacheCodec, get_codec
+
+logger = logging.getLogger(__name__)
 
 CACHE_DIR = Path(__file__).parent.parent / "cache"
 CACHE_DIR.mkdir(exist_ok=True)
-CACHE_TTL = 3600  # 1 hour
+# Soft TTL: entries younger than this are served as fresh
+CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))  # 1 hour
+# Hard TTL: stale entries are kept (and served while refreshing) until this age
+CACHE_HARD_TTL = int(os.getenv("CACHE_HARD_TTL", str(24 * 3600)))
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MB
+# Memory tier budget; full reel analyses with character frames are hundreds of KB
+CACHE_MEMORY_MAX_BYTES = int(os.getenv("CACHE_MEMORY_MAX_BYTES", str(256 * 1024 * 1024)))
+# Disk tier: "file" (one file per entry) or "sqlite" (single WAL-mode database)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "file")
+CACHE_DB_PATH = Path(os.getenv("CACHE_DB_PATH", str(CACHE_DIR / "cache.db")))
+CACHE_DISK_MAX_BYTES = int(os.getenv("CACHE_DISK_MAX_BYTES", str(5 * 1024 * 1024 * 1024)))
+# Write-behind: how long the writer waits to gather a batch before flushing it
+CACHE_WRITE_DELAY = float(os.getenv("CACHE_WRITE_DELAY", "0.05"))
+# How often the writer deletes entries past the hard TTL from disk (0 disables)
+CACHE_EXPIRY_INTERVAL = float(os.getenv("CACHE_EXPIRY_INTERVAL", "3600"))
+# How long known-dead URLs (private, deleted, no media) are answered from memory
+NEGATIVE_CACHE_TTL = int(os.getenv("NEGATIVE_CACHE_TTL", "300"))
+NEGATIVE_CACHE_MAX_ENTRIES = int(os.getenv("NEGATIVE_CACHE_MAX_ENTRIES", "10000"))
 
 
-class AnalysisCache:
-    def __init__(self):
-        self.memory_cache: dict[str, tuple[Any, float]] = {}
+def content_hash(file_path: str) -> str:
+    """Compute the SHA-256 hex digest of a file, reading it in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a video URL for failure caching.
+
+    Ignores scheme, www./m. prefixes, trailing slashes, fragments and tracking
+    parameters, and maps YouTube short links/Shorts and Instagram /reel/, /reels/
+    and /tv/ links onto one form per video.
+    """
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix) :]
+    path = parsed.path.rstrip("/")
+    parts = [part for part in path.split("/") if part]
+
+    if host == "youtu.be" and parts:
+        return f"youtube.com/watch?v={parts[0]}"
+    if host.endswith("youtube.com"):
+        if len(parts) >= 2 and parts[0] in ("shorts", "embed", "live"):
+            return f"youtube.com/watch?v={parts[1]}"
+        video_id = parse_qs(parsed.query).get("v", [None])[0]
+        if video_id:
+            return f"youtube.com/watch?v={video_id}"
+    if host.endswith("instagram.com"):
+        if len(parts) >= 2 and parts[-2] in ("p", "reel", "reels", "tv"):
+            return f"instagram.com/p/{parts[-1]}"
+        return f"instagram.com{path}"
+
+    query = "&".join(
+        sorted(
+            param
+            for param in parsed.query.split("&")
+            if param and not param.startswith("utm_")
+        )
+    )
+    return f"{host}{path}" + (f"?{query}" if query else "")
+
+
+def make_cache_key(
+    kind: str, video_hash: str, model_name: str, prompt_version: str, upload_variant: str
+) -> str:
+    """Build a content-addressed cache key for an analysis result.
+
+    `upload_variant` names the rendition Gemini analyzed (original or proxy
+    settings), so results from e.g. a video-only proxy are kept apart.
+    """
+    return f"{kind}:{video_hash}:{upload_variant}:{model_name}:{prompt_version}"
 
-    def _get_cache_key(self, url: str) -> str:
-        """Generate cache key from URL."""
-        return hashlib.md5(url.encode()).hexdigest()
+
+def make_stage_key(
+    stage: str, video_hash: str, model_name: str, prompt: str, upload_variant: str
+) -> str:
+    """Build a cache key for a single pipeline stage.
+
+    The prompt text itself is hashed into the key, so changing one stage's prompt
+    or model only invalidates that stage's results.
+    """
+    prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()[:16]
+    return f"stage:{stage}:{video_hash}:{upload_variant}:{model_name}:{prompt_hash}"
+
+
+class MemoryLRU:
+    """LRU map of cache key -> (result, timestamp) bounded by approximate byte size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, tuple[Any, float, int]] = OrderedDict()
+        self.resident_bytes = 0
+        self.evictions = 0
+
+    def __contains__(self, cache_key: str) -> bool:
+        return cache_key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, cache_key: str) -> Optional[tuple[Any, float]]:
+        """Return (result, timestamp) and mark the entry as most recently used."""
+        entry = self.entries.get(cache_key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(cache_key)
+        result, timestamp, _ = entry
+        return result, timestamp
+
+    def set(self, cache_key: str, result: Any, timestamp: float, size: int) -> None:
+        """Insert an entry of approximately `size` bytes, evicting LRU entries to fit."""
+        self.pop(cache_key)
+        if size > self.max_bytes:
+            # Larger than the whole budget: leave it to the disk tier
+            return
+        self.entries[cache_key] = (result, timestamp, size)
+        self.resident_bytes += size
+        while self.resident_bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self.entries.popitem(last=False)
+            self.resident_bytes -= evicted_size
+            self.evictions += 1
+
+    def pop(self, cache_key: str) -> None:
+        """Remove an entry if present."""
+        entry = self.entries.pop(cache_key, None)
+        if entry is not None:
+            self.resident_bytes -= entry[2]
+
+
+class FileCacheStore:
+    """Disk tier storing each entry as a codec-encoded file in CACHE_DIR."""
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, codec: Optional[CacheCodec] = None):
+        self.cache_dir = cache_dir
+        self.codec = codec or get_codec()
 
     def _get_cache_file(self, cache_key: str) -> Path:
         """Get cache file path for key."""
-        return CACHE_DIR / f"{cache_key}.json"
+        return self.cache_dir / f"{cache_key}.cache"
+
+    def _get_legacy_cache_file(self, cache_key: str) -> Path:
+        """Path used by entries written as plain JSON before the binary codec."""
+        return self.cache_dir / f"{cache_key}.json"
+
+    def _read(self, cache_file: Path) -> tuple[Any, float, int]:
+        with open(cache_file, "rb") as f:
+            cached, size = self.codec.decode(f.read())
+        return cached["data"], cached.get("timestamp", 0), size
+
+    def load(self, cache_key: str) -> Optional[tuple[Any, float, int]]:
+        """Return (data, timestamp, size) for a stored entry."""
+        for cache_file in (
+            self._get_cache_file(cache_key),
+            self._get_legacy_cache_file(cache_key),
+        ):
+            if cache_file.exists():
+                return self._read(cache_file)
+        return None
+
+    def save(self, cache_key: str, key: str, data: Any, timestamp: float) -> int:
+        """Persist an entry atomically and return its uncompressed size."""
+        payload, size = self.codec.encode(
+            {"key": key, "timestamp": timestamp, "data": data}
+        )
+        cache_file = self._get_cache_file(cache_key)
+        tmp_file = cache_file.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_file, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_file, cache_file)
+        # A rewritten entry supersedes its legacy JSON file
+        legacy_file = self._get_legacy_cache_file(cache_key)
+        if legacy_file.exists():
+            legacy_file.unlink()
+        return size
+
+    def delete(self, cache_key: str) -> None:
+        for cache_file in (
+            self._get_cache_file(cache_key),
+            self._get_legacy_cache_file(cache_key),
+        ):
+            if cache_file.exists():
+                cache_file.unlink()
+
+    def write_batch(
+        self, saves: list[tuple[str, str, Any, float]], deletes: list[str]
+    ) -> list[int]:
+        """Apply a batch of deletes and saves; return the size of each save."""
+        for cache_key in deletes:
+            self.delete(cache_key)
+        return [self.save(*entry) for entry in saves]
+
+    def clear_expired(self, ttl: float) -> None:
+        now = time.time()
+        for pattern in ("*.cache", "*.json"):
+            for cache_file in self.cache_dir.glob(pattern):
+                try:
+                    _, timestamp, _ = self._read(cache_file)
+                    if now - timestamp >= ttl:
+                        cache_file.unlink(missing_ok=True)
+                except Exception:
+                    cache_file.unlink(missing_ok=True)
+
+
+class SQLiteCacheStore:
+    """
+    Disk tier backed by a single SQLite database in WAL mode.
+
+    Payloads live in a BLOB column next to indexed `expires_at` and `last_access`
+    columns, so expiry and size-based eviction are each one indexed DELETE, and
+    every write is an atomic transaction. The stored byte total is tracked per
+    write, so the write that takes it over `max_bytes` runs the eviction.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = CACHE_DB_PATH,
+        ttl: float = CACHE_HARD_TTL,
+        max_bytes: int = CACHE_DISK_MAX_BYTES,
+        codec: Optional[CacheCodec] = None,
+    ):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.codec = codec or get_codec()
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            str(db_path), check_same_thread=False, isolation_level=None
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                cache_key TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache_entries(expires_at)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_access ON cache_entries(last_access)"
+        )
+        self._total_bytes = self._stored_bytes_locked()
+
+    def load(self, cache_key: str) -> Optional[tuple[Any, float, int]]:
+        """Return (data, timestamp, size) for a live entry and bump its last access."""
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT data, created_at FROM cache_entries "
+                "WHERE cache_key = ? AND expires_at > ?",
+                (cache_key, now),
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE cache_entries SET last_access = ? WHERE cache_key = ?",
+                (now, cache_key),
+            )
+        payload, created_at = row
+        data, size = self.codec.decode(bytes(payload))
+        return data, created_at, size
+
+    def save(self, cache_key: str, key: str, data: Any, timestamp: float) -> int:
+        """Upsert an entry in one transaction and return its serialized size."""
+        return self.write_batch([(cache_key, key, data, timestamp)], [])[0]
+
+    def write_batch(
+        self, saves: list[tuple[str, str, Any, float]], deletes: list[str]
+    ) -> list[int]:
+        """
+        Apply a batch of deletes and upserts in a single transaction.
+
+        The `size` column holds the encoded (on-disk) size used for eviction; the
+        returned sizes are the uncompressed ones used to budget the memory tier.
+        """
+        rows = []
+        sizes = []
+        for cache_key, key, data, timestamp in saves:
+            payload, size = self.codec.encode(data)
+            sizes.append(size)
+            rows.append(
+                (
+                    cache_key,
+                    key,
+                    sqlite3.Binary(payload),
+                    len(payload),
+                    timestamp,
+                    timestamp + self.ttl,
+                    timestamp,
+                )
+            )
+        replaced = [(cache_key,) for cache_key in {*deletes, *(row[0] for row in rows)}]
+        with self._lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                removed_bytes = sum(
+                    self.conn.execute(
+                        "SELECT COALESCE(SUM(size), 0) FROM cache_entries WHERE cache_key = ?",
+                        params,
+                    ).fetchone()[0]
+                    for params in replaced
+                )
+                self.conn.executemany(
+                    "DELETE FROM cache_entries WHERE cache_key = ?",
+                    [(cache_key,) for cache_key in deletes],
+                )
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO cache_entries "
+                    "(cache_key, key, data, size, created_at, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            self._total_bytes += sum(row[3] for row in rows) - removed_bytes
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+        return sizes
+
+    def delete(self, cache_key: str) -> None:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT size FROM cache_entries WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+            if row is None:
+                return
+            self.conn.execute(
+                "DELETE FROM cache_entries WHERE cache_key = ?", (cache_key,)
+            )
+            self._total_bytes -= row[0]
+
+    def clear_expired(self, ttl: float) -> None:
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),)
+            )
+            self._evict_locked()
+
+    def _stored_bytes_locked(self) -> int:
+        return self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()[0]
+
+    def _evict_locked(self) -> None:
+        """Drop least recently used entries beyond the byte budget."""
+        self.conn.execute(
+            """
+            DELETE FROM cache_entries WHERE cache_key IN (
+                SELECT cache_key FROM (
+                    SELECT cache_key,
+                           SUM(size) OVER (ORDER BY last_access DESC) AS running
+                    FROM cache_entries
+                ) WHERE running > ?
+            )
+            """,
+            (self.max_bytes,),
+        )
+        # Also picks up changes made by other processes sharing the database
+        self._total_bytes = self._stored_bytes_locked()
+
+
+def _create_store():
+    if CACHE_BACKEND == "sqlite":
+        return SQLiteCacheStore()
+    return FileCacheStore()
+
 
-    def get(self, url: str) -> Optional[Any]:
-        """Get cached analysis for URL."""
-        cache_key = self._get_cache_key(url)
+class NegativeCache:
+    """
+    Short-lived in-memory record of URLs that failed permanently.
+
+    Entries remember the error class and the exact status code and message the
+    client got, so retries for a known-dead URL are answered the same way without
+    repeating the failing network roundtrip.
+    """
+
+    def __init__(
+        self, ttl: float = NEGATIVE_CACHE_TTL, max_entries: int = NEGATIVE_CACHE_MAX_ENTRIES
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (error_class, status_code, detail, expires_at)
+        self.entries: OrderedDict[str, tuple[str, int, str, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.hits_by_class: dict[str, int] = {}
+
+    @staticmethod
+    def _key(kind: str, url: str) -> str:
+        return f"{kind}:{normalize_url(url)}"
+
+    def get(self, kind: str, url: str) -> Optional[tuple[str, int, str]]:
+        """Return (error_class, status_code, detail) for a known-dead URL."""
+        key = self._key(kind, url)
+        entry = self.entries.get(key)
+        if entry is not None and entry[3] <= time.time():
+            del self.entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        error_class, status_code, detail, _ = entry
+        self.hits += 1
+        self.hits_by_class[error_class] = self.hits_by_class.get(error_class, 0) + 1
+        logger.debug(f"Negative cache hit ({error_class}): {key}")
+        return error_class, status_code, detail
+
+    def add(
+        self, kind: str, url: str, error_class: str, status_code: int, detail: str
+    ) -> None:
+        """Remember that `url` failed with `error_class` for the negative TTL."""
+        key = self._key(kind, url)
+        self.entries.pop(key, None)
+        self.entries[key] = (error_class, status_code, detail, time.time() + self.ttl)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hits_by_class": dict(self.hits_by_class),
+        }
+
+
+class AnalysisCache:
+    def __init__(
+        self,
+        max_memory_bytes: int = CACHE_MEMORY_MAX_BYTES,
+        store=None,
+        write_delay: float = CACHE_WRITE_DELAY,
+        expiry_interval: float = CACHE_EXPIRY_INTERVAL,
+    ):
+        self.memory_cache = MemoryLRU(max_memory_bytes)
+        self.store = store if store is not None else _create_store()
+        self.negative = NegativeCache()
+        self.write_delay = write_delay
+        self.expiry_interval = expiry_interval
+        # Write-behind buffers: cache_key -> (key, result, timestamp), or None for a delete.
+        # `_pending` collects new writes; `_writing` is the batch currently being flushed.
+        self._pending: dict[str, Optional[tuple[str, Any, float]]] = {}
+        self._writing: dict[str, Optional[tuple[str, Any, float]]] = {}
+        self._writer: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.batches_written = 0
+        self.entries_written = 0
+        self.expiry_sweeps = 0
+        # Background refreshes of stale entries, at most one per key
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def _get_cache_key(self, key: str) -> str:
+        """Generate a filesystem-safe cache key."""
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get cached analysis for key."""
+        cache_key = self._get_cache_key(key)
 
         # Check memory cache first
-        if cache_key in self.memory_cache:
-            result, timestamp = self.memory_cache[cache_key]
+        entry = self.memory_cache.get(cache_key)
+        if entry is not None:
+            result, timestamp = entry
             if time.time() - timestamp < CACHE_TTL:
-                print(f"CACHE HIT (memory): {url}")
+                self.hits_memory += 1
+                logger.debug(f"Cache hit (memory): {key}")
                 return result
-            else:
-                del self.memory_cache[cache_key]
+            elif time.time() - timestamp >= CACHE_HARD_TTL:
+                self.memory_cache.pop(cache_key)
+            self.misses += 1
+            return None
 
-        # Check file cache
-        cache_file = self._get_cache_file(cache_key)
-        if cache_file.exists():
-            try:
-                with open(cache_file, "r") as f:
-                    cached = json.load(f)
-                    # Validate TTL
-                    if time.time() - cached.get("timestamp", 0) < CACHE_TTL:
-                        # Store in memory for faster access
-                        self.memory_cache[cache_key] = (
-                            cached["data"],
-                            cached["timestamp"],
-                        )
-                        print(f"CACHE HIT (file): {url}")
-                        return cached["data"]
-                    else:
-                        # Remove stale file
-                        cache_file.unlink()
-            except Exception as e:
-                print(f"Cache read error: {e}")
+        # Check disk tier
+        try:
+            stored = self._load_live(cache_key)
+            if stored is not None:
+                data, timestamp, size = stored
+                # Store in memory for faster access
+                self.memory_cache.set(cache_key, data, timestamp, size)
+                # Validate TTL
+                if time.time() - timestamp < CACHE_TTL:
+                    self.hits_disk += 1
+                    logger.debug(f"Cache hit (disk): {key}")
+                    return data
+        except Exception as e:
+            logger.warning(f"Cache read error: {e}")
 
+        self.misses += 1
         return None
 
-    def set(self, url: str, result: Any) -> None:
-        """Cache analysis result for URL."""
-        cache_key = self._get_cache_key(url)
+    def set(self, key: str, result: Any) -> None:
+        """Cache analysis result for key."""
+        cache_key = self._get_cache_key(key)
         timestamp = time.time()
 
-        # Store in memory
-        self.memory_cache[cache_key] = (result, timestamp)
-
-        # Persist to file
-        cache_file = self._get_cache_file(cache_key)
+        # Persist to disk
         try:
-            with open(cache_file, "w") as f:
-                json.dump(
-                    {"url": url, "timestamp": timestamp, "data": result}, f, default=str
-                )
+            size = self.store.save(cache_key, key, result, timestamp)
         except Exception as e:
-            print(f"Cache write error: {e}")
-        print(f"CACHE SET: {url}")
+            logger.warning(f"Cache write error: {e}")
+            size = len(json.dumps(result, default=str))
+
+        # Store in memory, sized by its serialized form
+        self.memory_cache.set(cache_key, result, timestamp, size)
+        logger.debug(f"Cache set: {key}")
 
-    def invalidate(self, url: str) -> None:
-        """Remove cached result for URL."""
-        cache_key = self._get_cache_key(url)
+    def invalidate(self, key: str) -> None:
+        """Remove cached result for key."""
+        cache_key = self._get_cache_key(key)
 
         # Remove from memory
-        if cache_key in self.memory_cache:
-            del self.memory_cache[cache_key]
+        self.memory_cache.pop(cache_key)
 
-        # Remove file
-        cache_file = self._get_cache_file(cache_key)
-        if cache_file.exists():
-            cache_file.unlink()
+        # Remove from disk
+        self.store.delete(cache_key)
 
     def clear_expired(self) -> None:
         """Clear all expired cache entries."""
-        now = time.time()
-        for cache_file in CACHE_DIR.glob("*.json"):
+        self.store.clear_expired(CACHE_HARD_TTL)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """Get a fresh cached analysis for key without blocking the event loop."""
+        entry = await self.aget_stale(key)
+        if entry is None or entry[1]:
+            return None
+        return entry[0]
+
+    async def aget_stale(self, key: str) -> Optional[tuple[Any, bool]]:
+        """
+        Get (result, is_stale) for key without blocking the event loop.
+
+        Stale entries (past the soft TTL but within the hard TTL) are returned so the
+        caller can serve them right away and schedule a `refresh`.
+        """
+        entry = await self._alookup(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        result, timestamp, tier = entry
+        stale = time.time() - timestamp >= CACHE_TTL
+        if stale:
+            self.stale_hits += 1
+            logger.debug(f"Cache hit (stale, {tier}): {key}")
+        else:
+            if tier == "disk":
+                self.hits_disk += 1
+            else:
+                self.hits_memory += 1
+            logger.debug(f"Cache hit ({tier}): {key}")
+        return result, stale
+
+    async def _alookup(self, key: str) -> Optional[tuple[Any, float, str]]:
+        """Find an entry within the hard TTL; returns (result, timestamp, tier)."""
+        cache_key = self._get_cache_key(key)
+
+        # Memory tier lookups are cheap enough to do on the loop
+        entry = self.memory_cache.get(cache_key)
+        if entry is not None:
+            result, timestamp = entry
+            if time.time() - timestamp < CACHE_HARD_TTL:
+                return result, timestamp, "memory"
+            self.memory_cache.pop(cache_key)
+
+        # Writes that have not reached disk yet
+        for buffer in (self._pending, self._writing):
+            if cache_key in buffer:
+                buffered = buffer[cache_key]
+                if buffered is None or time.time() - buffered[2] >= CACHE_HARD_TTL:
+                    return None
+                return buffered[1], buffered[2], "write buffer"
+
+        try:
+            stored = await asyncio.to_thread(self._load_live, cache_key)
+        except Exception as e:
+            logger.warning(f"Cache read error: {e}")
+            stored = None
+        if stored is None or cache_key in self._pending:
+            # A write or invalidation raced with the read; don't resurrect old data
+            return None
+
+        data, timestamp, size = stored
+        self.memory_cache.set(cache_key, data, timestamp, size)
+        return data, timestamp, "disk"
+
+    def refresh(self, key: str, fn: Callable[[], Awaitable[Any]]) -> bool:
+        """
+        Run `fn()` in the background to recompute a stale entry.
+
+        At most one refresh runs per key; returns False if one is already in flight.
+        `fn` is responsible for storing the new result (e.g. via `aset`).
+        """
+        if key in self._refreshing:
+            return False
+        task = asyncio.get_running_loop().create_task(fn())
+        self._refreshing[key] = task
+        self.refreshes += 1
+        task.add_done_callback(lambda t: self._refresh_done(key, t))
+        logger.debug(f"Cache refresh scheduled: {key}")
+        return True
+
+    def is_refreshing(self, key: str) -> bool:
+        """Whether a background refresh for key is in flight."""
+        return key in self._refreshing
+
+    def _refresh_done(self, key: str, task: asyncio.Task) -> None:
+        if self._refreshing.get(key) is task:
+            del self._refreshing[key]
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self.refresh_failures += 1
+            logger.warning(f"Cache refresh failed for {key}: {error}")
+
+    async def aset(self, key: str, result: Any) -> None:
+        """Queue a result for write-behind persistence."""
+        cache_key = self._get_cache_key(key)
+        self._pending[cache_key] = (key, result, time.time())
+        self._schedule_flush()
+        logger.debug(f"Cache set: {key}")
+
+    async def ainvalidate(self, key: str) -> None:
+        """Remove cached result for key; the disk delete goes through the write-behind queue."""
+        cache_key = self._get_cache_key(key)
+        self.memory_cache.pop(cache_key)
+        self._pending[cache_key] = None
+        self._schedule_flush()
+
+    def start(self) -> None:
+        """Start the background writer now (call on startup) so expired entries are swept."""
+        self._ensure_writer()
+
+    async def flush(self) -> None:
+        """Write every buffered entry to disk."""
+        while self._pending:
+            await self._write_pending()
+
+    async def close(self) -> None:
+        """Stop the background writer and flush remaining writes (call on shutdown)."""
+        if self._writer is not None:
+            self._writer.cancel()
             try:
-                with open(cache_file, "r") as f:
-                    cached = json.load(f)
-                    if now - cached.get("timestamp", 0) >= CACHE_TTL:
-                        cache_file.unlink()
-            except Exception:
-                cache_file.unlink()
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+            self._wakeup = None
+        await self.flush()
+
+    def _load_live(self, cache_key: str) -> Optional[tuple[Any, float, int]]:
+        """Load a disk entry, dropping it if expired (runs in a worker thread)."""
+        stored = self.store.load(cache_key)
+        if stored is None:
+            return None
+        if time.time() - stored[1] >= CACHE_HARD_TTL:
+            self.store.delete(cache_key)
+            return None
+        return stored
+
+    def _ensure_writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._writer is None or self._writer.done() or self._writer.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._writer = loop.create_task(self._writer_loop())
+
+    def _schedule_flush(self) -> None:
+        self._ensure_writer()
+        self._wakeup.set()
+
+    async def _sweep_expired(self) -> None:
+        try:
+            await asyncio.to_thread(self.clear_expired)
+            self.expiry_sweeps += 1
+        except Exception as e:
+            logger.warning(f"Cache expiry sweep failed: {e}")
+
+    async def _writer_loop(self) -> None:
+        # Expired entries are swept when the writer starts, then every expiry_interval
+        next_sweep = time.monotonic()
+        while True:
+            if self.expiry_interval > 0 and time.monotonic() >= next_sweep:
+                await self._sweep_expired()
+                next_sweep = time.monotonic() + self.expiry_interval
+            timeout = (
+                max(0.0, next_sweep - time.monotonic()) if self.expiry_interval > 0 else None
+            )
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                continue
+            # Give concurrent writers a moment to join the batch
+            await asyncio.sleep(self.write_delay)
+            self._wakeup.clear()
+            try:
+                await self._write_pending()
+            except Exception as e:
+                logger.warning(f"Cache write error: {e}")
+
+    async def _write_pending(self) -> None:
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        self._writing = batch
+        saves = [
+            (cache_key, *entry) for cache_key, entry in batch.items() if entry is not None
+        ]
+        deletes = [cache_key for cache_key, entry in batch.items() if entry is None]
+        try:
+            sizes = await asyncio.to_thread(self.store.write_batch, saves, deletes)
+        except Exception as e:
+            logger.warning(f"Cache write error: {e}")
+            sizes = await asyncio.to_thread(
+                lambda: [len(json.dumps(entry[2], default=str)) for entry in saves]
+            )
+        finally:
+            self._writing = {}
+
+        for (cache_key, _, result, timestamp), size in zip(saves, sizes):
+            # Skip entries that were overwritten or invalidated while flushing
+            if cache_key not in self._pending:
+                self.memory_cache.set(cache_key, result, timestamp, size)
+        self.batches_written += 1
+        self.entries_written += len(batch)
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters and memory tier occupancy."""
+        return {
+            "backend": type(self.store).__name__,
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+            "refreshes_in_flight": len(self._refreshing),
+            "refresh_failures": self.refresh_failures,
+            "pending_writes": len(self._pending) + len(self._writing),
+            "batches_written": self.batches_written,
+            "entries_written": self.entries_written,
+            "expiry_sweeps": self.expiry_sweeps,
+            "evictions": self.memory_cache.evictions,
+            "memory_entries": len(self.memory_cache),
+            "resident_bytes": self.memory_cache.resident_bytes,
+            "max_memory_bytes": self.memory_cache.max_bytes,
+            "negative": self.negative.stats(),
+        }
 
 
 # Singleton instance
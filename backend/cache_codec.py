@@ -0,0 +1,210 @@
+"""
+Compact binary encoding for cached analysis payloads.
+
+Every encoded payload starts with a small header (magic, format version,
+serializer id, compression id) so entries written with any codec - and legacy
+plain-JSON entries without a header - can always be read back.
+
+Base64 strings in BINARY_FIELDS (the character frame JPEGs) are stored as raw
+bytes in a side table instead of inflating the serialized tree by a third, and
+are re-encoded to the same base64 strings on load.
+
+Serializers: orjson and msgpack when installed, stdlib json otherwise.
+Compression: zstd when `zstandard` is installed, gzip otherwise, or none.
+"""
+
+import base64
+import binascii
+import gzip
+import json
+import os
+import struct
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"SNTC"
+FORMAT_VERSION = 1
+HEADER = struct.Struct(">4sBBB")
+LENGTH = struct.Struct(">I")
+
+# Fields holding base64-encoded binary data that are stored as raw bytes
+BINARY_FIELDS = {"frame_image_b64"}
+
+SERIALIZER_IDS = {"json": 0, "orjson": 1, "msgpack": 2}
+COMPRESSION_IDS = {"none": 0, "gzip": 1, "zstd": 2}
+
+# "auto" picks the fastest available option
+CACHE_SERIALIZER = os.getenv("CACHE_SERIALIZER", "auto")
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "auto")
+CACHE_COMPRESSION_LEVEL = int(os.getenv("CACHE_COMPRESSION_LEVEL", "3"))
+
+
+def _resolve_serializer(name: str) -> str:
+    if name == "auto":
+        return "orjson" if orjson is not None else "json"
+    if name == "orjson" and orjson is None:
+        raise ValueError("CACHE_SERIALIZER=orjson requires the orjson package")
+    if name == "msgpack" and msgpack is None:
+        raise ValueError("CACHE_SERIALIZER=msgpack requires the msgpack package")
+    if name not in SERIALIZER_IDS:
+        raise ValueError(f"Unknown cache serializer: {name}")
+    return name
+
+
+def _resolve_compression(name: str) -> str:
+    if name == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if name == "zstd" and zstandard is None:
+        raise ValueError("CACHE_COMPRESSION=zstd requires the zstandard package")
+    if name not in COMPRESSION_IDS:
+        raise ValueError(f"Unknown cache compression: {name}")
+    return name
+
+
+def _extract_binary(value: Any, blobs: list[bytes]) -> Any:
+    """Copy `value`, moving base64 BINARY_FIELDS into `blobs` as raw bytes."""
+    if isinstance(value, dict):
+        result = {}
+        for k, v in value.items():
+            if k in BINARY_FIELDS and isinstance(v, str) and v:
+                try:
+                    raw = base64.b64decode(v, validate=True)
+                except (binascii.Error, ValueError):
+                    raw = None
+                # Only strings that round-trip exactly are stored as bytes
+                if raw is not None and base64.b64encode(raw).decode("ascii") == v:
+                    result[k] = {"$bin": len(blobs)}
+                    blobs.append(raw)
+                    continue
+            result[k] = _extract_binary(v, blobs)
+        return result
+    if isinstance(value, (list, tuple)):
+        return [_extract_binary(v, blobs) for v in value]
+    return value
+
+
+def _restore_binary(value: Any, blobs: list[bytes]) -> Any:
+    """Inverse of `_extract_binary`, in place."""
+    if isinstance(value, dict):
+        for k, v in value.items():
+            if k in BINARY_FIELDS and isinstance(v, dict) and "$bin" in v:
+                value[k] = base64.b64encode(blobs[v["$bin"]]).decode("ascii")
+            else:
+                _restore_binary(v, blobs)
+    elif isinstance(value, list):
+        for v in value:
+            _restore_binary(v, blobs)
+    return value
+
+
+class CacheCodec:
+    """Serializes cache payloads to compact bytes and back."""
+
+    def __init__(
+        self,
+        serializer: str = CACHE_SERIALIZER,
+        compression: str = CACHE_COMPRESSION,
+        level: int = CACHE_COMPRESSION_LEVEL,
+    ):
+        self.serializer = _resolve_serializer(serializer)
+        self.compression = _resolve_compression(compression)
+        self.level = level
+
+    def encode(self, data: Any) -> tuple[bytes, int]:
+        """Return (payload, uncompressed size) for `data`."""
+        blobs: list[bytes] = []
+        tree = _extract_binary(data, blobs)
+        parts = [LENGTH.pack(len(blobs))]
+        for blob in blobs:
+            parts.append(LENGTH.pack(len(blob)))
+            parts.append(blob)
+        parts.append(self._serialize(tree))
+        body = b"".join(parts)
+        header = HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            SERIALIZER_IDS[self.serializer],
+            COMPRESSION_IDS[self.compression],
+        )
+        return header + self._compress(body), len(body)
+
+    def decode(self, payload: bytes) -> tuple[Any, int]:
+        """Return (data, uncompressed size) for a payload written by any codec."""
+        if not payload.startswith(MAGIC):
+            # Legacy entry: plain JSON text
+            return json.loads(payload), len(payload)
+
+        _, version, serializer_id, compression_id = HEADER.unpack_from(payload)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported cache format version: {version}")
+        body = self._decompress(compression_id, payload[HEADER.size :])
+
+        offset = 0
+        (count,) = LENGTH.unpack_from(body, offset)
+        offset += LENGTH.size
+        blobs = []
+        for _ in range(count):
+            (length,) = LENGTH.unpack_from(body, offset)
+            offset += LENGTH.size
+            blobs.append(body[offset : offset + length])
+            offset += length
+        tree = self._deserialize(serializer_id, body[offset:])
+        return _restore_binary(tree, blobs), len(body)
+
+    def _serialize(self, tree: Any) -> bytes:
+        if self.serializer == "orjson":
+            return orjson.dumps(tree, default=str, option=orjson.OPT_NON_STR_KEYS)
+        if self.serializer == "msgpack":
+            return msgpack.packb(tree, default=str, use_bin_type=True)
+        return json.dumps(tree, default=str).encode()
+
+    @staticmethod
+    def _deserialize(serializer_id: int, raw: bytes) -> Any:
+        if serializer_id == SERIALIZER_IDS["msgpack"]:
+            if msgpack is None:
+                raise ValueError("Cache entry requires the msgpack package")
+            return msgpack.unpackb(raw, raw=False)
+        if serializer_id == SERIALIZER_IDS["orjson"] and orjson is not None:
+            return orjson.loads(raw)
+        # orjson output is plain JSON, so stdlib json can read it too
+        return json.loads(raw)
+
+    def _compress(self, body: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=self.level).compress(body)
+        if self.compression == "gzip":
+            return gzip.compress(body, compresslevel=min(max(self.level, 1), 9))
+        return body
+
+    @staticmethod
+    def _decompress(compression_id: int, raw: bytes) -> bytes:
+        if compression_id == COMPRESSION_IDS["zstd"]:
+            if zstandard is None:
+                raise ValueError("Cache entry requires the zstandard package")
+            return zstandard.ZstdDecompressor().decompress(raw)
+        if compression_id == COMPRESSION_IDS["gzip"]:
+            return gzip.decompress(raw)
+        return raw
+
+
+# Singleton instance
+_codec = CacheCodec()
+
+
+def get_codec() -> CacheCodec:
+    """Get the codec configured by CACHE_SERIALIZER / CACHE_COMPRESSION."""
+    return _codec
@@ -13,6 +13,9 @@ if not api_key:
 
 model = os.getenv("GEMINI_MODEL", "gemini-3-flash-preview")
 bias_model = os.getenv("GEMINI_BIAS_MODEL", "gemini-3-pro-preview")
+# Default Gemini call mode: "fanout" (one call per analysis) or "fused"
+# (same-model analyses merged into one call); endpoints accept ?call_mode=
+ANALYSIS_CALL_MODE = os.getenv("ANALYSIS_CALL_MODE", "fanout")
 
 client = genai.Client(api_key=api_key)
 
@@ -22,3 +25,6 @@ DOWNLOADER_BASE_URL = os.getenv("DOWNLOADER_BASE_URL", "http://localhost:3333")
 # Video storage directory for serving videos to frontend
 VIDEOS_DIR = Path(__file__).parent.parent / "videos"
 VIDEOS_DIR.mkdir(exist_ok=True)
+
+# Largest video accepted from downloads and uploads
+MAX_VIDEO_BYTES = int(os.getenv("MAX_VIDEO_BYTES", str(200 * 1024 * 1024)))
@@ -1,9 +1,35 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from routes import video_router, root_router, videos_router
+from cache import get_cache
+from routes import video_router, root_router, videos_router, metrics_router, jobs_router
+from routes.jobs import register_job_handlers
+from services.http_client import create_http_client
+from services.jobs import get_job_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP client shared by all requests (see services/http_client.py)
+    app.state.http_client = create_http_client()
+    # Write-behind cache writer; also sweeps expired entries from disk (see cache.py)
+    get_cache().start()
+    # Background analysis jobs (see services/jobs.py); resumes jobs queued before a restart
+    register_job_handlers(app.state.http_client)
+    await get_job_pool().start()
+    try:
+        yield
+    finally:
+        # Running jobs go back to the queue and resume on the next start
+        await get_job_pool().stop()
+        await app.state.http_client.aclose()
+        # Persist write-behind cache entries before the process exits
+        await get_cache().close()
+
 
-app = FastAPI(title="Social Media Video Analysis API")
+app = FastAPI(title="Social Media Video Analysis API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,6 +42,9 @@ app.add_middleware(
 @app.middleware("http")
 async def add_no_cache_header(request, call_next):
     response = await call_next(request)
+    # Routes that set their own caching policy (e.g. /videos) keep it
+    if "cache-control" in response.headers:
+        return response
     response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
     response.headers["Pragma"] = "no-cache"
     response.headers["Expires"] = "0"
@@ -24,6 +53,8 @@ async def add_no_cache_header(request, call_next):
 app.include_router(root_router)
 app.include_router(video_router)
 app.include_router(videos_router)
+app.include_router(metrics_router)
+app.include_router(jobs_router)
 
 
 if __name__ == "__main__":
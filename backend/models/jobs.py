@@ -0,0 +1,48 @@
+from pydantic import BaseModel, Field
+from typing import Dict, Literal, Optional
+from models.video import CallMode, EnhancedReelAnalysis
+
+
+class JobRequest(BaseModel):
+    """Request body for queuing a reel or YouTube analysis job."""
+
+    type: Literal["reel", "youtube"] = Field(
+        description="'reel' for an Instagram reel/post URL, 'youtube' for a YouTube video or Shorts URL."
+    )
+    url: str = Field(description="The URL of the video to analyze.")
+    enable_fact_check: bool = Field(
+        default=False, description="Run the fact-checker on the transcript."
+    )
+    call_mode: Optional[CallMode] = Field(
+        default=None, description="Gemini call mode; defaults to ANALYSIS_CALL_MODE."
+    )
+
+
+class JobResponse(BaseModel):
+    """State of an analysis job; `result` is set once it has succeeded."""
+
+    id: str = Field(description="Job id, for GET /jobs/{id}.")
+    kind: Literal["reel", "youtube", "upload"] = Field(description="Where the video comes from.")
+    status: Literal["queued", "running", "succeeded", "failed"] = Field(
+        description="queued (waiting, possibly for a retry), running, succeeded or failed."
+    )
+    attempts: int = Field(description="Attempts started so far.")
+    max_attempts: int = Field(description="Attempts allowed before the job fails.")
+    created_at: float = Field(description="Unix time the job was queued.")
+    started_at: Optional[float] = Field(
+        default=None, description="Unix time the latest attempt started."
+    )
+    finished_at: Optional[float] = Field(
+        default=None, description="Unix time the job succeeded or failed."
+    )
+    error: Optional[str] = Field(
+        default=None,
+        description="Why the job failed, or why the latest attempt failed while a retry is queued.",
+    )
+    stage_timings: Optional[Dict[str, float]] = Field(
+        default=None,
+        description="Seconds spent downloading and in each analysis stage of the successful attempt.",
+    )
+    result: Optional[EnhancedReelAnalysis] = Field(
+        default=None, description="The analysis, once the job has succeeded."
+    )
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from routes.fact_check import FactCheckReport
+from models.fact_check import FactCheckReport
 from typing import Literal
 
 
@@ -191,6 +191,10 @@ class EnhancedReelAnalysis(BaseModel):
         default=None,
         description="Bias analysis with categories, risk levels, and evidence metrics.",
     )
+    degraded_stages: List[str] = Field(
+        default_factory=list,
+        description="Optional analysis stages (e.g. bias, characters) that failed or timed out; their sections are missing from this result.",
+    )
 
 
 # ==================== Split Analysis Models for Faster Processing ====================
@@ -331,6 +335,33 @@ class CharacterGlobalAnalysis(BaseModel):
     )
 
 
+class FusedReelAnalysis(BaseModel):
+    """Transcript and character analyses returned by a single fused call."""
+
+    transcript_analysis: TranscriptAnalysis = Field(
+        description="Result of the transcript task"
+    )
+    character_analysis: CharacterAnalysis = Field(
+        description="Result of the character task"
+    )
+
+
+class FusedSentimentAnalysis(BaseModel):
+    """Temporal and global character emotion analyses returned by a single fused call."""
+
+    temporal_analysis: TemporalEmotionAnalysis = Field(
+        description="Result of the emotion timeline task"
+    )
+    character_global_analysis: CharacterGlobalAnalysis = Field(
+        description="Result of the character emotion and global sentiment task"
+    )
+
+
+# "fanout" sends one Gemini request per analysis; "fused" merges same-model
+# analyses into one request with a combined response schema
+CallMode = Literal["fanout", "fused"]
+
+
 class ReelAnalysisRequest(BaseModel):
     """Request body for reel analysis."""
 
@@ -341,3 +372,40 @@ class YouTubeAnalysisRequest(BaseModel):
     """Request body for YouTube video analysis."""
 
     video_url: str = Field(description="The YouTube video or Shorts URL to analyze.")
+
+
+# ==================== Streaming (Server-Sent Events) Payloads ====================
+
+
+class VideoReadyEvent(BaseModel):
+    """`download` event: the video is on the server (downloaded or uploaded)."""
+
+    source: str = Field(description="The URL or filename the video came from.")
+    video_hash: str = Field(description="SHA-256 of the video content.")
+
+
+class UploadActiveEvent(BaseModel):
+    """`upload` event: the video is uploaded to Gemini and ready for analysis."""
+
+    file_name: str = Field(description="Gemini file resource name.")
+
+
+class FrameEvent(BaseModel):
+    """`frame` event: one character frame has been extracted."""
+
+    timestamp: float = Field(description="Character timestamp in seconds the frame was taken at.")
+    frame_image_b64: str = Field(description="Base64-encoded JPEG of the frame.")
+
+
+class DegradedStageEvent(BaseModel):
+    """`degraded` event: an optional stage failed; its section will be missing."""
+
+    stage: str = Field(description="Event name of the stage that failed (e.g. bias).")
+    error: str = Field(description="Why the stage failed.")
+
+
+class StreamErrorEvent(BaseModel):
+    """`error` event: the analysis failed; no `done` event follows."""
+
+    status_code: int = Field(description="HTTP status the non-streaming endpoint would return.")
+    detail: str = Field(description="Error message.")
@@ -1,3 +1,5 @@
+import hashlib
+
 # ==================== Structured Reel Analysis Prompts ====================
 
 TRANSCRIPT_ANALYSIS_PROMPT = """
@@ -217,3 +219,113 @@ def build_character_global_analysis_prompt(video_duration_seconds: int) -> str:
     ]
 
     return "\n".join(prompt_parts)
+
+
+def build_bias_fallback_prompt(
+    main_summary: str, commentary_summary: str, transcript: str | None
+) -> str:
+    """Build the transcript-based bias prompt used when video bias analysis comes back empty."""
+    return f"""
+Analyze this content for **Linguistic Bias, Narrative Framing, and Geopolitical Context**.
+
+You are a critical media analyst. Avoid being overly cautious; if there are subtle cues in language, visual framing, or emotional tone, identify them.
+
+You MUST follow this schema strictly and provide MEANINGFUL data:
+
+1. **overall_score**: (0-100) A summary risk score. Even for neutral content, if there is a specific "point of view," the score should reflect that (e.g., 5-15).
+2. **risk_level**: "Low Risk", "Medium Risk", "High Risk", or "Critical".
+3. **categories**: You MUST provide entries for these 4 categories. DO NOT leave any out.
+   - "Cultural Bias": Does the content assume a specific cultural background? Does it use regional slang or references that exclude others?
+   - "Sensitivity Bias": Does it touch on topics that might be sensitive to specific groups (even if handled well)?
+   - "Narrative Framing": How is the story presented? Is it one-sided? Does the visual editing push a specific emotion?
+   - "Emotional Over-representation": Is the music or acting "over the top" to force a reaction?
+   
+   For each category, provide a score (0-100), a strength level, and a `detected` boolean.
+   *Crucial*: If the score is > 5, set `detected` to true.
+
+4. **policy_conflicts**: Extract 1-2 potential conflicts if possible (e.g., "Perspective Bias", "Dramatic Sensationalism"). If none, provide a generic "Standard Compliance" entry.
+5. **evidence_matrix**: Provide 3 specific metrics. Examples: "Slang Density", "Color Grading Mood", "Fast-Cut Pacing", "Camera Angle Dominance". 
+   - Each should have a `label` and a `value` (e.g., "High", "Assertive", "Subtle").
+6. **risk_vectors**: You MUST distribute 100 points across these three (they MUST sum to exactly 100):
+   - negative_skew: (0-100)
+   - neutrality: (0-100)
+   - positive_lean: (0-100)
+   Example for a happy meme: Negative 5, Neutral 20, Positive 75.
+7. **geographic_relevance**: List the specific Indian states or regions this content targets or originates from. 
+   - Be specific: e.g. ["Maharashtra", "Delhi", "Punjab"].
+   - If it's a Western meme (like Breaking Bad), identify if it has "Global" relevance or if it's trending in specific Indian urban hubs like ["Mumbai", "Bangalore"].
+
+**CONTENT TO ANALYZE:**
+
+MAIN SUMMARY:
+{main_summary}
+
+COMMENTARY SUMMARY:
+{commentary_summary}
+
+TRANSCRIPT:
+{transcript or "No transcript available"}
+
+**Output must be pure JSON.**
+"""
+
+
+# ==================== Fused (single-call) Prompts ====================
+
+FUSED_REEL_ANALYSIS_PROMPT = f"""
+Complete both tasks below for this video in a single response.
+
+Return a JSON object with two fields:
+- transcript_analysis: the result of TASK 1
+- character_analysis: the result of TASK 2
+
+=== TASK 1: TRANSCRIPT ===
+{TRANSCRIPT_ANALYSIS_PROMPT}
+=== TASK 2: CHARACTERS ===
+{CHARACTER_ANALYSIS_PROMPT}
+"""
+
+FUSED_SENTIMENT_SYSTEM_INSTRUCTION = (
+    TEMPORAL_SYSTEM_INSTRUCTION + "\n" + CHARACTER_GLOBAL_SYSTEM_INSTRUCTION
+)
+
+
+def build_fused_sentiment_prompt(video_duration_seconds: int) -> str:
+    """Build the prompt asking for both sentiment analyses in one response."""
+    return "\n".join(
+        [
+            "Complete both tasks below for this video in a single response.",
+            "",
+            "Return a JSON object with two fields:",
+            "- temporal_analysis: the result of TASK 1",
+            "- character_global_analysis: the result of TASK 2",
+            "",
+            "=== TASK 1: EMOTION TIMELINE ===",
+            build_temporal_analysis_prompt(video_duration_seconds),
+            "",
+            "=== TASK 2: CHARACTER EMOTIONS AND GLOBAL SENTIMENT ===",
+            build_character_global_analysis_prompt(video_duration_seconds),
+        ]
+    )
+
+
+# ==================== Cache Versioning ====================
+
+# Fingerprint of every prompt that feeds a cached analysis. Cached results are
+# keyed by this value, so editing any prompt above invalidates them automatically.
+PROMPT_VERSION = hashlib.sha256(
+    "\n".join(
+        [
+            TRANSCRIPT_ANALYSIS_PROMPT,
+            CHARACTER_ANALYSIS_PROMPT,
+            BIAS_ANALYSIS_PROMPT,
+            TEMPORAL_SYSTEM_INSTRUCTION,
+            CHARACTER_GLOBAL_SYSTEM_INSTRUCTION,
+            build_temporal_analysis_prompt(0),
+            build_character_global_analysis_prompt(0),
+            build_bias_fallback_prompt("", "", ""),
+            FUSED_REEL_ANALYSIS_PROMPT,
+            build_fused_sentiment_prompt(0),
+        ]
+    ).encode()
+).hexdigest()[:12]
@@ -1,5 +1,7 @@
 from .video import router as video_router
 from .root import router as root_router
 from .videos import router as videos_router
+from .metrics import router as metrics_router
+from .jobs import router as jobs_router
 
-__all__ = ["video_router", "root_router", "videos_router"]
+__all__ = ["video_router", "root_router", "videos_router", "metrics_router", "jobs_router"]
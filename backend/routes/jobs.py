@@ -0,0 +1,155 @@
+from fastapi import APIRouter, File, HTTPException, UploadFile
+import asyncio
+import os
+import shutil
+import time
+import uuid
+from dataclasses import asdict
+from functools import partial
+
+import httpx
+
+from models.jobs import JobRequest, JobResponse
+from models.video import CallMode
+from routes.video import (
+    _analyze_local_video,
+    _analyze_reel,
+    _dead_url_reason,
+    _finalize_reel_analysis,
+    _instagram_source,
+    _raise_if_known_dead,
+    _remember_if_dead,
+    _remove_file,
+    _upload_source,
+    _youtube_source,
+)
+from services.jobs import JOBS_UPLOAD_DIR, Job, PermanentJobError, get_job_pool
+from services.pipeline import PipelineContext
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def _job_response(job: Job) -> JobResponse:
+    return JobResponse(**asdict(job))
+
+
+def _is_permanent(error: Exception) -> bool:
+    """Failures a retry will not fix: dead URLs and other client errors."""
+    if _dead_url_reason(error) is not None:
+        return True
+    return (
+        isinstance(error, HTTPException)
+        and 400 <= error.status_code < 500
+        and error.status_code not in (408, 429)
+    )
+
+
+async def _analyze_job_video(
+    job: Job, ctx: PipelineContext, timings: dict[str, float], start: float
+) -> tuple[dict, dict[str, float]]:
+    """Run the reel analysis pipeline for a job and collect its stage timings."""
+    # Jobs have no client waiting on the connection; live requests go first
+    ctx.priority = "batch"
+    analysis = await _analyze_local_video(
+        ctx, partial(_analyze_reel, call_mode=job.params.get("call_mode"))
+    )
+    analysis = await asyncio.to_thread(
+        _finalize_reel_analysis, analysis, job.params.get("enable_fact_check", False)
+    )
+    # Empty when the analysis came from the cache or a concurrent identical request
+    timings.update(ctx.timings)
+    timings["total"] = time.time() - start
+    return analysis.model_dump(mode="json"), timings
+
+
+async def _run_url_job(job: Job, http_client: httpx.AsyncClient):
+    url = job.params["url"]
+    start = time.time()
+    try:
+        if job.kind == "youtube":
+            ctx = await _youtube_source(url)
+        else:
+            ctx = await _instagram_source(url, http_client)
+        timings = {"download": time.time() - start}
+        return await _analyze_job_video(job, ctx, timings, start)
+    except Exception as e:
+        print(f"ERROR in {job.kind} job {job.id}: {str(e)}")
+        response_error = HTTPException(
+            status_code=500, detail=f"Failed to analyze {job.kind}: {str(e)}"
+        )
+        _remember_if_dead(job.kind, url, e, response_error)
+        if _is_permanent(e):
+            raise PermanentJobError(str(e)) from e
+        raise
+
+
+async def _run_upload_job(job: Job):
+    start = time.time()
+    # The analysis deletes its input file; keep the upload itself for retries
+    temp_file_path = f"temp_job_{uuid.uuid4().hex}_{job.params['filename']}"
+    if not os.path.exists(job.params["path"]):
+        raise PermanentJobError("The uploaded video is no longer available")
+    try:
+        os.link(job.params["path"], temp_file_path)
+    except OSError:
+        await asyncio.to_thread(shutil.copy2, job.params["path"], temp_file_path)
+
+    ctx = PipelineContext(temp_file_path, job.params["video_hash"], job.params["filename"])
+    return await _analyze_job_video(job, ctx, {}, start)
+
+
+def _remove_job_upload(job: Job) -> None:
+    _remove_file(job.params["path"])
+
+
+def register_job_handlers(http_client: httpx.AsyncClient) -> None:
+    """Give the job pool its handlers; called from the app lifespan before it starts."""
+    pool = get_job_pool()
+    pool.register("reel", partial(_run_url_job, http_client=http_client))
+    pool.register("youtube", partial(_run_url_job, http_client=http_client))
+    pool.register("upload", _run_upload_job, on_finished=_remove_job_upload)
+
+
+@router.post("", response_model=JobResponse, status_code=202)
+async def create_job(request: JobRequest):
+    """Queue an Instagram reel or YouTube analysis; poll GET /jobs/{id} for the result."""
+    _raise_if_known_dead(request.type, request.url)
+    job = await get_job_pool().submit(request.type, request.model_dump())
+    print(f"DEBUG: [JOBS] Queued {request.type} job {job.id} for {request.url}")
+    return _job_response(job)
+
+
+@router.post("/upload", response_model=JobResponse, status_code=202)
+async def create_upload_job(
+    video: UploadFile = File(...),
+    enable_fact_check: bool = True,
+    call_mode: CallMode | None = None,
+):
+    """Queue an analysis of an uploaded video file; poll GET /jobs/{id} for the result."""
+    # Stored with the jobs (not as a temp file) so it survives restarts and retries
+    ctx = await _upload_source(video, str(JOBS_UPLOAD_DIR / "job"))
+    try:
+        job = await get_job_pool().submit(
+            "upload",
+            {
+                "path": ctx.video_path,
+                "filename": video.filename,
+                "video_hash": ctx.video_hash,
+                "enable_fact_check": enable_fact_check,
+                "call_mode": call_mode,
+            },
+        )
+    except BaseException:
+        _remove_file(ctx.video_path)
+        raise
+    print(f"DEBUG: [JOBS] Queued upload job {job.id} for {video.filename}")
+    return _job_response(job)
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Status of a job, with its result and stage timings once it has succeeded."""
+    job = await get_job_pool().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
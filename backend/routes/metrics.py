@@ -0,0 +1,31 @@
+import asyncio
+
+from fastapi import APIRouter, Request
+
+from cache import get_cache
+from routes.video import PIPELINES, _flights
+from services.gemini_context_cache import get_context_cache_registry
+from services.gemini_files import get_file_registry
+from services.gemini_scheduler import get_gemini_scheduler
+from services.http_client import http_client_stats
+from services.jobs import get_job_pool
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics")
+async def metrics(request: Request):
+    """Runtime counters for the HTTP pool, caches, request coalescing, pipelines and jobs."""
+    return {
+        "http_client": http_client_stats(
+            getattr(request.app.state, "http_client", None)
+        ),
+        "cache": get_cache().stats(),
+        "gemini_files": get_file_registry().stats(),
+        "gemini_context_caches": get_context_cache_registry().stats(),
+        "gemini_scheduler": get_gemini_scheduler().stats(),
+        "single_flight": _flights.stats(),
+        "pipelines": {name: p.stats() for name, p in PIPELINES.items()},
+        # Counts come from the jobs database
+        "jobs": await asyncio.to_thread(get_job_pool().stats),
+    }
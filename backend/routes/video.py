@@ -1,24 +1,45 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Query
+from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 import time
 import os
+import json
 import httpx
 import uuid
-import cv2
 import asyncio
 import sys
-import hashlib
 import shutil
+from dataclasses import replace
+from functools import partial
 from pathlib import Path
 from google import genai
 
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent.parent))
 
-from config import client, DOWNLOADER_BASE_URL, model, bias_model, VIDEOS_DIR
-from routes.fact_check import FactCheckReport
+from config import (
+    client,
+    DOWNLOADER_BASE_URL,
+    model,
+    bias_model,
+    VIDEOS_DIR,
+    ANALYSIS_CALL_MODE,
+)
+from models.fact_check import FactCheckReport
 from services.fact_checker import FactChecker
-from services.youtube_downloader import get_youtube_downloader
-from cache import get_cache
+from services.youtube_downloader import get_youtube_downloader, permanent_failure_reason
+from services.single_flight import SingleFlight
+from services.gemini_scheduler import get_gemini_scheduler
+from services.http_client import get_http_client
+from services.pipeline import Pipeline, PipelineContext, Stage, StageCache
+from services.transcode import upload_variant
+from services.ingest import (
+    stream_to_file,
+    save_upload,
+    VideoTooLargeError,
+    VideoDownloadError,
+)
+from cache import get_cache, content_hash, make_cache_key
 
 # Import new components
 from models.video import (
@@ -35,6 +56,12 @@ from models.video import (
     YouTubeAnalysisRequest,
     BiasAnalysis,
     BiasMetric,
+    FusedReelAnalysis,
+    FusedSentimentAnalysis,
+    CallMode,
+    VideoReadyEvent,
+    FrameEvent,
+    StreamErrorEvent,
 )
 from prompts.video import (
     TRANSCRIPT_ANALYSIS_PROMPT,
@@ -47,413 +74,993 @@ from prompts.video import (
     BIAS_ANALYSIS_PROMPT,
     build_temporal_analysis_prompt,
     build_character_global_analysis_prompt,
+    build_bias_fallback_prompt,
+    FUSED_REEL_ANALYSIS_PROMPT,
+    FUSED_SENTIMENT_SYSTEM_INSTRUCTION,
+    build_fused_sentiment_prompt,
+    PROMPT_VERSION,
 )
 from services.video_service import (
     _generate_seismograph_arrays,
     _extract_character_frames,
+    extract_frames,
+    probe_video_async,
 )
 
 router = APIRouter(prefix="/analyze-video", tags=["video"])
 
-# In-memory store for Gemini File objects to prevent double-uploading
-# Maps URL to (myfile, status, expiry)
-UPLOAD_CACHE = {}
-UPLOAD_LOCKS = {}  # Maps URL to asyncio.Lock
+# Coalesces concurrent analyses of the same URL or video content into one run
+_flights = SingleFlight()
+# Fire-and-forget work kept off the response path (temp file cleanup)
+_background_tasks: set[asyncio.Task] = set()
+# Temp videos still being read -> number of holders; the last release deletes the file
+_video_holds: dict[str, int] = {}
 
+MISINFORMATION_KEYWORDS = [
+    "misinformation",
+    "false claim",
+    "fake news",
+    "misleading claim",
+]
 
-@router.post("", response_model=VideoAnalysis)
-async def analyze_video(video: UploadFile = File(...)):
+
+def _run_in_background(coro) -> None:
+    """Run a coroutine without awaiting it, keeping a reference until it finishes."""
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def _remove_file(path: str) -> None:
+    if os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _schedule_cleanup(temp_file_path: str | None) -> None:
+    """Delete a temp file in a worker thread once the response no longer needs it."""
+    if temp_file_path:
+        _run_in_background(asyncio.to_thread(_remove_file, temp_file_path))
+
+
+def _hold_video(path: str) -> None:
+    _video_holds[path] = _video_holds.get(path, 0) + 1
+
+
+def _release_video(path: str) -> None:
+    """Drop one hold on a temp video and delete it once nobody reads it any more."""
+    holds = _video_holds.pop(path, 0) - 1
+    if holds > 0:
+        _video_holds[path] = holds
+    else:
+        _schedule_cleanup(path)
+
+
+def _video_flight(ctx: PipelineContext, run) -> asyncio.Task:
     """
-    Analyze a short-form video and return a summary.
+    Start `run()`, a shared analysis of ctx's video, holding the file until it ends.
+
+    Callers waiting on a single flight may be cancelled while the shared run goes
+    on; its own hold keeps their cleanup from deleting the video under it.
     """
-    if not video.filename.lower().endswith((".mp4", ".mov", ".webm", ".avi")):
-        raise HTTPException(status_code=400, detail="Invalid video file format")
+    video_path = ctx.video_path
+    _hold_video(video_path)
+    task = asyncio.ensure_future(run())
+    task.add_done_callback(lambda _: _release_video(video_path))
+    return task
 
-    temp_file_path = f"temp_{uuid.uuid4().hex}_{video.filename}"
-    myfile = None
 
+async def _persist_video(temp_file_path: str, persistent_video_path: Path) -> None:
+    """Keep a servable copy of the video: a hard link when possible, else a threaded copy."""
+    if persistent_video_path.exists() or not os.path.exists(temp_file_path):
+        return
     try:
-        with open(temp_file_path, "wb") as f:
-            f.write(await video.read())
+        os.link(temp_file_path, persistent_video_path)
+    except OSError:
+        try:
+            await asyncio.to_thread(shutil.copy2, temp_file_path, persistent_video_path)
+        except Exception as e:
+            print(f"Failed to save video: {e}")
 
-        start_time = time.time()
-        upload_start = time.time()
-        myfile = client.files.upload(file=temp_file_path)
-        print(f"DEBUG: [TIME] Upload took {time.time() - upload_start:.2f}s")
 
-        processing_start = time.time()
-        while myfile.state == "PROCESSING":
-            await asyncio.sleep(2)
-            myfile = client.files.get(name=myfile.name)
-        print(f"DEBUG: [TIME] Processing took {time.time() - processing_start:.2f}s")
+def _reel_cache_key(video_hash: str) -> str:
+    """Cache key for a full reel analysis of the given video content."""
+    return make_cache_key(
+        "reel", video_hash, f"{model}+{bias_model}", PROMPT_VERSION, upload_variant()
+    )
 
-        if myfile.state != "ACTIVE":
-            raise HTTPException(
-                status_code=500, detail=f"File processing failed: {myfile.state}"
+
+async def _load_cached_reel(
+    cache_key: str,
+) -> tuple[EnhancedReelAnalysis, bool] | None:
+    """
+    Return (analysis, is_stale) from the cache, dropping entries that no longer validate.
+    """
+    cache = get_cache()
+    cached = await cache.aget_stale(cache_key)
+    if cached is None:
+        return None
+    cached_result, stale = cached
+    try:
+        return EnhancedReelAnalysis(**cached_result), stale
+    except Exception as e:
+        print(f"CACHE TYPE MISMATCH for {cache_key}: {e}")
+        await cache.ainvalidate(cache_key)
+        return None
+
+
+def _finalize_reel_analysis(
+    analysis: EnhancedReelAnalysis, enable_fact_check: bool
+) -> EnhancedReelAnalysis:
+    """Apply per-request post-processing (fact-check, issue filtering) to an analysis."""
+    # The analysis may be shared with coalesced requests; never mutate it in place
+    analysis = analysis.model_copy(deep=True)
+    if enable_fact_check:
+        try:
+            fact_check_start = time.time()
+            fact_checker = FactChecker(client)
+            fact_check_report = fact_checker.fact_check_claims(
+                transcript=analysis.transcript or "",
+                analysis_summary=analysis.commentary_summary or "",
             )
+            analysis.fact_check_report = fact_check_report
+            analysis.overall_truth_score = fact_check_report.overall_truth_score
+            print(
+                f"DEBUG: [TIME] Fact-checking took {time.time() - fact_check_start:.2f}s"
+            )
+        except Exception as e:
+            print(f"Fact-checking failed: {e}")
 
-        generation_start = time.time()
-        response = client.models.generate_content(
-            model=model,
-            contents=[myfile, "Analyze this video and provide a summary."],
-            config={
-                "response_mime_type": "application/json",
-                "response_schema": VideoAnalysis,
-            },
-        )
-        print(
-            f"DEBUG: [TIME] Gemini generation took {time.time() - generation_start:.2f}s"
-        )
-        print(f"DEBUG: [TIME] Total analyze_video took {time.time() - start_time:.2f}s")
+    analysis.possible_issues = [
+        issue
+        for issue in analysis.possible_issues
+        if not any(kw in issue.lower() for kw in MISINFORMATION_KEYWORDS)
+    ]
+    return analysis
 
-        return VideoAnalysis.model_validate_json(response.text)
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Failed to analyze video: {str(e)}"
-        )
-    finally:
-        if myfile:
-            try:
-                client.files.delete(name=myfile.name)
-            except:
-                pass
-        if temp_file_path and os.path.exists(temp_file_path):
+def _schedule_refresh(cache_key: str, temp_file_path: str, run) -> None:
+    """
+    Recompute a stale cache entry in the background via `run(video_path)`.
+
+    The request's temp file is deleted once nothing holds it, so the refresh holds
+    it just long enough to make its own hard link (or threaded copy) of the video.
+    """
+    cache = get_cache()
+    if cache.is_refreshing(cache_key):
+        return
+    refresh_path = f"temp_refresh_{uuid.uuid4().hex}.mp4"
+    _hold_video(temp_file_path)
+
+    async def run_and_cleanup():
+        try:
             try:
-                os.remove(temp_file_path)
-            except:
-                pass
+                os.link(temp_file_path, refresh_path)
+            except OSError:
+                await asyncio.to_thread(shutil.copy2, temp_file_path, refresh_path)
+            finally:
+                _release_video(temp_file_path)
+            await run(refresh_path)
+        finally:
+            if os.path.exists(refresh_path):
+                os.remove(refresh_path)
 
+    print(f"DEBUG: Serving stale cache entry, refreshing in background: {cache_key}")
+    cache.refresh(cache_key, run_and_cleanup)
 
-@router.post("/reel", response_model=EnhancedReelAnalysis)
-async def analyze_reel(request: ReelAnalysisRequest, enable_fact_check: bool = False):
-    """Analyze an Instagram reel by URL with PARALLEL LLM calls."""
 
-    myfile = None
-    temp_file_path = None
+async def _download_video(http_client: httpx.AsyncClient, video_url: str, prefix: str):
+    """
+    Stream a CDN video into a new temp file.
 
+    Returns (temp_file_path, content hash). Oversized videos fail with 413.
+    """
+    temp_file_path = f"{prefix}_{uuid.uuid4().hex}.mp4"
+    video_fetch_start = time.time()
     try:
-        start_time = time.time()
-        print(
-            f"DEBUG: [TIME] Starting Reel Analysis for URL: {request.post_url} at {time.strftime('%H:%M:%S')}"
+        video_hash, size = await stream_to_file(http_client, video_url, temp_file_path)
+    except VideoTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except VideoDownloadError:
+        raise HTTPException(status_code=500, detail="Failed to download video")
+    print(
+        f"DEBUG: [TIME] Video binary download took {time.time() - video_fetch_start:.2f}s ({size} bytes)"
+    )
+    return temp_file_path, video_hash
+
+
+async def _save_upload(video: UploadFile, temp_file_path: str) -> str:
+    """Stream an upload to `temp_file_path` and return its content hash (413 if too large)."""
+    try:
+        video_hash, size = await save_upload(video, temp_file_path)
+    except VideoTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    print(f"DEBUG: [UPLOAD] Saved {size} bytes to {temp_file_path}")
+    return video_hash
+
+
+def _dead_url_reason(error: Exception) -> str | None:
+    """Error class for URL failures that a retry will not fix, or None if transient."""
+    if isinstance(error, HTTPException):
+        if error.detail == "No video media found":
+            return "no_media"
+        if error.status_code == 413:
+            return "too_large"
+        if (
+            str(error.detail).startswith("Downloader failed")
+            and 400 <= error.status_code < 500
+            and error.status_code not in (408, 429)
+        ):
+            return f"downloader_{error.status_code}"
+        return None
+    return permanent_failure_reason(error)
+
+
+def _raise_if_known_dead(kind: str, url: str) -> None:
+    """Answer a known-dead URL from the negative cache with its original error."""
+    entry = get_cache().negative.get(kind, url)
+    if entry is not None:
+        error_class, status_code, detail = entry
+        print(f"DEBUG: Negative cache hit ({error_class}) for {url}")
+        raise HTTPException(status_code=status_code, detail=detail)
+
+
+def _remember_if_dead(
+    kind: str, url: str, error: Exception, response_error: HTTPException
+) -> None:
+    """Record the error response for `url` if `error` means the URL is dead."""
+    error_class = _dead_url_reason(error)
+    if error_class is not None:
+        get_cache().negative.add(
+            kind, url, error_class, response_error.status_code, response_error.detail
         )
-        # Check Cache (DISABLED)
-        # cache = get_cache()
-        # cache_key = f"reel:{request.post_url}"
-        # cached_result = cache.get(cache_key)
-        # if cached_result:
-        #     try:
-        #         # Validate that the cached data matches the expected model
-        #         return EnhancedReelAnalysis(**cached_result)
-        #     except Exception as e:
-        #         print(f"CACHE TYPE MISMATCH for {cache_key}: {e}")
-        #         print(f"DEBUG: Invalidating cache keys for {request.post_url}")
-        #         # If cache is corrupted/wrong type, invalidate it and continue
-        #         cache.invalidate(request.post_url)
-        #         # Also invalidate the prefixed keys to be safe
-        #         cache.invalidate(f"reel:{request.post_url}")
-        #         cache.invalidate(f"sentiment:{request.post_url}")
-
-        async with httpx.AsyncClient(timeout=60.0) as http_client:
-            downloader_url = f"{DOWNLOADER_BASE_URL}/api/video"
-            params = {
-                "postUrl": request.post_url,
-                "enhanced": "true",
-                "_t": str(time.time()),
-            }
-            downloader_start = time.time()
-            downloader_response = await http_client.get(downloader_url, params=params)
-            print(
-                f"DEBUG: [TIME] Downloader metadata request took {time.time() - downloader_start:.2f}s"
-            )
 
-            if downloader_response.status_code != 200:
-                raise HTTPException(
-                    status_code=downloader_response.status_code,
-                    detail=f"Downloader failed: {downloader_response.text}",
-                )
 
-            video_data = downloader_response.json()
-            medias = video_data.get("data", {}).get("medias", [])
-            if not medias:
-                raise HTTPException(status_code=400, detail="No video media found")
+def _gemini_stage(
+    name: str,
+    model_name: str,
+    prompt,
+    schema,
+    deps: tuple[str, ...] = (),
+    system_instruction: str | None = None,
+    with_video: bool = True,
+    shared_context: bool = False,
+    postprocess=None,
+    **stage_options,
+) -> Stage:
+    """
+    Declare a stage that asks Gemini for a structured `schema` reply.
+
+    `prompt` is a string or a `(ctx, deps) -> str` builder. With `with_video` the
+    shared Gemini upload of the video is sent along with the prompt. With
+    `shared_context` as well, the video and system instruction are referenced
+    through a Gemini context cache shared with the run's other stages on the
+    same model and system instruction (when context caching is enabled).
+    Results are cached per content hash, model and prompt.
+    """
+    build_prompt = prompt if callable(prompt) else (lambda ctx, deps: prompt)
+
+    async def run(ctx: PipelineContext, deps: dict):
+        stage_prompt = build_prompt(ctx, deps)
+
+        async def generate(myfile=None, cached_content=None):
+            response = await get_gemini_scheduler().generate_content(
+                client,
+                model=model_name,
+                priority=ctx.priority,
+                kind=name,
+                hedge=True,
+                contents=[myfile, stage_prompt] if myfile is not None else stage_prompt,
+                config=genai.types.GenerateContentConfig(
+                    # A context cache already carries the system instruction
+                    system_instruction=None if cached_content else system_instruction,
+                    cached_content=cached_content,
+                    response_mime_type="application/json",
+                    response_schema=schema,
+                ),
+            )
+            ctx.record_usage(name, getattr(response, "usage_metadata", None))
+            if not response.text:
+                raise ValueError(
+                    f"{name} returned empty response. Candidates: {response.candidates}"
+                )
+            return schema.model_validate_json(response.text)
 
-            video_url = medias[0].get("url")
-            video_fetch_start = time.time()
-            video_response = await http_client.get(video_url)
-            print(
-                f"DEBUG: [TIME] Video binary download took {time.time() - video_fetch_start:.2f}s"
+        if with_video and shared_context:
+            result = await ctx.run_with_context_cache(
+                name, model_name, system_instruction, generate
             )
-            if video_response.status_code != 200:
-                raise HTTPException(status_code=500, detail="Failed to download video")
+        elif with_video:
+            result = await ctx.run_with_file(generate)
+        else:
+            result = await generate()
+        if postprocess is not None:
+            postprocess(ctx, result)
+        return result
+
+    return Stage(
+        name=name,
+        run=run,
+        deps=deps,
+        cache=StageCache(
+            key=lambda ctx, deps: (
+                model_name,
+                (system_instruction or "") + build_prompt(ctx, deps),
+            ),
+            schema=schema,
+        ),
+        **stage_options,
+    )
+
+
+async def _probe_stage(ctx: PipelineContext, deps: dict):
+    # Local probing runs in a worker thread while Gemini uploads and analyzes
+    return await probe_video_async(ctx.video_path)
+
 
-            temp_file_path = f"temp_reel_{uuid.uuid4().hex}.mp4"
-            with open(temp_file_path, "wb") as f:
-                f.write(video_response.content)
+PROBE_STAGE = Stage("probe", _probe_stage, optional=True)
 
-        # REDUCED DOUBLE WORK: Check if file already uploaded
-        cache_key = request.post_url
-        if cache_key not in UPLOAD_LOCKS:
-            UPLOAD_LOCKS[cache_key] = asyncio.Lock()
 
-        # DISABLE CACHING - causing 403 errors with expired Gemini files
-        # For better caching, implement at the data level, not at the file level
+def _part_stage(name: str, fused_stage: str, field_name: str, **stage_options) -> Stage:
+    """Expose one part of a fused stage's result under its fan-out stage name."""
+
+    async def run(ctx: PipelineContext, deps: dict):
+        return getattr(deps[fused_stage], field_name)
+
+    return Stage(name, run, deps=(fused_stage,), **stage_options)
+
+
+# --- Reel analysis: transcript, characters and bias with frame extraction ---
+
+
+# Optional stages whose failure leaves a section out of the reel analysis
+# (a failed probe or bias fallback only loses precision, not content)
+REEL_DEGRADABLE_STAGES = ("characters", "bias", "frames")
+
+
+def _log_bias_result(ctx: PipelineContext, result: BiasAnalysis) -> None:
+    print(f"DEBUG: [BIAS ANALYSIS] Validated Bias Analysis for {ctx.source} ({bias_model}):")
+    print(f"  - overall_score: {result.overall_score}")
+    print(f"  - risk_level: {result.risk_level}")
+    print(f"  - categories count: {len(result.categories)}")
+    for cat in result.categories:
+        print(f"    - {cat.label}: score={cat.score}, detected={cat.detected}")
+    print(f"  - policy_conflicts count: {len(result.policy_conflicts)}")
+    print(f"  - evidence_matrix count: {len(result.evidence_matrix)}")
+    print(f"  - risk_vectors: {result.risk_vectors}")
+    print(f"  - geographic_relevance: {result.geographic_relevance}")
+
+    # Warning if all scores are zero
+    if result.overall_score == 0 and all(cat.score == 0 for cat in result.categories):
         print(
-            f"DEBUG: [SPEED] Uploading new Gemini File (caching disabled to prevent 403 errors)"
+            f"WARNING: [BIAS ANALYSIS] All bias scores are zero! Data may be incomplete."
         )
-        upload_start = time.time()
-        myfile = client.files.upload(file=temp_file_path)
+
+
+def _bias_has_data(ctx: PipelineContext, deps: dict) -> bool:
+    """False when the video-based bias analysis came back empty (all zeros)."""
+    bias_result = deps["bias"]
+    if bias_result is None:
+        # The bias stage failed: the run is degraded, not retried from the transcript
+        return True
+    empty = (
+        bias_result.overall_score == 0
+        and len(bias_result.categories) > 0
+        and all(cat.score == 0 for cat in bias_result.categories)
+    )
+    if empty:
         print(
-            f"DEBUG: [TIME] Gemini file upload took {time.time() - upload_start:.2f}s"
+            f"WARNING: [BIAS CHECK] Video-based bias analysis returned empty data (all zeros)"
         )
-
-        processing_start = time.time()
-        while myfile.state == "PROCESSING":
-            await asyncio.sleep(1)
-            myfile = client.files.get(name=myfile.name)
+        print(f"DEBUG: [BIAS CHECK] Attempting fallback using transcript...")
+    return not empty
+
+
+def _bias_fallback_prompt(ctx: PipelineContext, deps: dict) -> str:
+    transcript_result = deps["transcript"]
+    return build_bias_fallback_prompt(
+        transcript_result.main_summary,
+        transcript_result.commentary_summary,
+        transcript_result.transcript,
+    )
+
+
+async def _decode_frames_stage(ctx: PipelineContext, deps: dict) -> dict[float, str]:
+    # Starts as soon as character timestamps are known, while the transcript
+    # and bias calls are usually still in flight
+    probe = deps["probe"]
+    if deps["characters"] is None:
+        return {}
+    timestamps = [
+        c.timestamp for c in deps["characters"].characters if c.timestamp is not None
+    ]
+    on_frame = None
+    if ctx.events is not None:
+        # Frames are decoded in a worker thread; publish each one from the loop
+        loop = asyncio.get_running_loop()
+        on_frame = lambda timestamp, image: loop.call_soon_threadsafe(
+            ctx.emit, "frame", FrameEvent(timestamp=timestamp, frame_image_b64=image)
+        )
+    frames = await asyncio.to_thread(
+        extract_frames, ctx.video_path, timestamps, probe.fps if probe else None, on_frame
+    )
+    # extract_frames skips a missing video silently; here it degrades the result
+    if timestamps and not frames and not os.path.exists(ctx.video_path):
+        raise FileNotFoundError(f"Video file is gone: {ctx.video_path}")
+    return frames
+
+
+async def _assemble_reel_stage(ctx: PipelineContext, deps: dict) -> EnhancedReelAnalysis:
+    transcript_result = deps["transcript"]
+    bias_result = deps["bias"]
+    character_result = deps["characters"]
+    if deps["bias_fallback"] is not None:
+        bias_result = deps["bias_fallback"]
         print(
-            f"DEBUG: [TIME] Gemini file processing wait took {time.time() - processing_start:.2f}s"
+            f"DEBUG: [BIAS FALLBACK] Fallback successful - overall_score: {bias_result.overall_score}"
         )
+    analysis = EnhancedReelAnalysis(
+        main_summary=transcript_result.main_summary,
+        commentary_summary=transcript_result.commentary_summary,
+        possible_issues=transcript_result.possible_issues,
+        bias_analysis=bias_result,
+        transcript=transcript_result.transcript,
+        characters=[
+            Character(**attr.model_dump()) for attr in character_result.characters
+        ]
+        if character_result is not None
+        else [],
+        suggestions=[],
+        analysis_timestamp=time.time(),
+        degraded_stages=[name for name in ctx.degraded if name in REEL_DEGRADABLE_STAGES],
+    )
+    return await _extract_character_frames(analysis, ctx.video_path, deps["frames"] or {})
+
+
+def _build_reel_pipeline(fused: bool) -> Pipeline:
+    if fused:
+        # One call returns both same-model analyses, so the video is sent once for them
+        analysis_stages = [
+            _gemini_stage(
+                "transcript_characters", model, FUSED_REEL_ANALYSIS_PROMPT, FusedReelAnalysis
+            ),
+            _part_stage(
+                "transcript", "transcript_characters", "transcript_analysis", event="transcript"
+            ),
+            _part_stage(
+                "characters", "transcript_characters", "character_analysis", event="characters"
+            ),
+        ]
+    else:
+        analysis_stages = [
+            # Same model and no system instruction: both reference one context cache
+            _gemini_stage(
+                "transcript",
+                model,
+                TRANSCRIPT_ANALYSIS_PROMPT,
+                TranscriptAnalysis,
+                shared_context=True,
+                event="transcript",
+            ),
+            _gemini_stage(
+                "characters",
+                model,
+                CHARACTER_ANALYSIS_PROMPT,
+                CharacterAnalysis,
+                shared_context=True,
+                optional=True,
+                event="characters",
+            ),
+        ]
+    return Pipeline(
+        "reel_fused" if fused else "reel",
+        [
+            PROBE_STAGE,
+            *analysis_stages,
+            _gemini_stage(
+                "bias",
+                bias_model,
+                BIAS_ANALYSIS_PROMPT,
+                BiasAnalysis,
+                postprocess=_log_bias_result,
+                # Without it the reel is still served, listed in degraded_stages
+                optional=True,
+                event="bias",
+            ),
+            # Transcript-based retry when the video-based bias analysis is empty;
+            # if it fails, the original (empty) result is kept
+            _gemini_stage(
+                "bias_fallback",
+                bias_model,
+                _bias_fallback_prompt,
+                BiasAnalysis,
+                deps=("bias", "transcript"),
+                with_video=False,
+                optional=True,
+                skip=_bias_has_data,
+                # Supersedes the empty `bias` event
+                event="bias",
+            ),
+            # Without it the characters are served without images, listed in degraded_stages
+            Stage("frames", _decode_frames_stage, deps=("characters", "probe"), optional=True),
+            Stage(
+                "analysis",
+                _assemble_reel_stage,
+                deps=("transcript", "characters", "bias", "bias_fallback", "frames"),
+            ),
+        ],
+        output="analysis",
+    )
+
+
+REEL_PIPELINE = _build_reel_pipeline(fused=False)
+REEL_FUSED_PIPELINE = _build_reel_pipeline(fused=True)
+
+
+# --- Sentiment analysis: temporal emotions and global character emotions ---
+
+
+async def _duration_stage(ctx: PipelineContext, deps: dict) -> int:
+    """Video duration in whole seconds: known from the source, else probed (30 if unreadable)."""
+    if "duration" in ctx.params:
+        return ctx.params["duration"]
+    probe = deps["probe"]
+    if probe is None or probe.fps <= 0:
+        return 30
+    return int(probe.duration)
+
+
+async def _assemble_sentiment_stage(ctx: PipelineContext, deps: dict) -> dict:
+    temporal_result = deps["temporal_emotions"]
+    character_result = deps["character_global"]
+    video_duration = deps["duration"]
+
+    sentiment_result = SentimentAnalysis(
+        emotion_timeline=temporal_result.emotion_timeline,
+        emotion_seismograph=temporal_result.emotion_seismograph,
+        character_emotions=character_result.character_emotions,
+        global_category=character_result.global_category,
+        confidence_score=character_result.confidence_score,
+    )
+
+    transcript_segments = [
+        {
+            "id": i,
+            "start": seg.start,
+            "end": seg.end,
+            "text": f"[{seg.start:.0f}s-{seg.end:.0f}s] {seg.emotion} emotion (intensity: {seg.intensity:.2f})",
+            "emotion": seg.emotion,
+        }
+        for i, seg in enumerate(sentiment_result.emotion_timeline)
+    ]
 
-        if myfile.state != "ACTIVE":
-            raise HTTPException(
-                status_code=500, detail=f"Gemini processing failed: {myfile.state}"
-            )
+    # Save persistent copy for frontend serving
+    video_filename = f"video_{ctx.video_hash}.mp4"
+    await _persist_video(ctx.video_path, VIDEOS_DIR / video_filename)
 
-        step_start_time = time.time()
-        print(f"DEBUG: Starting Analysis for {request.post_url}")
-
-        async def analyze_transcript_faster() -> TranscriptAnalysis:
-            sub_step_start = time.time()
-            response = await client.aio.models.generate_content(
-                model=model,
-                contents=[myfile, TRANSCRIPT_ANALYSIS_PROMPT],
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": TranscriptAnalysis,
-                },
-            )
-            print(
-                f"DEBUG: [TIME] analyze_transcript_faster took {time.time() - sub_step_start:.2f}s"
-            )
-            return TranscriptAnalysis.model_validate_json(response.text)
-
-        async def analyze_characters_faster() -> CharacterAnalysis:
-            sub_step_start = time.time()
-            response = await client.aio.models.generate_content(
-                model=model,
-                contents=[myfile, CHARACTER_ANALYSIS_PROMPT],
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": CharacterAnalysis,
-                },
-            )
-            print(
-                f"DEBUG: [TIME] analyze_characters_faster took {time.time() - sub_step_start:.2f}s"
-            )
-            return CharacterAnalysis.model_validate_json(response.text)
+    return {
+        "emotion_timeline": [
+            {
+                "start": seg.start,
+                "end": seg.end,
+                "emotion": seg.emotion,
+                "intensity": seg.intensity,
+            }
+            for seg in sentiment_result.emotion_timeline
+        ],
+        "emotion_seismograph": sentiment_result.emotion_seismograph.model_dump(),
+        "character_emotions": [
+            char.model_dump()
+            | {
+                "dominantEmotion": char.dominant_emotion,
+                "screenTime": char.screen_time,
+            }
+            for char in sentiment_result.character_emotions
+        ],
+        "global_category": sentiment_result.global_category,
+        "confidence": sentiment_result.confidence_score,
+        "transcript_segments": transcript_segments,
+        "duration": video_duration,
+        "video_url": f"/videos/{video_filename}",
+        "analysis_timestamp": time.time(),
+    }
+
+
+def _build_sentiment_pipeline(fused: bool) -> Pipeline:
+    if fused:
+        analysis_stages = [
+            _gemini_stage(
+                "sentiment_fused",
+                model,
+                lambda ctx, deps: build_fused_sentiment_prompt(deps["duration"]),
+                FusedSentimentAnalysis,
+                deps=("duration",),
+                system_instruction=FUSED_SENTIMENT_SYSTEM_INSTRUCTION,
+            ),
+            _part_stage(
+                "temporal_emotions",
+                "sentiment_fused",
+                "temporal_analysis",
+                event="temporal_emotions",
+            ),
+            _part_stage(
+                "character_global",
+                "sentiment_fused",
+                "character_global_analysis",
+                event="character_global",
+            ),
+        ]
+    else:
+        # Each call has its own system instruction, so a (video, system instruction)
+        # context cache would be used once per run; the video is sent inline
+        analysis_stages = [
+            _gemini_stage(
+                "temporal_emotions",
+                model,
+                lambda ctx, deps: build_temporal_analysis_prompt(deps["duration"]),
+                TemporalEmotionAnalysis,
+                deps=("duration",),
+                system_instruction=TEMPORAL_SYSTEM_INSTRUCTION,
+                event="temporal_emotions",
+            ),
+            _gemini_stage(
+                "character_global",
+                model,
+                lambda ctx, deps: build_character_global_analysis_prompt(deps["duration"]),
+                CharacterGlobalAnalysis,
+                deps=("duration",),
+                system_instruction=CHARACTER_GLOBAL_SYSTEM_INSTRUCTION,
+                event="character_global",
+            ),
+        ]
+    return Pipeline(
+        "sentiment_fused" if fused else "sentiment",
+        [
+            Stage(
+                "probe",
+                _probe_stage,
+                optional=True,
+                skip=lambda ctx, deps: "duration" in ctx.params,
+            ),
+            Stage("duration", _duration_stage, deps=("probe",)),
+            *analysis_stages,
+            Stage(
+                "result",
+                _assemble_sentiment_stage,
+                deps=("temporal_emotions", "character_global", "duration"),
+            ),
+        ],
+        output="result",
+    )
+
+
+SENTIMENT_PIPELINE = _build_sentiment_pipeline(fused=False)
+SENTIMENT_FUSED_PIPELINE = _build_sentiment_pipeline(fused=True)
+
+
+# --- Plain video summary ---
+
+SUMMARY_PIPELINE = Pipeline(
+    "summary",
+    [
+        _gemini_stage(
+            "summary", model, "Analyze this video and provide a summary.", VideoAnalysis
+        )
+    ],
+    output="summary",
+)
 
-        async def analyze_bias_faster() -> BiasAnalysis:
-            sub_step_start = time.time()
-            print(
-                f"DEBUG: [BIAS ANALYSIS] Starting bias analysis for {request.post_url}"
-            )
-            print(f"DEBUG: [BIAS ANALYSIS] Using model: {bias_model}")
-
-            response = await client.aio.models.generate_content(
-                model=bias_model,
-                contents=[myfile, BIAS_ANALYSIS_PROMPT],
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": BiasAnalysis,
-                },
-            )
-            print(
-                f"DEBUG: [TIME] analyze_bias_faster took {time.time() - sub_step_start:.2f}s"
+PIPELINES = {
+    p.name: p
+    for p in (
+        REEL_PIPELINE,
+        REEL_FUSED_PIPELINE,
+        SENTIMENT_PIPELINE,
+        SENTIMENT_FUSED_PIPELINE,
+        SUMMARY_PIPELINE,
+    )
+}
+
+
+def _is_fused(call_mode: CallMode | None) -> bool:
+    """Resolve a per-request call mode against the ANALYSIS_CALL_MODE default."""
+    return (call_mode or ANALYSIS_CALL_MODE) == "fused"
+
+
+# --- Pipeline runners: whole-result cache, stale refresh and coalescing ---
+
+
+async def _run_reel_pipeline(
+    ctx: PipelineContext, call_mode: CallMode | None = None, use_cache: bool = True
+) -> EnhancedReelAnalysis:
+    """
+    Run the transcript/character/bias analysis on a local video file.
+
+    Returns the cached analysis for this content when there is one (refreshing it
+    in the background if it is stale); otherwise the result (with character
+    frames) is cached before it is returned. The call mode only decides how a
+    missing result is computed; both modes share the cached result.
+    """
+    cache_key = _reel_cache_key(ctx.video_hash)
+    cached = await _load_cached_reel(cache_key) if use_cache else None
+    if cached is not None:
+        cached_analysis, stale = cached
+        if stale:
+            _schedule_refresh(
+                cache_key,
+                ctx.video_path,
+                lambda path: _run_reel_pipeline(
+                    replace(ctx, video_path=path, priority="batch", events=None),
+                    call_mode,
+                    use_cache=False,
+                ),
             )
+        return cached_analysis
 
-            # Log raw response (first 500 chars)
-            print(f"DEBUG: [BIAS ANALYSIS] Raw response text: {response.text[:500]}...")
-
-            # Validate and log results
-            result = BiasAnalysis.model_validate_json(response.text)
-
-            print(f"DEBUG: [BIAS ANALYSIS] Validated Bias Analysis:")
-            print(f"  - overall_score: {result.overall_score}")
-            print(f"  - risk_level: {result.risk_level}")
-            print(f"  - categories count: {len(result.categories)}")
-            for cat in result.categories:
-                print(f"    - {cat.label}: score={cat.score}, detected={cat.detected}")
-            print(f"  - policy_conflicts count: {len(result.policy_conflicts)}")
-            print(f"  - evidence_matrix count: {len(result.evidence_matrix)}")
-            print(f"  - risk_vectors: {result.risk_vectors}")
-            print(f"  - geographic_relevance: {result.geographic_relevance}")
-
-            # Warning if all scores are zero
-            if result.overall_score == 0 and all(
-                cat.score == 0 for cat in result.categories
-            ):
-                print(
-                    f"WARNING: [BIAS ANALYSIS] All bias scores are zero! Data may be incomplete."
-                )
+    print(f"DEBUG: Starting Analysis for {ctx.source}")
+    pipeline = REEL_FUSED_PIPELINE if _is_fused(call_mode) else REEL_PIPELINE
+    analysis = await pipeline.run(ctx)
+    if analysis.degraded_stages:
+        # A partial result is served but not cached, so the next request retries
+        print(f"WARNING: Serving partial analysis for {ctx.source}: {analysis.degraded_stages}")
+    else:
+        await get_cache().aset(cache_key, analysis.model_dump())
+    return analysis
 
-            return result
 
-        print(
-            f"DEBUG: [TIME] Gemini wait/upload for {request.post_url} took {time.time() - start_time:.2f}s"
-        )
+async def _analyze_reel(
+    ctx: PipelineContext, call_mode: CallMode | None = None
+) -> EnhancedReelAnalysis:
+    """Analyze a local video, coalescing concurrent requests for the same content."""
+    return await _flights.do(
+        _reel_cache_key(ctx.video_hash),
+        lambda: _video_flight(ctx, lambda: _run_reel_pipeline(ctx, call_mode)),
+    )
+
+
+def _sentiment_cache_key(video_hash: str) -> str:
+    """Cache key for a sentiment analysis of the given video content."""
+    return make_cache_key("sentiment", video_hash, model, PROMPT_VERSION, upload_variant())
 
-        analysis_start = time.time()
-        transcript_result, character_result, bias_result = await asyncio.gather(
-            analyze_transcript_faster(),
-            analyze_characters_faster(),
-            analyze_bias_faster(),
+
+async def _run_sentiment_pipeline(
+    ctx: PipelineContext, call_mode: CallMode | None = None, use_cache: bool = True
+):
+    """Run the temporal and global character emotion analyses on a video file."""
+    cache = get_cache()
+    cache_key = _sentiment_cache_key(ctx.video_hash)
+
+    cached = await cache.aget_stale(cache_key) if use_cache else None
+    cached_result, stale = cached if cached is not None else (None, False)
+    if cached_result and "emotion_timeline" in cached_result:
+        if stale:
+            _schedule_refresh(
+                cache_key,
+                ctx.video_path,
+                lambda path: _run_sentiment_pipeline(
+                    replace(ctx, video_path=path, priority="batch", events=None),
+                    call_mode,
+                    use_cache=False,
+                ),
+            )
+        # The served video may have been deleted; restore it from this request's copy
+        await _persist_video(
+            ctx.video_path, VIDEOS_DIR / f"video_{ctx.video_hash}.mp4"
         )
-        print(
-            f"DEBUG: [TIME] Parallel analysis calls took {time.time() - analysis_start:.2f}s (TRUE ASYNC)"
+        return cached_result
+
+    pipeline = SENTIMENT_FUSED_PIPELINE if _is_fused(call_mode) else SENTIMENT_PIPELINE
+    result = await pipeline.run(ctx)
+    await cache.aset(cache_key, result)
+    return result
+
+
+async def _analyze_sentiment(ctx: PipelineContext, call_mode: CallMode | None = None):
+    """Run the sentiment analysis; concurrent requests for the same content share a single run."""
+    return await _flights.do(
+        _sentiment_cache_key(ctx.video_hash),
+        lambda: _video_flight(ctx, lambda: _run_sentiment_pipeline(ctx, call_mode)),
+    )
+
+
+# --- Input sources: each yields a local temp file described by a PipelineContext ---
+
+
+async def _instagram_source(
+    post_url: str, http_client: httpx.AsyncClient
+) -> PipelineContext:
+    """Resolve a post through the downloader service and stream its video to disk."""
+    downloader_url = f"{DOWNLOADER_BASE_URL}/api/video"
+    params = {
+        "postUrl": post_url,
+        "enhanced": "true",
+        "_t": str(time.time()),
+    }
+    downloader_start = time.time()
+    downloader_response = await http_client.get(downloader_url, params=params)
+    print(
+        f"DEBUG: [TIME] Downloader metadata request took {time.time() - downloader_start:.2f}s"
+    )
+
+    if downloader_response.status_code != 200:
+        raise HTTPException(
+            status_code=downloader_response.status_code,
+            detail=f"Downloader failed: {downloader_response.text}",
         )
-        print(f"DEBUG: Analysis results for {request.post_url} received.")
 
-        # Check bias result quality and implement fallback
-        print(f"DEBUG: [BIAS CHECK] Checking bias_result quality...")
-        if (
-            bias_result.overall_score == 0
-            and len(bias_result.categories) > 0
-            and all(cat.score == 0 for cat in bias_result.categories)
-        ):
-            print(
-                f"WARNING: [BIAS CHECK] Video-based bias analysis returned empty data (all zeros)"
+    video_data = downloader_response.json()
+    medias = video_data.get("data", {}).get("medias", [])
+    if not medias:
+        raise HTTPException(status_code=400, detail="No video media found")
+
+    video_url = medias[0].get("url")
+    temp_file_path, video_hash = await _download_video(http_client, video_url, "temp_reel")
+    return PipelineContext(temp_file_path, video_hash, post_url)
+
+
+async def _youtube_source(video_url: str) -> PipelineContext:
+    """Download a YouTube video or Short to a new temp file off the event loop."""
+    temp_file_path = f"temp_youtube_{uuid.uuid4().hex}.mp4"
+    download_start = time.time()
+    _, metadata = await get_youtube_downloader().download_video(
+        video_url, temp_file_path, max_quality="720p"
+    )
+    print(f"DEBUG: [TIME] YouTube download took {time.time() - download_start:.2f}s")
+    try:
+        video_hash = await asyncio.to_thread(content_hash, temp_file_path)
+    except BaseException:
+        _schedule_cleanup(temp_file_path)
+        raise
+    return PipelineContext(
+        temp_file_path,
+        video_hash,
+        video_url,
+        params={"duration": metadata.get("length", 30)},
+    )
+
+
+async def _upload_source(video: UploadFile, prefix: str) -> PipelineContext:
+    """Stream an uploaded video to a new temp file (400 for unsupported formats)."""
+    if not video.filename.lower().endswith((".mp4", ".mov", ".webm", ".avi")):
+        raise HTTPException(status_code=400, detail="Invalid video file format")
+
+    temp_file_path = f"{prefix}_{uuid.uuid4().hex}_{video.filename}"
+    print(f"DEBUG: [UPLOAD] Reading uploaded file: {video.filename}")
+    video_hash = await _save_upload(video, temp_file_path)
+    return PipelineContext(temp_file_path, video_hash, video.filename)
+
+
+async def _analyze_local_video(ctx: PipelineContext, analyze):
+    """Run `analyze(ctx)` and delete the source's temp file once nothing reads it."""
+    video_path = ctx.video_path
+    _hold_video(video_path)
+    try:
+        return await analyze(ctx)
+    finally:
+        _release_video(video_path)
+
+
+async def _analyze_source(source, analyze):
+    """Await an input source, then analyze the video it produced."""
+    return await _analyze_local_video(await source, analyze)
+
+
+# --- Server-Sent Events: stage results streamed as they complete ---
+
+# Comment line sent when no event has gone out for this long, so proxies keep the stream open
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+
+
+def _sse(event: str, payload) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(payload))}\n\n"
+
+
+def _event_stream(produce, video_path: str | None = None) -> StreamingResponse:
+    """
+    Run `produce(events)` and stream what it puts on `events` as Server-Sent Events.
+
+    `produce` publishes `(event, payload)` tuples while it works; its return value
+    becomes the final `done` event, and an exception becomes an `error` event
+    (StreamErrorEvent). If the client disconnects, the stream stops but the
+    analysis itself, which may be shared with other requests, runs to the end
+    and its result is cached for the next request.
+
+    A `video_path` the request already saved is held until `produce` is done or
+    the stream ends, even if the client is gone before the body starts.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def run():
+        try:
+            events.put_nowait(("done", await produce(events)))
+        except HTTPException as e:
+            events.put_nowait(
+                ("error", StreamErrorEvent(status_code=e.status_code, detail=str(e.detail)))
             )
-            print(f"DEBUG: [BIAS CHECK] Attempting fallback using transcript...")
+        except Exception as e:
+            events.put_nowait(("error", StreamErrorEvent(status_code=500, detail=str(e))))
+        finally:
+            events.put_nowait(None)
+
+    if video_path is not None:
+        _hold_video(video_path)
+    # Started here rather than in body(), which never runs if the client is gone
+    # before the response starts; the callback fires even if run() never does
+    task = asyncio.ensure_future(run())
+    if video_path is not None:
+        task.add_done_callback(lambda _: _release_video(video_path))
+
+    async def body():
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(events.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    return
+                yield _sse(*item)
+        finally:
+            # Only stops waiting; the shielded analysis flight keeps running
+            task.cancel()
 
-            try:
-                # Create fallback analysis using transcript
-                fallback_prompt = f"""
-Analyze this content for **Linguistic Bias, Narrative Framing, and Geopolitical Context**.
-
-You are a critical media analyst. Avoid being overly cautious; if there are subtle cues in language, visual framing, or emotional tone, identify them.
-
-You MUST follow this schema strictly and provide MEANINGFUL data:
-
-1. **overall_score**: (0-100) A summary risk score. Even for neutral content, if there is a specific "point of view," the score should reflect that (e.g., 5-15).
-2. **risk_level**: "Low Risk", "Medium Risk", "High Risk", or "Critical".
-3. **categories**: You MUST provide entries for these 4 categories. DO NOT leave any out.
-   - "Cultural Bias": Does the content assume a specific cultural background? Does it use regional slang or references that exclude others?
-   - "Sensitivity Bias": Does it touch on topics that might be sensitive to specific groups (even if handled well)?
-   - "Narrative Framing": How is the story presented? Is it one-sided? Does the visual editing push a specific emotion?
-   - "Emotional Over-representation": Is the music or acting "over the top" to force a reaction?
-   
-   For each category, provide a score (0-100), a strength level, and a `detected` boolean.
-   *Crucial*: If the score is > 5, set `detected` to true.
-
-4. **policy_conflicts**: Extract 1-2 potential conflicts if possible (e.g., "Perspective Bias", "Dramatic Sensationalism"). If none, provide a generic "Standard Compliance" entry.
-5. **evidence_matrix**: Provide 3 specific metrics. Examples: "Slang Density", "Color Grading Mood", "Fast-Cut Pacing", "Camera Angle Dominance". 
-   - Each should have a `label` and a `value` (e.g., "High", "Assertive", "Subtle").
-6. **risk_vectors**: You MUST distribute 100 points across these three (they MUST sum to exactly 100):
-   - negative_skew: (0-100)
-   - neutrality: (0-100)
-   - positive_lean: (0-100)
-   Example for a happy meme: Negative 5, Neutral 20, Positive 75.
-7. **geographic_relevance**: List the specific Indian states or regions this content targets or originates from. 
-   - Be specific: e.g. ["Maharashtra", "Delhi", "Punjab"].
-   - If it's a Western meme (like Breaking Bad), identify if it has "Global" relevance or if it's trending in specific Indian urban hubs like ["Mumbai", "Bangalore"].
-
-**CONTENT TO ANALYZE:**
-
-MAIN SUMMARY:
-{transcript_result.main_summary}
-
-COMMENTARY SUMMARY:
-{transcript_result.commentary_summary}
-
-TRANSCRIPT:
-{transcript_result.transcript or "No transcript available"}
-
-**Output must be pure JSON.**
-"""
-
-                fallback_start = time.time()
-                print(
-                    f"DEBUG: [BIAS FALLBACK] Sending transcript-based analysis to model"
-                )
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-                fallback_response = await client.aio.models.generate_content(
-                    model=bias_model,
-                    contents=fallback_prompt,
-                    config={
-                        "response_mime_type": "application/json",
-                        "response_schema": BiasAnalysis,
-                    },
-                )
 
-                print(
-                    f"DEBUG: [BIAS FALLBACK] Fallback analysis took {time.time() - fallback_start:.2f}s"
-                )
+async def _analyze_streamed(events: asyncio.Queue, ctx: PipelineContext, analyze):
+    """Analyze a local video, publishing its pipeline's progress to `events`."""
+    ctx.events = events
+    ctx.emit("download", VideoReadyEvent(source=ctx.source, video_hash=ctx.video_hash))
+    return await _analyze_local_video(ctx, analyze)
 
-                bias_result = BiasAnalysis.model_validate_json(fallback_response.text)
-                print(
-                    f"DEBUG: [BIAS FALLBACK] Fallback successful - overall_score: {bias_result.overall_score}"
-                )
-                print(f"DEBUG: [BIAS FALLBACK] Categories:")
-                for cat in bias_result.categories:
-                    print(
-                        f"  - {cat.label}: score={cat.score}, detected={cat.detected}"
-                    )
-            except Exception as e:
-                print(f"ERROR: [BIAS CHECK] Fallback failed: {e}")
-                print(f"DEBUG: [BIAS CHECK] Keeping original (empty) result")
-                # Keep original (empty) result
-
-        analysis = EnhancedReelAnalysis(
-            main_summary=transcript_result.main_summary,
-            commentary_summary=transcript_result.commentary_summary,
-            possible_issues=transcript_result.possible_issues,
-            bias_analysis=bias_result,
-            transcript=transcript_result.transcript,
-            characters=[
-                Character(**attr.model_dump()) for attr in character_result.characters
-            ],
-            suggestions=[],
-            analysis_timestamp=time.time(),
-        )
-        print(f"DEBUG: EnhancedReelAnalysis object created successfully.")
 
-        frame_extraction_start = time.time()
-        analysis = await _extract_character_frames(analysis, temp_file_path)
-        print(
-            f"DEBUG: [TIME] Frame extraction took {time.time() - frame_extraction_start:.2f}s"
+# --- Endpoints ---
+
+
+@router.post("", response_model=VideoAnalysis)
+async def analyze_video(video: UploadFile = File(...)):
+    """
+    Analyze a short-form video and return a summary.
+    """
+    ctx = await _upload_source(video, "temp")
+    try:
+        return await _analyze_local_video(ctx, SUMMARY_PIPELINE.run)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to analyze video: {str(e)}"
         )
 
-        if enable_fact_check:
-            try:
-                fact_check_start = time.time()
-                fact_checker = FactChecker(client)
-                fact_check_report = fact_checker.fact_check_claims(
-                    transcript=analysis.transcript or "",
-                    analysis_summary=analysis.commentary_summary or "",
-                )
-                analysis.fact_check_report = fact_check_report
-                analysis.overall_truth_score = fact_check_report.overall_truth_score
-                print(
-                    f"DEBUG: [TIME] Fact-checking took {time.time() - fact_check_start:.2f}s"
-                )
-            except Exception as e:
-                print(f"Fact-checking failed: {e}")
-
-        misinformation_keywords = [
-            "misinformation",
-            "false claim",
-            "fake news",
-            "misleading claim",
-        ]
-        analysis.possible_issues = [
-            issue
-            for issue in analysis.possible_issues
-            if not any(kw in issue.lower() for kw in misinformation_keywords)
-        ]
 
-        # Save to Cache (DISABLED)
-        # cache.set(cache_key, analysis.model_dump())
+@router.post("/reel", response_model=EnhancedReelAnalysis)
+async def analyze_reel(
+    request: ReelAnalysisRequest,
+    enable_fact_check: bool = False,
+    call_mode: CallMode | None = None,
+    http_client: httpx.AsyncClient = Depends(get_http_client),
+):
+    """Analyze an Instagram reel by URL with PARALLEL LLM calls."""
+    _raise_if_known_dead("reel", request.post_url)
+    try:
+        start_time = time.time()
+        print(
+            f"DEBUG: [TIME] Starting Reel Analysis for URL: {request.post_url} at {time.strftime('%H:%M:%S')}"
+        )
+        # Concurrent requests for the same URL share one download and analysis
+        analysis = await _flights.do(
+            f"url:reel:{request.post_url}",
+            lambda: _analyze_source(
+                _instagram_source(request.post_url, http_client),
+                partial(_analyze_reel, call_mode=call_mode),
+            ),
+        )
+        analysis = _finalize_reel_analysis(analysis, enable_fact_check)
         print(f"DEBUG: [TIME] TOTAL Reel Analysis took {time.time() - start_time:.2f}s")
         print(f"DEBUG: Successfully returning analysis for {request.post_url}")
         return analysis
@@ -466,168 +1073,27 @@ TRANSCRIPT:
             print(
                 "ERROR: Detected cache-related 403 error - check Gemini file caching logic"
             )
-        raise HTTPException(status_code=500, detail=f"Failed to analyze reel: {str(e)}")
-    finally:
-        if myfile:
-            try:
-                client.files.delete(name=myfile.name)
-            except:
-                pass
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-            except:
-                pass
+        response_error = HTTPException(
+            status_code=500, detail=f"Failed to analyze reel: {str(e)}"
+        )
+        _remember_if_dead("reel", request.post_url, e, response_error)
+        raise response_error
 
 
 @router.post("/reel/upload", response_model=EnhancedReelAnalysis)
 async def analyze_uploaded_reel(
-    video: UploadFile = File(...), enable_fact_check: bool = True
+    video: UploadFile = File(...),
+    enable_fact_check: bool = True,
+    call_mode: CallMode | None = None,
 ):
     """Analyze an uploaded video file with full bias analysis (like /reel endpoint)."""
-    if not video.filename.lower().endswith((".mp4", ".mov", ".webm", ".avi")):
-        raise HTTPException(status_code=400, detail="Invalid video file format")
-
-    temp_file_path = f"temp_reel_upload_{uuid.uuid4().hex}_{video.filename}"
-    myfile = None
-
+    ctx = await _upload_source(video, "temp_reel_upload")
     try:
-        print(f"DEBUG: [UPLOAD] Reading uploaded file: {video.filename}")
-        with open(temp_file_path, "wb") as f:
-            f.write(await video.read())
-        print(f"DEBUG: [UPLOAD] File saved to: {temp_file_path}")
-
         start_time = time.time()
-        upload_start = time.time()
-        myfile = client.files.upload(file=temp_file_path)
-        print(f"DEBUG: [TIME] Upload took {time.time() - upload_start:.2f}s")
-
-        processing_start = time.time()
-        while myfile.state == "PROCESSING":
-            await asyncio.sleep(1)
-            myfile = client.files.get(name=myfile.name)
-        print(
-            f"DEBUG: [TIME] Gemini file processing wait took {time.time() - processing_start:.2f}s"
-        )
-
-        if myfile.state != "ACTIVE":
-            raise HTTPException(
-                status_code=500, detail=f"Gemini processing failed: {myfile.state}"
-            )
-
-        print(f"DEBUG: Starting Analysis for uploaded file: {video.filename}")
-        print(f"DEBUG: [BIAS ANALYSIS] Using model: {bias_model}")
-
-        async def analyze_transcript_faster() -> TranscriptAnalysis:
-            sub_step_start = time.time()
-            print(f"DEBUG: [TRANSCRIPT] Starting transcript analysis")
-            response = await client.aio.models.generate_content(
-                model=model,
-                contents=[myfile, TRANSCRIPT_ANALYSIS_PROMPT],
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": TranscriptAnalysis,
-                },
-            )
-            print(
-                f"DEBUG: [TIME] analyze_transcript_faster took {time.time() - sub_step_start:.2f}s"
-            )
-            return TranscriptAnalysis.model_validate_json(response.text)
-
-        async def analyze_characters_faster() -> CharacterAnalysis:
-            sub_step_start = time.time()
-            print(f"DEBUG: [CHARACTERS] Starting character analysis")
-            response = await client.aio.models.generate_content(
-                model=model,
-                contents=[myfile, CHARACTER_ANALYSIS_PROMPT],
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": CharacterAnalysis,
-                },
-            )
-            print(
-                f"DEBUG: [TIME] analyze_characters_faster took {time.time() - sub_step_start:.2f}s"
-            )
-            return CharacterAnalysis.model_validate_json(response.text)
-
-        async def analyze_bias_faster() -> BiasAnalysis:
-            sub_step_start = time.time()
-            print(f"DEBUG: [BIAS ANALYSIS] Starting bias analysis")
-            response = await client.aio.models.generate_content(
-                model=bias_model,
-                contents=[myfile, BIAS_ANALYSIS_PROMPT],
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": BiasAnalysis,
-                },
-            )
-            print(
-                f"DEBUG: [TIME] analyze_bias_faster took {time.time() - sub_step_start:.2f}s"
-            )
-            result = BiasAnalysis.model_validate_json(response.text)
-            print(
-                f"DEBUG: [BIAS ANALYSIS] Validated - overall_score: {result.overall_score}"
-            )
-            return result
-
-        analysis_start = time.time()
-        transcript_result, character_result, bias_result = await asyncio.gather(
-            analyze_transcript_faster(),
-            analyze_characters_faster(),
-            analyze_bias_faster(),
+        analysis = await _analyze_local_video(
+            ctx, partial(_analyze_reel, call_mode=call_mode)
         )
-        print(
-            f"DEBUG: [TIME] Parallel analysis calls took {time.time() - analysis_start:.2f}s (TRUE ASYNC)"
-        )
-        print(f"DEBUG: Analysis results received for uploaded file.")
-
-        analysis = EnhancedReelAnalysis(
-            main_summary=transcript_result.main_summary,
-            commentary_summary=transcript_result.commentary_summary,
-            possible_issues=transcript_result.possible_issues,
-            bias_analysis=bias_result,
-            transcript=transcript_result.transcript,
-            characters=[
-                Character(**attr.model_dump()) for attr in character_result.characters
-            ],
-            suggestions=[],
-            analysis_timestamp=time.time(),
-        )
-        print(f"DEBUG: EnhancedReelAnalysis object created successfully.")
-
-        frame_extraction_start = time.time()
-        analysis = await _extract_character_frames(analysis, temp_file_path)
-        print(
-            f"DEBUG: [TIME] Frame extraction took {time.time() - frame_extraction_start:.2f}s"
-        )
-
-        if enable_fact_check:
-            try:
-                fact_check_start = time.time()
-                fact_checker = FactChecker(client)
-                fact_check_report = fact_checker.fact_check_claims(
-                    transcript=analysis.transcript or "",
-                    analysis_summary=analysis.commentary_summary or "",
-                )
-                analysis.fact_check_report = fact_check_report
-                analysis.overall_truth_score = fact_check_report.overall_truth_score
-                print(
-                    f"DEBUG: [TIME] Fact-checking took {time.time() - fact_check_start:.2f}s"
-                )
-            except Exception as e:
-                print(f"Fact-checking failed: {e}")
-
-        misinformation_keywords = [
-            "misinformation",
-            "false claim",
-            "fake news",
-            "misleading claim",
-        ]
-        analysis.possible_issues = [
-            issue
-            for issue in analysis.possible_issues
-            if not any(kw in issue.lower() for kw in misinformation_keywords)
-        ]
+        analysis = _finalize_reel_analysis(analysis, enable_fact_check)
 
         print(
             f"DEBUG: [TIME] TOTAL Upload Analysis took {time.time() - start_time:.2f}s"
@@ -639,548 +1105,206 @@ async def analyze_uploaded_reel(
         raise HTTPException(
             status_code=500, detail=f"Failed to analyze uploaded reel: {str(e)}"
         )
-    finally:
-        if myfile:
-            try:
-                client.files.delete(name=myfile.name)
-            except:
-                pass
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-            except:
-                pass
 
+
+@router.post("/youtube", response_model=EnhancedReelAnalysis)
+async def analyze_youtube(
+    request: YouTubeAnalysisRequest,
+    enable_fact_check: bool = False,
+    call_mode: CallMode | None = None,
+):
+    """Analyze a YouTube video or Short by URL with PARALLEL LLM calls."""
+    _raise_if_known_dead("youtube", request.video_url)
     try:
         start_time = time.time()
-        downloader = get_youtube_downloader()
-        download_start = time.time()
-        video_bytes, filename, metadata = downloader.download_video_bytes(
-            request.video_url, max_quality="720p"
+        enhanced_analysis = await _flights.do(
+            f"url:youtube:{request.video_url}",
+            lambda: _analyze_source(
+                _youtube_source(request.video_url),
+                partial(_analyze_reel, call_mode=call_mode),
+            ),
         )
-        print(
-            f"DEBUG: [TIME] YouTube download took {time.time() - download_start:.2f}s"
+        enhanced_analysis = _finalize_reel_analysis(
+            enhanced_analysis, enable_fact_check
         )
 
-        temp_file_path = f"temp_youtube_{uuid.uuid4().hex}.mp4"
-        with open(temp_file_path, "wb") as f:
-            f.write(video_bytes)
-
-        upload_start = time.time()
-        myfile = client.files.upload(file=temp_file_path)
-        processing_start = time.time()
-        while myfile.state == "PROCESSING":
-            await asyncio.sleep(1)
-            myfile = client.files.get(name=myfile.name)
-        print(
-            f"DEBUG: [TIME] Gemini upload/processing took {time.time() - upload_start:.2f}s"
-        )
-
-        if myfile.state != "ACTIVE":
-            raise HTTPException(
-                status_code=500, detail=f"Gemini processing failed: {myfile.state}"
-            )
-
-        generation_start = time.time()
-        print(f"DEBUG: Starting Analysis for YouTube video: {request.video_url}")
-
-        async def analyze_youtube_transcript() -> TranscriptAnalysis:
-            sub_step_start = time.time()
-            response = await client.aio.models.generate_content(
-                model=model,
-                contents=[myfile, TRANSCRIPT_ANALYSIS_PROMPT],
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": TranscriptAnalysis,
-                },
-            )
-            print(
-                f"DEBUG: [TIME] YouTube_analyze_transcript_faster took {time.time() - sub_step_start:.2f}s"
-            )
-            return TranscriptAnalysis.model_validate_json(response.text)
-
-        async def analyze_youtube_characters() -> CharacterAnalysis:
-            sub_step_start = time.time()
-            response = await client.aio.models.generate_content(
-                model=model,
-                contents=[myfile, CHARACTER_ANALYSIS_PROMPT],
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": CharacterAnalysis,
-                },
-            )
-            print(
-                f"DEBUG: [TIME] YouTube_analyze_characters_faster took {time.time() - sub_step_start:.2f}s"
-            )
-            return CharacterAnalysis.model_validate_json(response.text)
-
-        async def analyze_youtube_bias() -> BiasAnalysis:
-            sub_step_start = time.time()
-            print(f"DEBUG: [BIAS ANALYSIS] YouTube - Starting bias analysis")
-            print(f"DEBUG: [BIAS ANALYSIS] YouTube - Using model: {bias_model}")
-
-            response = await client.aio.models.generate_content(
-                model=bias_model,
-                contents=[myfile, BIAS_ANALYSIS_PROMPT],
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": BiasAnalysis,
-                },
-            )
-            print(
-                f"DEBUG: [TIME] YouTube_analyze_bias_faster took {time.time() - sub_step_start:.2f}s"
-            )
-
-            # Log raw response
-            print(
-                f"DEBUG: [BIAS ANALYSIS] YouTube - Raw response: {response.text[:500]}..."
-            )
-
-            result = BiasAnalysis.model_validate_json(response.text)
-            print(
-                f"DEBUG: [BIAS ANALYSIS] YouTube - overall_score: {result.overall_score}"
-            )
-            return result
-
-        analysis_start = time.time()
-        youtube_transcript, youtube_characters, youtube_bias = await asyncio.gather(
-            analyze_youtube_transcript(),
-            analyze_youtube_characters(),
-            analyze_youtube_bias(),
-        )
-        print(
-            f"DEBUG: [TIME] YouTube Parallel analysis took {time.time() - analysis_start:.2f}s"
-        )
-
-        # Check bias result and implement fallback
-        print(f"DEBUG: [BIAS CHECK] YouTube - Checking bias_result quality...")
-        if (
-            youtube_bias.overall_score == 0
-            and len(youtube_bias.categories) > 0
-            and all(cat.score == 0 for cat in youtube_bias.categories)
-        ):
-            print(
-                f"WARNING: [BIAS CHECK] YouTube - Video-based bias analysis returned empty data"
-            )
-            print(
-                f"DEBUG: [BIAS CHECK] YouTube - Attempting fallback using transcript..."
-            )
-
-            try:
-                fallback_prompt = f"""
-Analyze this content for **Linguistic Bias, Narrative Framing, and Geopolitical Context**.
-
-You are a critical media analyst. Avoid being overly cautious; if there are subtle cues in language, visual framing, or emotional tone, identify them.
-
-You MUST follow this schema strictly and provide MEANINGFUL data:
-
-1. **overall_score**: (0-100) A summary risk score. Even for neutral content, if there is a specific "point of view," the score should reflect that (e.g., 5-15).
-2. **risk_level**: "Low Risk", "Medium Risk", "High Risk", or "Critical".
-3. **categories**: You MUST provide entries for these 4 categories. DO NOT leave any out.
-   - "Cultural Bias": Does the content assume a specific cultural background? Does it use regional slang or references that exclude others?
-   - "Sensitivity Bias": Does it touch on topics that might be sensitive to specific groups (even if handled well)?
-   - "Narrative Framing": How is the story presented? Is it one-sided? Does the visual editing push a specific emotion?
-   - "Emotional Over-representation": Is the music or acting "over the top" to force a reaction?
-   
-   For each category, provide a score (0-100), a strength level, and a `detected` boolean.
-   *Crucial*: If the score is > 5, set `detected` to true.
-
-4. **policy_conflicts**: Extract 1-2 potential conflicts if possible (e.g., "Perspective Bias", "Dramatic Sensationalism"). If none, provide a generic "Standard Compliance" entry.
-5. **evidence_matrix**: Provide 3 specific metrics. Examples: "Slang Density", "Color Grading Mood", "Fast-Cut Pacing", "Camera Angle Dominance". 
-   - Each should have a `label` and a `value` (e.g., "High", "Assertive", "Subtle").
-6. **risk_vectors**: You MUST distribute 100 points across these three (they MUST sum to exactly 100):
-   - negative_skew: (0-100)
-   - neutrality: (0-100)
-   - positive_lean: (0-100)
-   Example for a happy meme: Negative 5, Neutral 20, Positive 75.
-7. **geographic_relevance**: List the specific Indian states or regions this content targets or originates from. 
-   - Be specific: e.g. ["Maharashtra", "Delhi", "Punjab"].
-   - If it's a Western meme (like Breaking Bad), identify if it has "Global" relevance or if it's trending in specific Indian urban hubs like ["Mumbai", "Bangalore"].
-
-**CONTENT TO ANALYZE:**
-
-MAIN SUMMARY:
-{youtube_transcript.main_summary}
-
-COMMENTARY SUMMARY:
-{youtube_transcript.commentary_summary}
-
-TRANSCRIPT:
-{youtube_transcript.transcript or "No transcript available"}
-
-**Output must be pure JSON.**
-"""
-
-                fallback_start = time.time()
-                print(
-                    f"DEBUG: [BIAS FALLBACK] YouTube - Sending transcript-based analysis"
-                )
-
-                fallback_response = await client.aio.models.generate_content(
-                    model=bias_model,
-                    contents=fallback_prompt,
-                    config={
-                        "response_mime_type": "application/json",
-                        "response_schema": BiasAnalysis,
-                    },
-                )
-
-                youtube_bias = BiasAnalysis.model_validate_json(fallback_response.text)
-                print(
-                    f"DEBUG: [BIAS FALLBACK] YouTube - Fallback successful - overall_score: {youtube_bias.overall_score}"
-                )
-            except Exception as e:
-                print(f"ERROR: [BIAS CHECK] YouTube - Fallback failed: {e}")
-                # Keep original (empty) result
-
-        enhanced_analysis = EnhancedReelAnalysis(
-            main_summary=youtube_transcript.main_summary,
-            commentary_summary=youtube_transcript.commentary_summary,
-            possible_issues=youtube_transcript.possible_issues,
-            bias_analysis=youtube_bias,
-            transcript=youtube_transcript.transcript,
-            characters=[
-                Character(**attr.model_dump()) for attr in youtube_characters.characters
-            ],
-            suggestions=[],
-            analysis_timestamp=time.time(),
-        )
-        print(
-            f"DEBUG: EnhancedReelAnalysis object created successfully for YouTube video."
-        )
-
-        extraction_start = time.time()
-        enhanced_analysis = await _extract_character_frames(
-            enhanced_analysis, temp_file_path
-        )
-        print(
-            f"DEBUG: [TIME] Character extraction took {time.time() - extraction_start:.2f}s"
-        )
-
-        if enable_fact_check:
-            try:
-                fact_check_start = time.time()
-                fact_checker = FactChecker(client)
-                fact_check_report = fact_checker.fact_check_claims(
-                    transcript=enhanced_analysis.transcript or "",
-                    analysis_summary=enhanced_analysis.commentary_summary or "",
-                )
-                enhanced_analysis.fact_check_report = fact_check_report
-                enhanced_analysis.overall_truth_score = (
-                    fact_check_report.overall_truth_score
-                )
-                print(
-                    f"DEBUG: [TIME] Fact-check took {time.time() - fact_check_start:.2f}s"
-                )
-            except Exception as e:
-                print(f"Fact-checking failed: {e}")
-
-        misinformation_keywords = [
-            "misinformation",
-            "false claim",
-            "fake news",
-            "misleading claim",
-        ]
-        enhanced_analysis.possible_issues = [
-            issue
-            for issue in enhanced_analysis.possible_issues
-            if not any(kw in issue.lower() for kw in misinformation_keywords)
-        ]
-
         print(
             f"DEBUG: [TIME] Total YouTube analysis took {time.time() - start_time:.2f}s"
         )
         return enhanced_analysis
 
     except Exception as e:
-        raise HTTPException(
+        response_error = HTTPException(
             status_code=500, detail=f"Failed to analyze YouTube video: {str(e)}"
         )
-    finally:
-        if myfile:
-            try:
-                client.files.delete(name=myfile.name)
-            except:
-                pass
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-            except:
-                pass
+        _remember_if_dead("youtube", request.video_url, e, response_error)
+        raise response_error
 
 
-async def _perform_full_sentiment_analysis(
-    temp_file_path: str, video_duration: int, raw_key: str
+@router.post("/sentiment")
+async def analyze_sentiment_url(
+    request: ReelAnalysisRequest,
+    call_mode: CallMode | None = None,
+    http_client: httpx.AsyncClient = Depends(get_http_client),
 ):
-    """Internal helper to run parallel Gemini analysis on a video file."""
-    cache_key = raw_key
-    myfile = None
-    start_time = time.time()
+    """Dedicated sentiment/emotion analysis endpoint for URLs."""
+    _raise_if_known_dead("sentiment", request.post_url)
+    post_url = request.post_url
+    if "youtube.com" in post_url or "youtu.be" in post_url:
+        source = lambda: _youtube_source(post_url)
+    else:
+        source = lambda: _instagram_source(post_url, http_client)
     try:
-        # Check cache logic
-        if cache_key not in UPLOAD_LOCKS:
-            UPLOAD_LOCKS[cache_key] = asyncio.Lock()
-
-        # DISABLE CACHING - causing 403 errors with expired Gemini files
-        print(
-            f"DEBUG: [SPEED] Uploading new Gemini File for sentiment (caching disabled to prevent 403 errors)"
-        )
-        upload_op_start = time.time()
-        myfile = client.files.upload(file=temp_file_path)
-        print(
-            f"DEBUG: [TIME] Sentiment Gemini upload took {time.time() - upload_op_start:.2f}s"
+        # Concurrent requests for the same URL share one download and analysis
+        return await _flights.do(
+            f"url:sentiment:{post_url}",
+            lambda: _analyze_source(
+                source(), partial(_analyze_sentiment, call_mode=call_mode)
+            ),
         )
 
-        processing_start = time.time()
-        while myfile.state == "PROCESSING":
-            await asyncio.sleep(1)
-            myfile = client.files.get(name=myfile.name)
-        print(
-            f"DEBUG: [TIME] Sentiment Gemini processing wait took {time.time() - processing_start:.2f}s"
+    except Exception as e:
+        print(f"DEBUG: [SENTIMENT ENDPOINT ERROR] {type(e).__name__}: {e}")
+        response_error = HTTPException(
+            status_code=500, detail=f"Failed to analyze sentiment: {str(e)}"
         )
+        _remember_if_dead("sentiment", post_url, e, response_error)
+        raise response_error
 
-        if myfile.state != "ACTIVE":
-            raise HTTPException(
-                status_code=500, detail=f"Gemini processing failed: {myfile.state}"
-            )
 
-        async def analyze_temporal_emotions() -> TemporalEmotionAnalysis:
-            temporal_prompt = build_temporal_analysis_prompt(video_duration)
-            response = await client.aio.models.generate_content(
-                model=model,
-                contents=[myfile, temporal_prompt],
-                config=genai.types.GenerateContentConfig(
-                    system_instruction=TEMPORAL_SYSTEM_INSTRUCTION,
-                    response_mime_type="application/json",
-                    response_schema=TemporalEmotionAnalysis,
-                ),
-            )
-            if not response.text:
-                raise ValueError(
-                    f"Temporal analysis returned empty response. Candidates: {response.candidates}"
-                )
-            return TemporalEmotionAnalysis.model_validate_json(response.text)
+@router.post("/sentiment/upload")
+async def analyze_sentiment_upload(
+    video: UploadFile = File(...), call_mode: CallMode | None = None
+):
+    """Sentiment/emotion analysis for uploaded video files."""
+    ctx = await _upload_source(video, "temp_upload")
+    try:
+        return await _analyze_local_video(
+            ctx, partial(_analyze_sentiment, call_mode=call_mode)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to analyze uploaded video: {str(e)}"
+        )
 
-        async def analyze_character_global() -> CharacterGlobalAnalysis:
-            character_prompt = build_character_global_analysis_prompt(video_duration)
-            response = await client.aio.models.generate_content(
-                model=model,
-                contents=[myfile, character_prompt],
-                config=genai.types.GenerateContentConfig(
-                    system_instruction=CHARACTER_GLOBAL_SYSTEM_INSTRUCTION,
-                    response_mime_type="application/json",
-                    response_schema=CharacterGlobalAnalysis,
-                ),
-            )
-            if not response.text:
-                raise ValueError(
-                    f"Character analysis returned empty response. Candidates: {response.candidates}"
-                )
-            return CharacterGlobalAnalysis.model_validate_json(response.text)
 
-        temporal_start = time.time()
+# --- Streaming endpoints ---
+#
+# Same analyses as above, answered with Server-Sent Events instead of one JSON
+# body. Events, in the order they can arrive:
+#   download         VideoReadyEvent - the video is on the server
+#   upload           UploadActiveEvent - the Gemini upload is ACTIVE (not sent
+#                    when every Gemini stage was served from cache)
+#   transcript, characters, bias (reel)           TranscriptAnalysis,
+#                    CharacterAnalysis, BiasAnalysis; a second `bias` event
+#                    replaces an empty first one when the fallback ran
+#   frame (reel)     FrameEvent, one per extracted character frame
+#   temporal_emotions, character_global (sentiment)
+#                    TemporalEmotionAnalysis, CharacterGlobalAnalysis
+#   degraded         DegradedStageEvent - an optional stage failed
+#   done             the body the non-streaming endpoint would return
+#   error            StreamErrorEvent, instead of `done`
+# A result served from the whole-analysis cache (or shared with a concurrent
+# request for the same video) arrives as `download` followed by `done`.
+
+
+@router.post("/reel/stream")
+async def analyze_reel_stream(
+    request: ReelAnalysisRequest,
+    enable_fact_check: bool = False,
+    call_mode: CallMode | None = None,
+    http_client: httpx.AsyncClient = Depends(get_http_client),
+):
+    """Analyze an Instagram reel by URL, streaming stage results as Server-Sent Events."""
+    _raise_if_known_dead("reel", request.post_url)
+
+    async def produce(events: asyncio.Queue):
         try:
-            temporal_result, character_result = await asyncio.gather(
-                analyze_temporal_emotions(), analyze_character_global()
+            ctx = await _instagram_source(request.post_url, http_client)
+            analysis = await _analyze_streamed(
+                events, ctx, partial(_analyze_reel, call_mode=call_mode)
             )
-        except Exception as gather_err:
-            print(
-                f"DEBUG: [SENTIMENT ERROR] Parallel analysis failed: {type(gather_err).__name__}: {gather_err}"
+        except Exception as e:
+            print(f"ERROR in analyze_reel_stream: {str(e)}")
+            response_error = HTTPException(
+                status_code=500, detail=f"Failed to analyze reel: {str(e)}"
             )
-            raise
-        print(
-            f"DEBUG: [TIME] Parallel sentiment analysis took {time.time() - temporal_start:.2f}s (TRUE ASYNC)"
-        )
+            _remember_if_dead("reel", request.post_url, e, response_error)
+            raise response_error
+        return await asyncio.to_thread(_finalize_reel_analysis, analysis, enable_fact_check)
 
-        sentiment_result = SentimentAnalysis(
-            emotion_timeline=temporal_result.emotion_timeline,
-            emotion_seismograph=temporal_result.emotion_seismograph,
-            character_emotions=character_result.character_emotions,
-            global_category=character_result.global_category,
-            confidence_score=character_result.confidence_score,
-        )
+    return _event_stream(produce)
 
-        transcript_segments = [
-            {
-                "id": i,
-                "start": seg.start,
-                "end": seg.end,
-                "text": f"[{seg.start:.0f}s-{seg.end:.0f}s] {seg.emotion} emotion (intensity: {seg.intensity:.2f})",
-                "emotion": seg.emotion,
-            }
-            for i, seg in enumerate(sentiment_result.emotion_timeline)
-        ]
 
-        # Use cache_key hash for video filename to keep it consistent for URLs
-        url_hash = hashlib.md5(cache_key.encode()).hexdigest()
-        video_filename = f"video_{url_hash}.mp4"
-        persistent_video_path = VIDEOS_DIR / video_filename
-
-        # Save persistent copy for frontend serving
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                shutil.copy2(temp_file_path, persistent_video_path)
-            except Exception as e:
-                print(f"Failed to save video: {e}")
-
-        result = {
-            "emotion_timeline": [
-                {
-                    "start": seg.start,
-                    "end": seg.end,
-                    "emotion": seg.emotion,
-                    "intensity": seg.intensity,
-                }
-                for seg in sentiment_result.emotion_timeline
-            ],
-            "emotion_seismograph": sentiment_result.emotion_seismograph.model_dump(),
-            "character_emotions": [
-                char.model_dump()
-                | {
-                    "dominantEmotion": char.dominant_emotion,
-                    "screenTime": char.screen_time,
-                }
-                for char in sentiment_result.character_emotions
-            ],
-            "global_category": sentiment_result.global_category,
-            "confidence": sentiment_result.confidence_score,
-            "transcript_segments": transcript_segments,
-            "duration": video_duration,
-            "video_url": f"/videos/{video_filename}",
-            "analysis_timestamp": time.time(),
-        }
+@router.post("/reel/upload/stream")
+async def analyze_uploaded_reel_stream(
+    video: UploadFile = File(...),
+    enable_fact_check: bool = True,
+    call_mode: CallMode | None = None,
+):
+    """Analyze an uploaded video file, streaming stage results as Server-Sent Events."""
+    ctx = await _upload_source(video, "temp_reel_upload")
 
-        # Save to Cache (DISABLED)
-        # get_cache().set(cache_key, result)
-        return result
+    async def produce(events: asyncio.Queue):
+        try:
+            analysis = await _analyze_streamed(
+                events, ctx, partial(_analyze_reel, call_mode=call_mode)
+            )
+        except Exception as e:
+            print(f"ERROR in analyze_uploaded_reel_stream: {str(e)}")
+            raise HTTPException(
+                status_code=500, detail=f"Failed to analyze uploaded reel: {str(e)}"
+            )
+        return await asyncio.to_thread(_finalize_reel_analysis, analysis, enable_fact_check)
 
-    finally:
-        if myfile:
-            try:
-                client.files.delete(name=myfile.name)
-            except:
-                pass
+    return _event_stream(produce, ctx.video_path)
 
 
-@router.post("/sentiment")
-async def analyze_sentiment_url(request: ReelAnalysisRequest):
-    """Dedicated sentiment/emotion analysis endpoint for URLs."""
-    # Check Cache first (DISABLED)
-    # cache = get_cache()
-    # cache_key = f"sentiment:{request.post_url}"
-    # cached_result = cache.get(cache_key)
-    # if cached_result:
-    #     try:
-    #         # Verify the video file actually exists
-    #         video_filename = cached_result.get("video_url", "").split("/")[-1]
-    #         if video_filename and (VIDEOS_DIR / video_filename).exists():
-    #             # Basic validation (sentiment data should have emotion_timeline)
-    #             if "emotion_timeline" in cached_result:
-    #                 return cached_result
-    #             else:
-    #                 print(f"CACHE INVALID for {cache_key}: missing emotion_timeline")
-    #     except Exception as e:
-    #         print(f"CACHE ERROR for {cache_key}: {e}")
-    #
-    #     # If we get here, cache was invalid or file missing
-    #     cache.invalidate(cache_key)
-
-    temp_file_path = None
-    try:
-        is_youtube = "youtube.com" in request.post_url or "youtu.be" in request.post_url
+@router.post("/sentiment/stream")
+async def analyze_sentiment_url_stream(
+    request: ReelAnalysisRequest,
+    call_mode: CallMode | None = None,
+    http_client: httpx.AsyncClient = Depends(get_http_client),
+):
+    """Sentiment/emotion analysis for URLs, streamed as Server-Sent Events."""
+    _raise_if_known_dead("sentiment", request.post_url)
+    post_url = request.post_url
 
-        if is_youtube:
-            downloader = get_youtube_downloader()
-            video_bytes, filename, metadata = downloader.download_video_bytes(
-                request.post_url, max_quality="720p"
+    async def produce(events: asyncio.Queue):
+        try:
+            if "youtube.com" in post_url or "youtu.be" in post_url:
+                ctx = await _youtube_source(post_url)
+            else:
+                ctx = await _instagram_source(post_url, http_client)
+            return await _analyze_streamed(
+                events, ctx, partial(_analyze_sentiment, call_mode=call_mode)
             )
-            video_duration = metadata.get("length", 30)
-            temp_file_path = f"temp_youtube_{uuid.uuid4().hex}.mp4"
-            with open(temp_file_path, "wb") as f:
-                f.write(video_bytes)
-        else:
-            async with httpx.AsyncClient(timeout=60.0) as http_client:
-                downloader_url = f"{DOWNLOADER_BASE_URL}/api/video"
-                response = await http_client.get(
-                    downloader_url,
-                    params={
-                        "postUrl": request.post_url,
-                        "enhanced": "true",
-                        "_t": str(time.time()),
-                    },
-                )
-                video_data = response.json()
-                medias = video_data.get("data", {}).get("medias", [])
-                if not medias:
-                    raise HTTPException(status_code=400, detail="No video media found")
-
-                video_url = medias[0].get("url")
-                video_response = await http_client.get(video_url)
-                temp_file_path = f"temp_reel_{uuid.uuid4().hex}.mp4"
-                with open(temp_file_path, "wb") as f:
-                    f.write(video_response.content)
-
-                cap = cv2.VideoCapture(temp_file_path)
-                video_duration = (
-                    int(cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS))
-                    if cap.get(cv2.CAP_PROP_FPS) > 0
-                    else 30
-                )
-                cap.release()
-
-        return await _perform_full_sentiment_analysis(
-            temp_file_path, video_duration, request.post_url
-        )
-
-    except Exception as e:
-        print(f"DEBUG: [SENTIMENT ENDPOINT ERROR] {type(e).__name__}: {e}")
-        raise HTTPException(
-            status_code=500, detail=f"Failed to analyze sentiment: {str(e)}"
-        )
-    finally:
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-            except:
-                pass
-
+        except Exception as e:
+            print(f"DEBUG: [SENTIMENT STREAM ERROR] {type(e).__name__}: {e}")
+            response_error = HTTPException(
+                status_code=500, detail=f"Failed to analyze sentiment: {str(e)}"
+            )
+            _remember_if_dead("sentiment", post_url, e, response_error)
+            raise response_error
 
-@router.post("/sentiment/upload")
-async def analyze_sentiment_upload(video: UploadFile = File(...)):
-    """Sentiment/emotion analysis for uploaded video files."""
-    if not video.filename.lower().endswith((".mp4", ".mov", ".webm", ".avi")):
-        raise HTTPException(status_code=400, detail="Invalid video file format")
+    return _event_stream(produce)
 
-    temp_file_path = f"temp_upload_{uuid.uuid4().hex}_{video.filename}"
-    try:
-        contents = await video.read()
-        with open(temp_file_path, "wb") as f:
-            f.write(contents)
-
-        # Get video duration
-        cap = cv2.VideoCapture(temp_file_path)
-        video_duration = (
-            int(cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS))
-            if cap.get(cv2.CAP_PROP_FPS) > 0
-            else 30
-        )
-        cap.release()
 
-        # Generate a semi-stable cache key for the file based on its name and size
-        # (This is better than nothing, but not as good as a content hash)
-        cache_key = f"upload_{video.filename}_{len(contents)}"
+@router.post("/sentiment/upload/stream")
+async def analyze_sentiment_upload_stream(
+    video: UploadFile = File(...), call_mode: CallMode | None = None
+):
+    """Sentiment/emotion analysis for uploaded video files, streamed as Server-Sent Events."""
+    ctx = await _upload_source(video, "temp_upload")
 
-        return await _perform_full_sentiment_analysis(
-            temp_file_path, video_duration, cache_key
-        )
+    async def produce(events: asyncio.Queue):
+        try:
+            return await _analyze_streamed(
+                events, ctx, partial(_analyze_sentiment, call_mode=call_mode)
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Failed to analyze uploaded video: {str(e)}"
+            )
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Failed to analyze uploaded video: {str(e)}"
-        )
-    finally:
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-            except:
-                pass
+    return _event_stream(produce, ctx.video_path)
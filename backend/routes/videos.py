@@ -1,35 +1,94 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
 from pathlib import Path
 from config import VIDEOS_DIR
 import os
+import re
 
 router = APIRouter(prefix="/videos", tags=["videos"])
 
+VALID_EXTENSIONS = {".mp4", ".mov", ".webm", ".avi"}
 
-@router.get("/{filename}")
-async def get_video(filename: str):
-    """Serve a video file from the videos directory."""
+# `video_{sha256}.mp4` files are named after their content and never change
+CONTENT_HASHED_NAME = re.compile(r"^video_([0-9a-f]{64})\.\w+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Other files may be replaced in place, so clients revalidate them every time
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+class VideoFileResponse(FileResponse):
+    """
+    FileResponse with larger read chunks for video bodies.
+
+    Range / If-Range handling (206, multipart ranges, 416) comes from Starlette.
+    On servers that implement the ASGI `http.response.pathsend` extension the
+    full-body case is handed to the server, which can sendfile() it zero-copy.
+    """
+
+    chunk_size = 256 * 1024
+
+
+def _validators(video_path: Path, stat_result: os.stat_result) -> dict[str, str]:
+    """ETag, Last-Modified and Cache-Control headers for a video file."""
+    match = CONTENT_HASHED_NAME.match(video_path.name)
+    if match:
+        etag = f'"{match.group(1)}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+        cache_control = REVALIDATE_CACHE_CONTROL
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+
+
+def _not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    """Evaluate If-None-Match (weak comparison) or, without it, If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have one-second resolution
+        return int(stat_result.st_mtime) <= since
+    return False
+
+
+@router.api_route("/{filename}", methods=["GET", "HEAD"])
+async def get_video(filename: str, request: Request):
+    """Serve a video file with range support and cache validators."""
     video_path = VIDEOS_DIR / filename
 
-    if not video_path.exists():
+    if not video_path.is_file():
         raise HTTPException(status_code=404, detail="Video not found")
 
     # Validate the file is a video
-    valid_extensions = {".mp4", ".mov", ".webm", ".avi"}
-    if video_path.suffix.lower() not in valid_extensions:
+    if video_path.suffix.lower() not in VALID_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Invalid video file")
 
-    # Get file size for Content-Length header
-    file_size = video_path.stat().st_size
+    stat_result = video_path.stat()
+    headers = _validators(video_path, stat_result)
+
+    if _not_modified(request, headers["ETag"], stat_result):
+        return Response(status_code=304, headers=headers)
 
-    return FileResponse(
+    return VideoFileResponse(
         video_path,
-        media_type="video/mp4",
-        headers={
-            "Content-Length": str(file_size),
-            "Accept-Ranges": "bytes",
-        },
+        media_type=guess_type(video_path.name)[0] or "video/mp4",
+        headers=headers,
+        stat_result=stat_result,
     )
 
 
@@ -3,5 +3,14 @@ Services for video analysis and fact-checking.
 """
 from .fact_checker import FactChecker
 from .youtube_downloader import get_youtube_downloader, YouTubeDownloader
+from .single_flight import SingleFlight
+from .gemini_files import GeminiFileRegistry, get_file_registry
 
-__all__ = ["FactChecker", "get_youtube_downloader", "YouTubeDownloader"]
+__all__ = [
+    "FactChecker",
+    "get_youtube_downloader",
+    "YouTubeDownloader",
+    "SingleFlight",
+    "GeminiFileRegistry",
+    "get_file_registry",
+]
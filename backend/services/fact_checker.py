@@ -2,7 +2,7 @@
 Service for fact-checking video content using Google Gemini with Google Search grounding.
 """
 from google.genai import types
-from routes.fact_check import (
+from models.fact_check import (
     Claim,
     FactCheckReport,
     GoogleSearchSource,
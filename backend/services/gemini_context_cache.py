@@ -0,0 +1,216 @@
+"""
+Gemini explicit context caches for videos analyzed by several prompts.
+
+Without a cache every stage call sends the uploaded video again and Gemini
+re-tokenizes all of its frames. With GEMINI_CONTEXT_CACHE_ENABLED, stages that
+share a model and system instruction reference one cached-content object
+holding (video, system instruction) instead, and only send their prompt.
+Cached input tokens are billed at a reduced rate and skip re-processing.
+
+Caches are reference counted per analysis: the first stage to need one
+creates it, every pipeline run using it holds a reference until the run
+ends, and the last release deletes it. The TTL set at creation
+(GEMINI_CONTEXT_CACHE_TTL) only bounds how long an orphaned cache (e.g. after
+a crash) is billed; long-running analyses extend it when it gets close.
+
+A cache that cannot be created (e.g. the video is below the model's minimum
+cacheable token count) or has disappeared is never fatal: the call falls back
+to sending the video inline.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from google.genai import types
+
+from config import client
+from services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+GEMINI_CONTEXT_CACHE_ENABLED = (
+    os.getenv("GEMINI_CONTEXT_CACHE_ENABLED", "false").lower() == "true"
+)
+# Lifetime of a cache on Gemini's side, in seconds
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "600"))
+# Extend a cache's TTL when it is handed out with less than this left
+GEMINI_CONTEXT_CACHE_REFRESH_MARGIN = int(
+    os.getenv("GEMINI_CONTEXT_CACHE_REFRESH_MARGIN", "120")
+)
+
+
+def is_cache_missing(error: Exception) -> bool:
+    """Whether an API error means the referenced cached content is gone."""
+    if getattr(error, "code", None) in (403, 404):
+        return True
+    message = str(error)
+    return "NOT_FOUND" in message or "PERMISSION_DENIED" in message
+
+
+@dataclass
+class ContextCacheEntry:
+    key: str
+    name: str
+    model: str
+    expires_at: float
+    # Input tokens stored in the cache (billed once, at creation)
+    tokens: int
+    users: int = 0
+    # Whether a pipeline run has already reported the creation tokens
+    charged: bool = False
+
+
+class GeminiContextCacheRegistry:
+    """Maps (video, model, system instruction) -> live Gemini cached content."""
+
+    def __init__(self, gemini_client, ttl: int = GEMINI_CONTEXT_CACHE_TTL):
+        self.client = gemini_client
+        self.ttl = ttl
+        self.entries: dict[str, ContextCacheEntry] = {}
+        self._creates = SingleFlight()
+        # Keep references to background deletions so they are not garbage collected
+        self._deletions: set[asyncio.Task] = set()
+        self.created = 0
+        self.reuses = 0
+        self.create_failures = 0
+        self.extensions = 0
+        self.invalidations = 0
+        self.deleted = 0
+
+    @staticmethod
+    def make_key(video_hash: str, model_name: str, system_instruction: str | None) -> str:
+        instruction_hash = hashlib.sha256((system_instruction or "").encode()).hexdigest()
+        return f"{video_hash}:{model_name}:{instruction_hash[:16]}"
+
+    async def acquire(
+        self,
+        video_hash: str,
+        myfile: Any,
+        model_name: str,
+        system_instruction: str | None = None,
+    ) -> ContextCacheEntry | None:
+        """
+        Return a cache holding the video and system instruction, creating it if needed.
+
+        The caller must `release` the entry when its analysis is done. Returns
+        None (nothing to release) when the cache could not be created.
+        """
+        key = self.make_key(video_hash, model_name, system_instruction)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = await self._creates.do(
+                key, lambda: self._create(key, myfile, model_name, system_instruction)
+            )
+            if entry is None:
+                return None
+            entry.users += 1
+            return entry
+
+        self.reuses += 1
+        # Hold the reference before awaiting so a concurrent release cannot delete it
+        entry.users += 1
+        if entry.expires_at - time.time() < GEMINI_CONTEXT_CACHE_REFRESH_MARGIN:
+            await self._extend(entry)
+        return entry
+
+    def release(self, entry: ContextCacheEntry) -> None:
+        """Drop one analysis' reference; the last one deletes the cache."""
+        entry.users -= 1
+        if entry.users <= 0 and self.entries.get(entry.key) is entry:
+            del self.entries[entry.key]
+            self._delete_remote(entry.name)
+
+    def invalidate(self, entry: ContextCacheEntry) -> None:
+        """Forget a cache Gemini no longer has, so the next analysis creates a new one."""
+        if self.entries.get(entry.key) is entry:
+            self.invalidations += 1
+            del self.entries[entry.key]
+
+    async def _create(
+        self, key: str, myfile: Any, model_name: str, system_instruction: str | None
+    ) -> ContextCacheEntry | None:
+        try:
+            cached_content = await self.client.aio.caches.create(
+                model=model_name,
+                config=types.CreateCachedContentConfig(
+                    contents=[myfile],
+                    system_instruction=system_instruction,
+                    ttl=f"{self.ttl}s",
+                    display_name=f"sentira-{key[:24]}",
+                ),
+            )
+        except Exception as e:
+            self.create_failures += 1
+            logger.warning(f"Gemini context cache creation failed for {model_name}: {e}")
+            return None
+
+        self.created += 1
+        usage = getattr(cached_content, "usage_metadata", None)
+        entry = ContextCacheEntry(
+            key=key,
+            name=cached_content.name,
+            model=model_name,
+            expires_at=self._expires_at(cached_content),
+            tokens=getattr(usage, "total_token_count", None) or 0,
+        )
+        self.entries[key] = entry
+        return entry
+
+    async def _extend(self, entry: ContextCacheEntry) -> None:
+        try:
+            cached_content = await self.client.aio.caches.update(
+                name=entry.name,
+                config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s"),
+            )
+        except Exception as e:
+            # Calls referencing it fall back to the inline video if it does expire
+            logger.warning(f"Failed to extend Gemini context cache {entry.name}: {e}")
+            return
+        self.extensions += 1
+        entry.expires_at = self._expires_at(cached_content)
+
+    def _expires_at(self, cached_content: Any) -> float:
+        expire_time = getattr(cached_content, "expire_time", None)
+        if expire_time is not None:
+            return expire_time.timestamp()
+        return time.time() + self.ttl
+
+    def _delete_remote(self, name: str) -> None:
+        """Delete a cache in the background; callers never wait on the API."""
+        task = asyncio.get_running_loop().create_task(self._delete(name))
+        self._deletions.add(task)
+        task.add_done_callback(self._deletions.discard)
+
+    async def _delete(self, name: str) -> None:
+        try:
+            await self.client.aio.caches.delete(name=name)
+            self.deleted += 1
+        except Exception as e:
+            # It expires on its own after the TTL
+            logger.debug(f"Failed to delete Gemini context cache {name}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": GEMINI_CONTEXT_CACHE_ENABLED,
+            "active": len(self.entries),
+            "created": self.created,
+            "reuses": self.reuses,
+            "create_failures": self.create_failures,
+            "extensions": self.extensions,
+            "invalidations": self.invalidations,
+            "deleted": self.deleted,
+        }
+
+
+# Singleton instance
+_context_cache_registry = GeminiContextCacheRegistry(client)
+
+
+def get_context_cache_registry() -> GeminiContextCacheRegistry:
+    """Get the singleton Gemini context cache registry."""
+    return _context_cache_registry
@@ -0,0 +1,282 @@
+"""
+Registry of uploaded Gemini files keyed by video content hash and upload variant.
+
+Uploading a video and waiting for Gemini to finish processing it is often the
+largest part of an analysis. The registry keeps each upload around until just
+before it expires so that every pipeline analyzing the same bytes (reel,
+sentiment, re-analysis) shares one upload.
+
+All uploads go through `upload_and_wait`, which uses the SDK's async file API
+and polls the processing state with adaptive backoff, so neither the upload
+nor the wait blocks the event loop. With TRANSCODE_ENABLED, a low-bitrate proxy
+(see services/transcode.py) is uploaded in place of the original bytes.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from config import client
+from services.single_flight import SingleFlight
+from services.transcode import (
+    make_upload_proxy,
+    remove_proxy,
+    transcode_metrics,
+    upload_variant,
+)
+
+logger = logging.getLogger(__name__)
+
+# Gemini keeps uploaded files for 48 hours; used when the API omits expiration_time
+GEMINI_FILE_TTL = 48 * 3600
+# Re-upload files that would expire within this window instead of handing them out
+GEMINI_FILE_REFRESH_MARGIN = int(os.getenv("GEMINI_FILE_REFRESH_MARGIN", "3600"))
+GEMINI_FILE_REGISTRY_MAX = int(os.getenv("GEMINI_FILE_REGISTRY_MAX", "200"))
+# Processing-state polling: first delay, growth factor, cap, and overall timeout
+GEMINI_POLL_INITIAL_DELAY = float(os.getenv("GEMINI_POLL_INITIAL_DELAY", "0.5"))
+GEMINI_POLL_BACKOFF = float(os.getenv("GEMINI_POLL_BACKOFF", "1.5"))
+GEMINI_POLL_MAX_DELAY = float(os.getenv("GEMINI_POLL_MAX_DELAY", "5"))
+GEMINI_PROCESSING_TIMEOUT = float(os.getenv("GEMINI_PROCESSING_TIMEOUT", "300"))
+
+
+class GeminiFileProcessingError(Exception):
+    """Raised when an uploaded file does not reach the ACTIVE state."""
+
+
+class UploadMetrics:
+    """Counters and cumulative timings for Gemini uploads and processing waits."""
+
+    def __init__(self):
+        self.uploads = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.polls = 0
+        self.upload_seconds = 0.0
+        self.processing_seconds = 0.0
+        self.last_upload_seconds = 0.0
+        self.last_processing_seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "uploads": self.uploads,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "polls": self.polls,
+            "avg_upload_seconds": self.upload_seconds / self.uploads if self.uploads else 0.0,
+            "avg_processing_seconds": (
+                self.processing_seconds / self.uploads if self.uploads else 0.0
+            ),
+            "last_upload_seconds": self.last_upload_seconds,
+            "last_processing_seconds": self.last_processing_seconds,
+        }
+
+
+upload_metrics = UploadMetrics()
+
+
+async def upload_and_wait(
+    gemini_client,
+    file_path: str,
+    timeout: float = GEMINI_PROCESSING_TIMEOUT,
+):
+    """
+    Upload a file with the async SDK and wait until Gemini has processed it.
+
+    The processing state is polled with exponential backoff (starting at
+    GEMINI_POLL_INITIAL_DELAY, capped at GEMINI_POLL_MAX_DELAY). Files that fail
+    processing or exceed `timeout` are deleted and GeminiFileProcessingError is raised.
+    """
+    upload_start = time.time()
+    myfile = await gemini_client.aio.files.upload(file=file_path)
+    upload_seconds = time.time() - upload_start
+    upload_metrics.last_upload_seconds = upload_seconds
+    logger.debug(f"Gemini file upload took {upload_seconds:.2f}s")
+
+    processing_start = time.time()
+    delay = GEMINI_POLL_INITIAL_DELAY
+    while myfile.state == "PROCESSING":
+        elapsed = time.time() - processing_start
+        if elapsed >= timeout:
+            upload_metrics.timeouts += 1
+            upload_metrics.failures += 1
+            await _delete_file(gemini_client, myfile.name)
+            raise GeminiFileProcessingError(
+                f"Gemini processing timed out after {elapsed:.0f}s"
+            )
+        await asyncio.sleep(min(delay, timeout - elapsed))
+        delay = min(delay * GEMINI_POLL_BACKOFF, GEMINI_POLL_MAX_DELAY)
+        upload_metrics.polls += 1
+        myfile = await gemini_client.aio.files.get(name=myfile.name)
+    processing_seconds = time.time() - processing_start
+    upload_metrics.last_processing_seconds = processing_seconds
+    logger.debug(f"Gemini file processing wait took {processing_seconds:.2f}s")
+
+    if myfile.state != "ACTIVE":
+        upload_metrics.failures += 1
+        await _delete_file(gemini_client, myfile.name)
+        raise GeminiFileProcessingError(f"Gemini processing failed: {myfile.state}")
+
+    # Averages cover successful uploads only
+    upload_metrics.uploads += 1
+    upload_metrics.upload_seconds += upload_seconds
+    upload_metrics.processing_seconds += processing_seconds
+    return myfile
+
+
+async def _delete_file(gemini_client, file_name: str) -> None:
+    """Delete an uploaded file, ignoring errors (it expires on its own anyway)."""
+    try:
+        await gemini_client.aio.files.delete(name=file_name)
+    except Exception as e:
+        logger.debug(f"Failed to delete Gemini file {file_name}: {e}")
+
+
+@dataclass
+class RegisteredFile:
+    file: Any
+    expires_at: float
+
+
+def is_permission_denied(error: Exception) -> bool:
+    """Whether an API error means the referenced file is gone or no longer accessible."""
+    return (
+        getattr(error, "code", None) == 403
+        or getattr(error, "status", None) == "PERMISSION_DENIED"
+    )
+
+
+class GeminiFileRegistry:
+    """Maps (content hash, upload variant) -> ACTIVE Gemini file, refreshing uploads before they expire."""
+
+    def __init__(
+        self,
+        gemini_client,
+        refresh_margin: float = GEMINI_FILE_REFRESH_MARGIN,
+        max_files: int = GEMINI_FILE_REGISTRY_MAX,
+    ):
+        self.client = gemini_client
+        self.refresh_margin = refresh_margin
+        self.max_files = max_files
+        self.entries: OrderedDict[str, RegisteredFile] = OrderedDict()
+        self._uploads = SingleFlight()
+        # Keep references to background deletions so they are not garbage collected
+        self._deletions: set[asyncio.Task] = set()
+        self.uploads = 0
+        self.reuses = 0
+        self.reuploads_after_denied = 0
+
+    @staticmethod
+    def _key(video_hash: str) -> str:
+        # A proxy and the original (or proxies with other settings) are different uploads
+        return f"{video_hash}:{upload_variant()}"
+
+    async def acquire(self, video_hash: str, file_path: str):
+        """Return an ACTIVE file for the content, uploading it if needed."""
+        key = self._key(video_hash)
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires_at - time.time() > self.refresh_margin:
+            self.entries.move_to_end(key)
+            self.reuses += 1
+            return entry.file
+        return await self._uploads.do(key, lambda: self._upload(key, file_path))
+
+    async def run_with_file(
+        self,
+        video_hash: str,
+        file_path: str,
+        fn: Callable[[Any], Awaitable[Any]],
+    ) -> Any:
+        """
+        Call `fn(myfile)` with the registered file for the content.
+
+        If Gemini rejects the file with PERMISSION_DENIED/403 (e.g. it expired or
+        was deleted early), the file is re-uploaded and `fn` is retried once.
+        """
+        myfile = await self.acquire(video_hash, file_path)
+        try:
+            return await fn(myfile)
+        except Exception as e:
+            if not is_permission_denied(e):
+                raise
+            logger.warning(f"Gemini file {myfile.name} rejected ({e}); re-uploading")
+            self.reuploads_after_denied += 1
+            self.invalidate(video_hash, myfile.name)
+            myfile = await self.acquire(video_hash, file_path)
+            return await fn(myfile)
+
+    def invalidate(self, video_hash: str, file_name: str | None = None) -> None:
+        """
+        Forget the file for the content and delete it remotely.
+
+        When `file_name` is given, only that exact upload is dropped, so a stale
+        failure cannot evict a fresh upload made by a concurrent request.
+        """
+        key = self._key(video_hash)
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        if file_name is not None and entry.file.name != file_name:
+            return
+        del self.entries[key]
+        self._delete_remote(entry.file.name)
+
+    async def _upload(self, key: str, file_path: str):
+        upload_start = time.time()
+        # Upload a low-bitrate proxy when enabled; local frame reads keep the original
+        proxy_path = await make_upload_proxy(file_path)
+        try:
+            myfile = await upload_and_wait(self.client, proxy_path or file_path)
+        finally:
+            if proxy_path is not None:
+                await asyncio.to_thread(remove_proxy, proxy_path)
+
+        self.uploads += 1
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self._delete_remote(previous.file.name)
+        self.entries[key] = RegisteredFile(
+            file=myfile, expires_at=self._expires_at(myfile, upload_start)
+        )
+        while len(self.entries) > self.max_files:
+            _, evicted = self.entries.popitem(last=False)
+            self._delete_remote(evicted.file.name)
+        return myfile
+
+    @staticmethod
+    def _expires_at(myfile, uploaded_at: float) -> float:
+        expiration_time = getattr(myfile, "expiration_time", None)
+        if expiration_time is not None:
+            return expiration_time.timestamp()
+        return uploaded_at + GEMINI_FILE_TTL
+
+    def _delete_remote(self, file_name: str) -> None:
+        """Delete a file in the background; callers never wait on the API."""
+        task = asyncio.get_running_loop().create_task(
+            _delete_file(self.client, file_name)
+        )
+        self._deletions.add(task)
+        task.add_done_callback(self._deletions.discard)
+
+    def stats(self) -> dict:
+        """Upload, reuse and 403 re-upload counters, plus upload and proxy timings."""
+        return {
+            "files": len(self.entries),
+            "uploads": self.uploads,
+            "reuses": self.reuses,
+            "reuploads_after_denied": self.reuploads_after_denied,
+            "upload_timings": upload_metrics.stats(),
+            "transcode": transcode_metrics.stats(),
+        }
+
+
+# Singleton instance
+_file_registry = GeminiFileRegistry(client)
+
+
+def get_file_registry() -> GeminiFileRegistry:
+    """Get the singleton Gemini file registry."""
+    return _file_registry
@@ -0,0 +1,482 @@
+"""
+Process-wide scheduler for Gemini generate_content calls.
+
+Every analysis call goes through `GeminiScheduler.generate_content`, which
+admits it only when its model has:
+
+- a free concurrency slot (GEMINI_MAX_CONCURRENT / GEMINI_BIAS_MAX_CONCURRENT),
+- a request in its requests-per-minute bucket (GEMINI_RPM / GEMINI_BIAS_RPM),
+- enough tokens in its tokens-per-minute bucket (GEMINI_TPM / GEMINI_BIAS_TPM).
+
+Calls cannot know their token count up front, so each one reserves an estimate
+(the running average of earlier calls of the same kind) and the bucket is
+corrected with the real `usage_metadata` count once the response arrives.
+
+Waiting calls are admitted by priority lane ("interactive" before "batch"),
+FIFO within a lane, so a user's upload is not stuck behind a background
+re-analysis burst. A 429 from the API pauses admissions for that model for
+GEMINI_RATE_LIMIT_COOLDOWN seconds so the following calls back off instead of
+failing together.
+
+A limit of 0 disables that particular limit. When the bias model is the same
+model as the main one, both share its API quota, so the two sets of limits are
+merged into one scheduler (see `merge_limits`).
+
+Hedging: when a caller passes `hedge=True` and a call of that kind has been
+running longer than the kind's recent p95 latency, one duplicate request is
+started. Whichever finishes first wins and the other is cancelled, which
+trims the tail caused by a single stalled request at the cost of a little
+extra quota. The delay is counted from the call's admission, not from when
+it was queued, and the duplicate only starts if the model can admit it
+right away (free slot and budget, nobody waiting), so a saturated model is
+never sent extra load.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any
+
+from config import bias_model, model
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MAX_CONCURRENT = int(os.getenv("GEMINI_MAX_CONCURRENT", "8"))
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "0"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "0"))
+GEMINI_BIAS_MAX_CONCURRENT = int(os.getenv("GEMINI_BIAS_MAX_CONCURRENT", "4"))
+GEMINI_BIAS_RPM = int(os.getenv("GEMINI_BIAS_RPM", "0"))
+GEMINI_BIAS_TPM = int(os.getenv("GEMINI_BIAS_TPM", "0"))
+# After a 429, no new calls to that model start for this many seconds
+GEMINI_RATE_LIMIT_COOLDOWN = float(os.getenv("GEMINI_RATE_LIMIT_COOLDOWN", "5"))
+# Tokens reserved for a kind of call before any of its responses have been seen
+GEMINI_TOKEN_ESTIMATE = int(os.getenv("GEMINI_TOKEN_ESTIMATE", "10000"))
+GEMINI_HEDGE_ENABLED = os.getenv("GEMINI_HEDGE_ENABLED", "true").lower() == "true"
+# Latency percentile after which a hedged call gets its duplicate
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "0.95"))
+# Successful calls of a kind needed before its percentile is trusted
+GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+# Never hedge sooner than this, whatever the percentile says
+GEMINI_HEDGE_MIN_DELAY = float(os.getenv("GEMINI_HEDGE_MIN_DELAY", "2"))
+# Recent latencies kept per kind of call
+LATENCY_WINDOW = 200
+
+# Admission order: earlier lanes always go first
+PRIORITY_LANES = ("interactive", "batch")
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Whether an API error is a quota / rate limit rejection."""
+    if getattr(error, "code", None) == 429:
+        return True
+    message = str(error)
+    return "RESOURCE_EXHAUSTED" in message or "429" in message
+
+
+@dataclass(frozen=True)
+class ModelLimits:
+    max_concurrent: int
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+
+
+def _stricter(a: int, b: int) -> int:
+    """The tighter of two per-minute limits, where 0 means unlimited."""
+    return min(a, b) if a and b else a or b
+
+
+def merge_limits(a: ModelLimits, b: ModelLimits) -> ModelLimits:
+    """
+    Limits for one model configured under two roles.
+
+    Both roles' concurrency adds up; the per-minute budgets describe the same API
+    quota, so the stricter one applies.
+    """
+    return ModelLimits(
+        max_concurrent=(
+            a.max_concurrent + b.max_concurrent if a.max_concurrent and b.max_concurrent else 0
+        ),
+        requests_per_minute=_stricter(a.requests_per_minute, b.requests_per_minute),
+        tokens_per_minute=_stricter(a.tokens_per_minute, b.tokens_per_minute),
+    )
+
+
+class TokenBucket:
+    """Per-minute budget refilled continuously; a capacity of 0 means unlimited."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (requests above capacity wait for a full bucket)."""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        if self.capacity > 0:
+            self.level -= amount
+
+    def adjust(self, delta: float) -> None:
+        """Charge (positive) or refund (negative) the difference to an earlier take."""
+        if self.capacity > 0:
+            self.level = min(self.capacity, self.level - delta)
+
+
+@dataclass
+class _Waiter:
+    lane: str
+    tokens: int
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+    released: bool = False
+
+
+class LaneMetrics:
+    """Admission counters and queue wait times for one priority lane."""
+
+    def __init__(self):
+        self.admitted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float) -> None:
+        self.admitted += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def stats(self, queued: int) -> dict:
+        return {
+            "queued": queued,
+            "admitted": self.admitted,
+            "avg_wait_seconds": self.total_wait / self.admitted if self.admitted else 0.0,
+            "max_wait_seconds": self.max_wait,
+        }
+
+
+class ModelScheduler:
+    """Concurrency slots, RPM/TPM buckets and priority queues for one model."""
+
+    def __init__(self, name: str, limits: ModelLimits):
+        self.name = name
+        self.limits = limits
+        self.requests = TokenBucket(limits.requests_per_minute)
+        self.tokens = TokenBucket(limits.tokens_per_minute)
+        self.in_flight = 0
+        self.queues: dict[str, deque[_Waiter]] = {lane: deque() for lane in PRIORITY_LANES}
+        self.lane_metrics = {lane: LaneMetrics() for lane in PRIORITY_LANES}
+        self.throttled = 0
+        self.paused_until = 0.0
+        self._retry_handle: asyncio.TimerHandle | None = None
+        self._retry_loop: asyncio.AbstractEventLoop | None = None
+
+    async def acquire(self, lane: str, tokens: int) -> _Waiter:
+        """Wait until the call may start; the returned ticket must be released."""
+        if lane not in self.queues:
+            raise ValueError(f"Unknown priority lane: {lane}")
+        waiter = _Waiter(lane, tokens, asyncio.get_running_loop().create_future())
+        self.queues[lane].append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just before the caller went away: give the slot back
+                self.release(waiter, None)
+            elif waiter in self.queues[lane]:
+                self.queues[lane].remove(waiter)
+            raise
+        return waiter
+
+    def try_acquire(self, lane: str, tokens: int) -> _Waiter | None:
+        """Admit a call now if it needs no wait and overtakes nobody; None otherwise."""
+        if any(self.queues.values()) or 0 < self.limits.max_concurrent <= self.in_flight:
+            return None
+        now = time.monotonic()
+        if (
+            self.paused_until > now
+            or self.requests.wait_time(1, now) > 0
+            or self.tokens.wait_time(tokens, now) > 0
+        ):
+            return None
+        waiter = _Waiter(lane, tokens, asyncio.get_running_loop().create_future())
+        self._admit(waiter, now)
+        return waiter
+
+    def release(self, waiter: _Waiter, actual_tokens: int | None) -> None:
+        """Free the call's slot and settle its token reservation (once per ticket)."""
+        if waiter.released:
+            return
+        waiter.released = True
+        self.in_flight -= 1
+        if actual_tokens is not None:
+            self.tokens.adjust(actual_tokens - waiter.tokens)
+        self._dispatch()
+
+    def on_rate_limited(self) -> None:
+        """The API rejected a call with 429: hold new calls for the cooldown."""
+        self.throttled += 1
+        self.paused_until = time.monotonic() + GEMINI_RATE_LIMIT_COOLDOWN
+        logger.warning(f"Gemini rate limit hit for {self.name}; backing off")
+
+    def _head(self) -> _Waiter | None:
+        for lane in PRIORITY_LANES:
+            if self.queues[lane]:
+                return self.queues[lane][0]
+        return None
+
+    def _dispatch(self) -> None:
+        """Admit waiters in priority order while slots and budgets allow."""
+        while True:
+            waiter = self._head()
+            if waiter is None:
+                return
+            if 0 < self.limits.max_concurrent <= self.in_flight:
+                return
+            if waiter.future.done():
+                # Cancelled while queued
+                self.queues[waiter.lane].popleft()
+                continue
+            now = time.monotonic()
+            delay = max(
+                self.paused_until - now,
+                self.requests.wait_time(1, now),
+                self.tokens.wait_time(waiter.tokens, now),
+            )
+            if delay > 0:
+                self._schedule_retry(delay)
+                return
+            self.queues[waiter.lane].popleft()
+            self._admit(waiter, now)
+
+    def _admit(self, waiter: _Waiter, now: float) -> None:
+        self.requests.take(1)
+        self.tokens.take(waiter.tokens)
+        self.in_flight += 1
+        self.lane_metrics[waiter.lane].record(now - waiter.enqueued_at)
+        waiter.future.set_result(None)
+
+    def _schedule_retry(self, delay: float) -> None:
+        loop = asyncio.get_running_loop()
+        when = loop.time() + delay
+        handle = self._retry_handle
+        if handle is not None and self._retry_loop is loop and not handle.cancelled():
+            if handle.when() <= when:
+                return
+            handle.cancel()
+        self._retry_handle = loop.call_at(when, self._on_retry)
+        self._retry_loop = loop
+
+    def _on_retry(self) -> None:
+        self._retry_handle = None
+        self._dispatch()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrent": self.limits.max_concurrent,
+            "requests_per_minute": self.limits.requests_per_minute,
+            "tokens_per_minute": self.limits.tokens_per_minute,
+            "request_budget": self.requests.level if self.requests.capacity else None,
+            "token_budget": self.tokens.level if self.tokens.capacity else None,
+            "throttled": self.throttled,
+            "lanes": {
+                lane: self.lane_metrics[lane].stats(len(self.queues[lane]))
+                for lane in PRIORITY_LANES
+            },
+        }
+
+
+class GeminiScheduler:
+    """Routes Gemini calls through per-model schedulers."""
+
+    def __init__(self, limits: dict[str, ModelLimits], default_limits: ModelLimits):
+        self.limits = limits
+        self.default_limits = default_limits
+        self.models: dict[str, ModelScheduler] = {}
+        # Running average of total tokens per kind of call, used as the reservation
+        self.token_estimates: dict[str, float] = {}
+        # Recent successful call latencies per kind, for the hedge delay
+        self.latencies: dict[str, deque[float]] = {}
+        self.hedges = 0
+        self.hedge_wins = 0
+        # Hedges not started because the model had no slot or budget to spare
+        self.hedges_skipped = 0
+
+    def for_model(self, model_name: str) -> ModelScheduler:
+        if model_name not in self.models:
+            self.models[model_name] = ModelScheduler(
+                model_name, self.limits.get(model_name, self.default_limits)
+            )
+        return self.models[model_name]
+
+    def estimate(self, kind: str) -> int:
+        return int(self.token_estimates.get(kind, GEMINI_TOKEN_ESTIMATE))
+
+    def _learn(self, kind: str, actual_tokens: int) -> None:
+        previous = self.token_estimates.get(kind)
+        self.token_estimates[kind] = (
+            actual_tokens if previous is None else 0.8 * previous + 0.2 * actual_tokens
+        )
+
+    def hedge_delay(self, kind: str) -> float | None:
+        """Seconds after which a call of this kind is hedged, or None if not yet known."""
+        samples = self.latencies.get(kind)
+        if not samples or len(samples) < GEMINI_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * GEMINI_HEDGE_PERCENTILE))
+        return max(GEMINI_HEDGE_MIN_DELAY, ordered[index])
+
+    async def generate_content(
+        self,
+        gemini_client,
+        *,
+        model: str,
+        contents: Any,
+        config: Any = None,
+        priority: str = "interactive",
+        kind: str = "default",
+        hedge: bool = False,
+    ):
+        """
+        Call `gemini_client.aio.models.generate_content` once the model's limits allow.
+
+        `kind` groups calls with similar token counts and latencies (e.g. the
+        pipeline stage) for the token reservation estimate and the hedge delay.
+        With `hedge=True` a duplicate call is raced against a slow one.
+        """
+        call = partial(self._call, gemini_client, model, contents, config, priority, kind)
+        delay = self.hedge_delay(kind) if hedge and GEMINI_HEDGE_ENABLED else None
+        if delay is None:
+            return await call()
+
+        admitted = asyncio.Event()
+        primary = asyncio.ensure_future(call(admitted=admitted))
+        admission = asyncio.ensure_future(admitted.wait())
+        backup = None
+        try:
+            # Time spent queued for admission is not latency a duplicate could save
+            await asyncio.wait({primary, admission}, return_when=asyncio.FIRST_COMPLETED)
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+
+            scheduler = self.for_model(model)
+            ticket = scheduler.try_acquire(priority, self.estimate(kind))
+            if ticket is None:
+                self.hedges_skipped += 1
+                return await primary
+
+            self.hedges += 1
+            logger.info(f"Hedging slow {kind} call to {model} after {delay:.1f}s")
+            backup = asyncio.ensure_future(call(ticket=ticket))
+            # Gives the slot back even if the backup is cancelled before it starts
+            backup.add_done_callback(lambda _: scheduler.release(ticket, None))
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.hedge_wins += 1
+                        return task.result()
+            # Both attempts failed: surface the original call's error
+            return primary.result()
+        finally:
+            for task in (primary, admission, backup):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _call(
+        self,
+        gemini_client,
+        model: str,
+        contents: Any,
+        config: Any,
+        priority: str,
+        kind: str,
+        admitted: asyncio.Event | None = None,
+        ticket: _Waiter | None = None,
+    ):
+        """One API call; waits for admission unless it was given an admitted `ticket`."""
+        scheduler = self.for_model(model)
+        if ticket is None:
+            ticket = await scheduler.acquire(priority, self.estimate(kind))
+        if admitted is not None:
+            admitted.set()
+        actual_tokens = None
+        start = time.monotonic()
+        try:
+            response = await gemini_client.aio.models.generate_content(
+                model=model, contents=contents, config=config
+            )
+            self.latencies.setdefault(kind, deque(maxlen=LATENCY_WINDOW)).append(
+                time.monotonic() - start
+            )
+            usage = getattr(response, "usage_metadata", None)
+            actual_tokens = getattr(usage, "total_token_count", None)
+            if actual_tokens:
+                self._learn(kind, actual_tokens)
+            return response
+        except Exception as e:
+            if is_rate_limited(e):
+                scheduler.on_rate_limited()
+            raise
+        finally:
+            scheduler.release(ticket, actual_tokens)
+
+    def stats(self) -> dict:
+        """Per-model slots, budgets, per-lane queue depth and wait times, and hedging."""
+        return {
+            "models": {name: s.stats() for name, s in self.models.items()},
+            "token_estimates": {k: int(v) for k, v in self.token_estimates.items()},
+            "hedging": {
+                "enabled": GEMINI_HEDGE_ENABLED,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "hedges_skipped": self.hedges_skipped,
+                "delays": {kind: self.hedge_delay(kind) for kind in self.latencies},
+            },
+        }
+
+
+def _model_limits() -> dict[str, ModelLimits]:
+    """Per-model limits for the main and bias models."""
+    main_limits = ModelLimits(GEMINI_MAX_CONCURRENT, GEMINI_RPM, GEMINI_TPM)
+    bias_limits = ModelLimits(GEMINI_BIAS_MAX_CONCURRENT, GEMINI_BIAS_RPM, GEMINI_BIAS_TPM)
+    if bias_model != model:
+        return {model: main_limits, bias_model: bias_limits}
+    merged = merge_limits(main_limits, bias_limits)
+    logger.warning(
+        f"Bias model is the main model ({model}); merged GEMINI_* and GEMINI_BIAS_* "
+        f"limits into one scheduler: {merged}"
+    )
+    return {model: merged}
+
+
+# Singleton instance
+_scheduler = GeminiScheduler(
+    limits=_model_limits(),
+    default_limits=ModelLimits(GEMINI_MAX_CONCURRENT, GEMINI_RPM, GEMINI_TPM),
+)
+
+
+def get_gemini_scheduler() -> GeminiScheduler:
+    """Get the singleton Gemini scheduler."""
+    return _scheduler
@@ -0,0 +1,108 @@
+"""
+Video ingest helpers: get downloaded or uploaded video bytes onto local disk.
+
+Videos are streamed in chunks straight into the destination file while their
+SHA-256 is computed, so neither a download nor an upload ever holds the whole
+video in memory, and the content hash used for cache keys comes for free.
+"""
+
+import hashlib
+import logging
+import os
+
+import httpx
+from fastapi import UploadFile
+
+from config import MAX_VIDEO_BYTES
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_CHUNK_SIZE = 256 * 1024  # 256 KB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+
+class VideoTooLargeError(ValueError):
+    """Raised when a video exceeds the configured byte limit."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Video exceeds the maximum size of {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class VideoDownloadError(Exception):
+    """Raised when the video host answers with a non-200 status."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Video download failed with status {status_code}")
+        self.status_code = status_code
+
+
+async def stream_to_file(
+    http_client: httpx.AsyncClient,
+    url: str,
+    dest_path: str,
+    max_bytes: int = MAX_VIDEO_BYTES,
+) -> tuple[str, int]:
+    """
+    Stream `url` into `dest_path`, hashing it on the way.
+
+    Returns (sha256 hex digest, size in bytes). The stream is abandoned as soon as
+    the advertised or received size passes `max_bytes`; a partial file is removed
+    on any failure.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with http_client.stream("GET", url) as response:
+            if response.status_code != 200:
+                raise VideoDownloadError(response.status_code)
+
+            content_length = response.headers.get("content-length")
+            if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                raise VideoTooLargeError(max_bytes)
+
+            with open(dest_path, "wb") as f:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise VideoTooLargeError(max_bytes)
+                    digest.update(chunk)
+                    f.write(chunk)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+
+    logger.debug(f"Streamed {size} bytes from {url} to {dest_path}")
+    return digest.hexdigest(), size
+
+
+async def save_upload(
+    upload: UploadFile, dest_path: str, max_bytes: int = MAX_VIDEO_BYTES
+) -> tuple[str, int]:
+    """
+    Copy an uploaded file to `dest_path` in fixed-size chunks, hashing it on the way.
+
+    Returns (sha256 hex digest, size in bytes). Raises VideoTooLargeError as soon as
+    the upload passes `max_bytes`; a partial file is removed on any failure.
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise VideoTooLargeError(max_bytes)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest_path, "wb") as f:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise VideoTooLargeError(max_bytes)
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+
+    logger.debug(f"Saved {size} byte upload {upload.filename} to {dest_path}")
+    return digest.hexdigest(), size
@@ -0,0 +1,496 @@
+"""
+Durable analysis jobs: a SQLite-backed queue consumed by in-process workers.
+
+`POST /jobs` only records a job and returns its id, so long analyses no
+longer have to finish within one HTTP request (and proxy timeout). A pool of
+JOBS_WORKERS asyncio workers claims queued jobs, runs the handler registered
+for the job's kind, and stores the result and per-stage timings.
+
+Reliability:
+
+- the queue lives in a WAL-mode SQLite database (JOBS_DB_PATH), so queued
+  jobs survive restarts, and several processes may share it;
+- a claimed job is leased to its process for JOBS_LEASE_SECONDS and the
+  lease is renewed while the job runs; a job whose lease expired (its
+  process died) is queued again by any live pool;
+- a failed attempt is retried with exponential backoff (JOBS_RETRY_DELAY,
+  doubling, capped at JOBS_RETRY_MAX_DELAY) up to JOBS_MAX_ATTEMPTS, unless
+  the handler raised PermanentJobError (e.g. the URL is dead);
+- a graceful shutdown puts running jobs back in the queue without counting
+  the interrupted attempt.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = Path(os.getenv("JOBS_DIR", str(Path(__file__).parent.parent.parent / "jobs")))
+JOBS_DB_PATH = Path(os.getenv("JOBS_DB_PATH", str(JOBS_DIR / "jobs.db")))
+JOBS_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+# Uploaded videos are kept here until their job finishes
+JOBS_UPLOAD_DIR = Path(os.getenv("JOBS_UPLOAD_DIR", str(JOBS_DIR / "uploads")))
+JOBS_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+JOBS_RETRY_DELAY = float(os.getenv("JOBS_RETRY_DELAY", "10"))
+JOBS_RETRY_MAX_DELAY = float(os.getenv("JOBS_RETRY_MAX_DELAY", "300"))
+# Idle workers look for due jobs (e.g. retries) at least this often
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1"))
+# A running job not renewed for this long is taken to be orphaned and queued again
+JOBS_LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", "60"))
+# Finished jobs are deleted this long after they finish
+JOBS_RETENTION = int(os.getenv("JOBS_RETENTION", str(7 * 24 * 3600)))
+
+# Job states: queued -> running -> succeeded | failed (running -> queued on retry)
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+
+
+class PermanentJobError(Exception):
+    """Raised by a job handler for failures a retry will not fix."""
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    params: dict[str, Any]
+    status: str
+    attempts: int
+    max_attempts: int
+    run_after: float
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    result: Any = None
+    stage_timings: Optional[dict[str, float]] = None
+
+
+_JOB_COLUMNS = (
+    "id, kind, params, status, attempts, max_attempts, run_after, created_at, "
+    "started_at, finished_at, error, result, stage_timings"
+)
+
+
+def _job_from_row(row: tuple) -> Job:
+    (
+        job_id, kind, params, status, attempts, max_attempts, run_after,
+        created_at, started_at, finished_at, error, result, stage_timings,
+    ) = row
+    return Job(
+        id=job_id,
+        kind=kind,
+        params=json.loads(params),
+        status=status,
+        attempts=attempts,
+        max_attempts=max_attempts,
+        run_after=run_after,
+        created_at=created_at,
+        started_at=started_at,
+        finished_at=finished_at,
+        error=error,
+        result=json.loads(result) if result is not None else None,
+        stage_timings=json.loads(stage_timings) if stage_timings is not None else None,
+    )
+
+
+class JobStore:
+    """
+    Jobs table in a single SQLite database in WAL mode (blocking; call via a thread).
+
+    Claiming a job is one transaction, so each queued job is handed to exactly
+    one worker. A claimed job records this store's `owner` id and a lease
+    expiry; only the owner may renew it or record its outcome.
+    """
+
+    def __init__(self, db_path: Path = JOBS_DB_PATH, lease_seconds: float = JOBS_LEASE_SECONDS):
+        self._lock = threading.Lock()
+        self.lease_seconds = lease_seconds
+        # Identifies this process' claims among all users of the database
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        self.conn = sqlite3.connect(
+            str(db_path), check_same_thread=False, isolation_level=None
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                run_after REAL NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                error TEXT,
+                result TEXT,
+                stage_timings TEXT,
+                owner TEXT,
+                lease_until REAL
+            )
+            """
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in (("owner", "TEXT"), ("lease_until", "REAL")):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, run_after)"
+        )
+
+    def add(self, kind: str, params: dict[str, Any], max_attempts: int) -> Job:
+        now = time.time()
+        job = Job(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            params=params,
+            status="queued",
+            attempts=0,
+            max_attempts=max_attempts,
+            run_after=now,
+            created_at=now,
+        )
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO jobs (id, kind, params, status, attempts, max_attempts, "
+                "run_after, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, kind, json.dumps(params), job.status, 0, max_attempts, now, now),
+            )
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return _job_from_row(row) if row is not None else None
+
+    def claim(self) -> Optional[Job]:
+        """Mark the next due queued job as running (one more attempt) and return it."""
+        now = time.time()
+        with self._lock:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                row = self.conn.execute(
+                    f"SELECT {_JOB_COLUMNS} FROM jobs "
+                    "WHERE status = 'queued' AND run_after <= ? "
+                    "ORDER BY run_after, created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    return None
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, "
+                    "started_at = ?, owner = ?, lease_until = ? WHERE id = ?",
+                    (now, self.owner, now + self.lease_seconds, row[0]),
+                )
+        job = _job_from_row(row)
+        job.status = "running"
+        job.attempts += 1
+        job.started_at = now
+        return job
+
+    def _update_owned(self, job_id: str, assignments: str, params: tuple) -> bool:
+        """Apply `assignments` to a job this store is running; False if it lost the job."""
+        with self._lock:
+            return (
+                self.conn.execute(
+                    f"UPDATE jobs SET {assignments} "
+                    "WHERE id = ? AND status = 'running' AND owner = ?",
+                    (*params, job_id, self.owner),
+                ).rowcount
+                == 1
+            )
+
+    def renew(self, job_id: str) -> bool:
+        """Extend the lease on a running job; False if it has been taken away."""
+        return self._update_owned(
+            job_id, "lease_until = ?", (time.time() + self.lease_seconds,)
+        )
+
+    def succeed(self, job_id: str, result: Any, stage_timings: dict[str, float]) -> bool:
+        return self._update_owned(
+            job_id,
+            "status = 'succeeded', finished_at = ?, error = NULL, result = ?, "
+            "stage_timings = ?, owner = NULL, lease_until = NULL",
+            (time.time(), json.dumps(result), json.dumps(stage_timings)),
+        )
+
+    def fail(self, job_id: str, error: str) -> bool:
+        return self._update_owned(
+            job_id,
+            "status = 'failed', finished_at = ?, error = ?, owner = NULL, lease_until = NULL",
+            (time.time(), error),
+        )
+
+    def retry(self, job_id: str, error: str, run_after: float) -> bool:
+        """Queue a job again after a failed attempt, keeping the error for GET /jobs."""
+        return self._update_owned(
+            job_id,
+            "status = 'queued', run_after = ?, error = ?, owner = NULL, lease_until = NULL",
+            (run_after, error),
+        )
+
+    def release(self, job_id: str) -> bool:
+        """Queue an interrupted job again without counting the attempt."""
+        return self._update_owned(
+            job_id,
+            "status = 'queued', attempts = attempts - 1, owner = NULL, lease_until = NULL",
+            (),
+        )
+
+    def recover(self) -> list[Job]:
+        """
+        Queue again running jobs whose lease expired (their process died).
+
+        Their attempt counts; jobs already out of attempts fail instead. Jobs
+        whose owner keeps renewing the lease, in this or another process, are
+        left alone. Returns the jobs that failed this way.
+        """
+        now = time.time()
+        expired = "status = 'running' AND (lease_until IS NULL OR lease_until < ?)"
+        with self._lock:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                exhausted = self.conn.execute(
+                    f"SELECT {_JOB_COLUMNS} FROM jobs "
+                    f"WHERE {expired} AND attempts >= max_attempts",
+                    (now,),
+                ).fetchall()
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, "
+                    "error = 'Interrupted: its worker stopped responding', "
+                    "owner = NULL, lease_until = NULL "
+                    f"WHERE {expired} AND attempts >= max_attempts",
+                    (now, now),
+                )
+                requeued = self.conn.execute(
+                    "UPDATE jobs SET status = 'queued', run_after = ?, owner = NULL, "
+                    f"lease_until = NULL WHERE {expired}",
+                    (now, now),
+                ).rowcount
+        if requeued:
+            logger.warning(f"Re-queued {requeued} job(s) whose worker stopped responding")
+        return [_job_from_row(row) for row in exhausted]
+
+    def purge(self, older_than: float) -> int:
+        """Delete jobs that finished before `older_than`."""
+        with self._lock:
+            return self.conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (older_than,),
+            ).rowcount
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update(dict(rows))
+        return counts
+
+
+# A handler returns (JSON-serializable result, stage timings in seconds)
+JobHandler = Callable[[Job], Awaitable[tuple[Any, dict[str, float]]]]
+
+
+@dataclass
+class _Registration:
+    handler: JobHandler
+    # Called once the job reaches a final state (e.g. to delete its upload)
+    on_finished: Optional[Callable[[Job], None]] = None
+
+
+class JobWorkerPool:
+    """In-process workers that run queued jobs with the handler registered for their kind."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int = JOBS_WORKERS,
+        max_attempts: int = JOBS_MAX_ATTEMPTS,
+    ):
+        self.store = store
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.handlers: dict[str, _Registration] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._reaper: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+
+    def register(
+        self,
+        kind: str,
+        handler: JobHandler,
+        on_finished: Optional[Callable[[Job], None]] = None,
+    ) -> None:
+        self.handlers[kind] = _Registration(handler, on_finished)
+
+    async def submit(self, kind: str, params: dict[str, Any]) -> Job:
+        """Persist a new job and wake an idle worker."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = await asyncio.to_thread(self.store.add, kind, params, self.max_attempts)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def start(self) -> None:
+        """Recover orphaned jobs, purge old ones, and start the workers."""
+        await self._recover()
+        purged = await asyncio.to_thread(self.store.purge, time.time() - JOBS_RETENTION)
+        if purged:
+            logger.info(f"Purged {purged} finished job(s)")
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        self._reaper = asyncio.create_task(self._reap())
+
+    async def stop(self) -> None:
+        """Cancel the workers; their running jobs go back to the queue."""
+        tasks = [*self._tasks, *([self._reaper] if self._reaper else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._reaper = None
+
+    async def _recover(self) -> None:
+        for job in await asyncio.to_thread(self.store.recover):
+            self._finished(job)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _reap(self) -> None:
+        """Queue again jobs orphaned by other processes sharing the database."""
+        while True:
+            await asyncio.sleep(self.store.lease_seconds)
+            try:
+                await self._recover()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to recover orphaned jobs: {e}")
+
+    async def _renew_lease(self, job: Job) -> None:
+        """Renew the job's lease while it runs, so no other pool takes it over."""
+        while True:
+            await asyncio.sleep(self.store.lease_seconds / 3)
+            try:
+                renewed = await asyncio.to_thread(self.store.renew, job.id)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to renew the lease on job {job.id}: {e}")
+                continue
+            if not renewed:
+                logger.warning(f"Job {job.id} lost its lease; its outcome will be discarded")
+                return
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            # Cleared before claiming, so a job submitted meanwhile still wakes us
+            self._wakeup.clear()
+            try:
+                job = await asyncio.to_thread(self.store.claim)
+            except sqlite3.Error as e:
+                logger.error(f"Job worker {index} failed to claim a job: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOBS_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Job) -> None:
+        registration = self.handlers.get(job.kind)
+        print(f"DEBUG: [JOBS] Running job {job.id} ({job.kind}), attempt {job.attempts}")
+        lease = asyncio.create_task(self._renew_lease(job))
+        try:
+            if registration is None:
+                raise PermanentJobError(f"No handler for job kind '{job.kind}'")
+            result, stage_timings = await registration.handler(job)
+        except asyncio.CancelledError:
+            # Shutting down: the job is picked up again after the restart
+            await asyncio.shield(asyncio.to_thread(self.store.release, job.id))
+            raise
+        except Exception as e:
+            await self._on_failure(job, e)
+            return
+        finally:
+            lease.cancel()
+
+        if not await asyncio.to_thread(self.store.succeed, job.id, result, stage_timings):
+            logger.warning(f"Job {job.id} finished after losing its lease; result discarded")
+            return
+        self.succeeded += 1
+        print(f"DEBUG: [JOBS] Job {job.id} succeeded")
+        self._finished(job)
+
+    async def _on_failure(self, job: Job, error: Exception) -> None:
+        message = str(error) or type(error).__name__
+        if isinstance(error, PermanentJobError) or job.attempts >= job.max_attempts:
+            if not await asyncio.to_thread(self.store.fail, job.id, message):
+                logger.warning(f"Job {job.id} failed after losing its lease; outcome discarded")
+                return
+            self.failed += 1
+            print(f"ERROR: [JOBS] Job {job.id} failed after {job.attempts} attempt(s): {message}")
+            self._finished(job)
+            return
+
+        delay = min(JOBS_RETRY_DELAY * 2 ** (job.attempts - 1), JOBS_RETRY_MAX_DELAY)
+        if not await asyncio.to_thread(self.store.retry, job.id, message, time.time() + delay):
+            logger.warning(f"Job {job.id} failed after losing its lease; outcome discarded")
+            return
+        self.retried += 1
+        print(
+            f"WARNING: [JOBS] Job {job.id} attempt {job.attempts} failed ({message}); "
+            f"retrying in {delay:.1f}s"
+        )
+
+    def _finished(self, job: Job) -> None:
+        registration = self.handlers.get(job.kind)
+        if registration is None or registration.on_finished is None:
+            return
+        try:
+            registration.on_finished(job)
+        except Exception as e:
+            logger.warning(f"Cleanup for job {job.id} failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "jobs": self.store.counts(),
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+
+# Singleton instance
+_job_pool = JobWorkerPool(JobStore())
+
+
+def get_job_pool() -> JobWorkerPool:
+    """Get the singleton job worker pool."""
+    return _job_pool
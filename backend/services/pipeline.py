@@ -0,0 +1,541 @@
+"""
+DAG engine for video analysis pipelines.
+
+A pipeline is a set of named stages, each declaring which other stages it
+needs. Running a pipeline starts every stage as its own task; a stage begins
+as soon as the stages it depends on have finished, so independent Gemini
+calls and local work (probing, frame decoding) overlap without each endpoint
+hand-writing its own `asyncio.gather` choreography.
+
+The engine applies the cross-cutting policies uniformly:
+
+- caching: stages with a `cache` spec read and write the per-stage cache
+  (keyed by content hash, model and prompt) before calling Gemini;
+- timeouts: every stage runs under `timeout` (PIPELINE_STAGE_TIMEOUT by default,
+  PIPELINE_OPTIONAL_STAGE_TIMEOUT for optional stages, at least
+  PIPELINE_BATCH_STAGE_TIMEOUT for background runs); the clock stops while a
+  stage waits for the shared Gemini upload, which has its own deadline;
+- failure: a required stage failing cancels its siblings right away (so no
+  quota is spent on a result that will be thrown away) and fails the run,
+  while an `optional` stage failing yields None to its dependents and is
+  listed in `ctx.degraded`, so callers can serve a partial result;
+- metrics: per-stage runs, cache hits, failures, timeouts, durations and
+  Gemini request/token usage (recorded by stages via `ctx.record_usage`);
+- progress: stages with an `event` name publish their result to
+  `ctx.events` (when the caller attached a queue, e.g. for Server-Sent
+  Events) as soon as they finish, and optional ones publish a `degraded`
+  event when they fail;
+- resources: Gemini context caches acquired by stages through
+  `ctx.run_with_context_cache` are held for the whole run and released when
+  it ends, whether it succeeded or not.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from cache import get_cache, make_stage_key
+from services.gemini_context_cache import (
+    GEMINI_CONTEXT_CACHE_ENABLED,
+    ContextCacheEntry,
+    get_context_cache_registry,
+    is_cache_missing,
+)
+from models.video import DegradedStageEvent, UploadActiveEvent
+from services.gemini_files import get_file_registry
+from services.transcode import upload_variant
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for a single stage (0 disables). Kept below the 180s clients wait for
+# a response, so a stuck stage fails the request with an error instead of leaving
+# the client to time out. Waiting for the shared Gemini upload is not counted; it
+# is bounded by GEMINI_PROCESSING_TIMEOUT instead.
+# Individual stages can be given their own deadline with PIPELINE_TIMEOUT_<STAGE>,
+# e.g. PIPELINE_TIMEOUT_BIAS=90.
+PIPELINE_STAGE_TIMEOUT = float(os.getenv("PIPELINE_STAGE_TIMEOUT", "150"))
+# Optional stages (e.g. bias, characters) give up sooner: the result is served without them
+PIPELINE_OPTIONAL_STAGE_TIMEOUT = float(os.getenv("PIPELINE_OPTIONAL_STAGE_TIMEOUT", "60"))
+# Background runs (priority "batch": jobs, cache refreshes) have no client waiting
+# and queue behind interactive calls, so each of their stages gets at least this long
+PIPELINE_BATCH_STAGE_TIMEOUT = float(os.getenv("PIPELINE_BATCH_STAGE_TIMEOUT", "600"))
+
+
+def stage_timeout_from_env(stage_name: str) -> float | None:
+    """The PIPELINE_TIMEOUT_<STAGE> override for a stage, if set."""
+    value = os.getenv(f"PIPELINE_TIMEOUT_{stage_name.upper()}")
+    return float(value) if value else None
+
+
+class StageTimeoutError(Exception):
+    """Raised when a stage runs longer than its timeout."""
+
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"Stage '{stage}' timed out after {timeout:g}s")
+        self.stage = stage
+        self.timeout = timeout
+
+
+class _StageClock:
+    """
+    Deadline of one running stage, stopped while the stage waits for its Gemini file.
+
+    The clock restarts with the full timeout once the file is acquired, so a slow
+    shared upload does not eat into the Gemini call's budget.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+        self.waiting = 0
+        # Set whenever the deadline moves, to wake the stage's watcher
+        self.changed = asyncio.Event()
+
+    def stop(self) -> None:
+        self.waiting += 1
+        self.changed.set()
+
+    def restart(self) -> None:
+        self.waiting -= 1
+        self.deadline = time.monotonic() + self.timeout
+        self.changed.set()
+
+    def remaining(self) -> float | None:
+        """Seconds left, or None while the clock is stopped."""
+        if self.waiting:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+
+# The clock of the stage running in the current task, if it has a timeout
+_stage_clock: contextvars.ContextVar[_StageClock | None] = contextvars.ContextVar(
+    "stage_clock", default=None
+)
+
+
+def _empty_usage() -> dict[str, int]:
+    return {
+        "requests": 0,
+        "prompt_tokens": 0,
+        "output_tokens": 0,
+        "total_tokens": 0,
+        # Prompt tokens served from a context cache instead of being re-processed
+        "cached_tokens": 0,
+        # Tokens written into context caches created by this stage
+        "cache_write_tokens": 0,
+    }
+
+
+@dataclass
+class PipelineContext:
+    """Inputs shared by every stage of one pipeline run."""
+
+    video_path: str
+    video_hash: str
+    source: str
+    # Source-specific extras (e.g. a duration known from YouTube metadata)
+    params: dict[str, Any] = field(default_factory=dict)
+    # False skips per-stage cache reads (results are still written)
+    use_stage_cache: bool = True
+    # Gemini scheduler lane: "interactive" for user requests, "batch" for background work
+    priority: str = "interactive"
+    # Reference shared video context through Gemini context caches where stages allow it
+    use_context_cache: bool = GEMINI_CONTEXT_CACHE_ENABLED
+    # Receives (event, payload) progress tuples while the run is streamed
+    events: asyncio.Queue | None = None
+
+    # Per-run state; not constructor arguments, so `replace(ctx, ...)` starts afresh
+    # Optional stages that failed in this run (their dependents received None)
+    degraded: list[str] = field(default_factory=list, init=False)
+    # Gemini requests and token counts per stage for this run
+    usage: dict[str, dict[str, int]] = field(default_factory=dict, init=False)
+    # Seconds spent in each stage that ran (skipped stages are absent)
+    timings: dict[str, float] = field(default_factory=dict, init=False)
+    # Context caches held by this run, released when it ends
+    context_caches: list[ContextCacheEntry] = field(default_factory=list, init=False)
+    # One-off events already published in this run
+    published: set[str] = field(default_factory=set, init=False, repr=False)
+
+    def emit(self, event: str, payload: Any = None) -> None:
+        """Publish a progress event if someone is listening."""
+        if self.events is not None:
+            self.events.put_nowait((event, payload))
+
+    def record_usage(self, stage: str, usage_metadata: Any) -> None:
+        """Add one Gemini response's usage metadata to the stage's totals."""
+        totals = self.usage.setdefault(stage, _empty_usage())
+        totals["requests"] += 1
+        if usage_metadata is None:
+            return
+        totals["prompt_tokens"] += getattr(usage_metadata, "prompt_token_count", None) or 0
+        totals["output_tokens"] += (
+            getattr(usage_metadata, "candidates_token_count", None) or 0
+        )
+        totals["total_tokens"] += getattr(usage_metadata, "total_token_count", None) or 0
+        totals["cached_tokens"] += (
+            getattr(usage_metadata, "cached_content_token_count", None) or 0
+        )
+
+    async def run_with_file(self, fn: Callable[[Any], Awaitable[Any]]) -> Any:
+        """
+        Call `fn(myfile)` with the shared Gemini upload of this video.
+
+        The calling stage's timeout clock is stopped until the file is available.
+        """
+        clock = _stage_clock.get()
+        stopped = clock is not None
+        if stopped:
+            clock.stop()
+
+        def restart_clock():
+            nonlocal stopped
+            if stopped:
+                stopped = False
+                clock.restart()
+
+        async def with_file(myfile):
+            restart_clock()
+            if self.events is not None and "upload" not in self.published:
+                self.published.add("upload")
+                self.emit("upload", UploadActiveEvent(file_name=myfile.name))
+            return await fn(myfile)
+
+        try:
+            return await get_file_registry().run_with_file(
+                self.video_hash, self.video_path, with_file
+            )
+        finally:
+            restart_clock()
+
+    async def run_with_context_cache(
+        self,
+        stage: str,
+        model_name: str,
+        system_instruction: str | None,
+        fn: Callable[[Any, str | None], Awaitable[Any]],
+    ) -> Any:
+        """
+        Call `fn(myfile, cached_content)` with the video shared through a context cache.
+
+        `fn` gets `(None, cache name)` when a cache of (video, model, system
+        instruction) is available, and `(myfile, None)` when it is not - caching
+        disabled, creation failed, or the cache vanished mid-run - in which case
+        it must send the video and system instruction inline.
+        """
+        if not self.use_context_cache:
+            return await self.run_with_file(lambda myfile: fn(myfile, None))
+
+        registry = get_context_cache_registry()
+
+        async def with_file(myfile):
+            entry = await registry.acquire(
+                self.video_hash, myfile, model_name, system_instruction
+            )
+            if entry is None:
+                return await fn(myfile, None)
+            self.context_caches.append(entry)
+            if not entry.charged:
+                entry.charged = True
+                self.usage.setdefault(stage, _empty_usage())["cache_write_tokens"] += (
+                    entry.tokens
+                )
+            try:
+                return await fn(None, entry.name)
+            except Exception as e:
+                if not is_cache_missing(e):
+                    raise
+                logger.warning(f"Context cache {entry.name} unavailable ({e}); sending video inline")
+                registry.invalidate(entry)
+                return await fn(myfile, None)
+
+        return await self.run_with_file(with_file)
+
+    def release_context_caches(self) -> None:
+        """Release the context caches held by this run."""
+        registry = get_context_cache_registry()
+        while self.context_caches:
+            registry.release(self.context_caches.pop())
+
+
+@dataclass(frozen=True)
+class StageCache:
+    """
+    How a stage's result is cached.
+
+    `key(ctx, deps)` returns (model name, prompt) for the stage key; `schema` is
+    the pydantic model the cached dict is validated against.
+    """
+
+    key: Callable[[PipelineContext, dict[str, Any]], tuple[str, str]]
+    schema: Any
+    # Cache namespace; defaults to the stage name
+    name: str | None = None
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One node of a pipeline.
+
+    `run(ctx, deps)` receives the results of the stages named in `deps`. When
+    `skip(ctx, deps)` returns True the stage is not run and yields None. With
+    `event` set, the result is published to `ctx.events` under that name.
+    """
+
+    name: str
+    run: Callable[[PipelineContext, dict[str, Any]], Awaitable[Any]]
+    deps: tuple[str, ...] = ()
+    cache: StageCache | None = None
+    timeout: float | None = None
+    optional: bool = False
+    skip: Callable[[PipelineContext, dict[str, Any]], bool] | None = None
+    event: str | None = None
+
+
+class StageMetrics:
+    """Counters and cumulative time for one stage."""
+
+    def __init__(self):
+        self.runs = 0
+        self.cache_hits = 0
+        self.skipped = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.seconds = 0.0
+        self.usage = _empty_usage()
+
+    def add_usage(self, usage: dict[str, int]) -> None:
+        for key, value in usage.items():
+            self.usage[key] += value
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "cache_hits": self.cache_hits,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "avg_seconds": self.seconds / self.runs if self.runs else 0.0,
+            "gemini_usage": dict(self.usage),
+        }
+
+
+class PipelineMetrics:
+    """Per-pipeline run counters plus per-stage metrics."""
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.seconds = 0.0
+        self.stages: dict[str, StageMetrics] = {}
+
+    def stage(self, name: str) -> StageMetrics:
+        if name not in self.stages:
+            self.stages[name] = StageMetrics()
+        return self.stages[name]
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "avg_seconds": self.seconds / self.runs if self.runs else 0.0,
+            "stages": {name: m.stats() for name, m in self.stages.items()},
+        }
+
+
+class Pipeline:
+    """A validated DAG of stages producing the result of its `output` stage."""
+
+    def __init__(self, name: str, stages: list[Stage], output: str):
+        self.name = name
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError(f"Pipeline '{name}' has duplicate stage names")
+        if output not in self.stages:
+            raise ValueError(f"Pipeline '{name}' has no output stage '{output}'")
+        self.output = output
+        self.order = self._topological_order()
+        self.timeouts = {stage.name: self._resolve_timeout(stage) for stage in stages}
+        self.metrics = PipelineMetrics()
+
+    @staticmethod
+    def _resolve_timeout(stage: Stage) -> float:
+        """Declared timeout, else PIPELINE_TIMEOUT_<STAGE>, else the (optional) stage default."""
+        if stage.timeout is not None:
+            return stage.timeout
+        env_timeout = stage_timeout_from_env(stage.name)
+        if env_timeout is not None:
+            return env_timeout
+        return PIPELINE_OPTIONAL_STAGE_TIMEOUT if stage.optional else PIPELINE_STAGE_TIMEOUT
+
+    def _topological_order(self) -> list[str]:
+        order: list[str] = []
+        state: dict[str, str] = {}
+
+        def visit(name: str, path: tuple[str, ...]) -> None:
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Pipeline '{self.name}' has a cycle: {' -> '.join(path + (name,))}")
+            state[name] = "visiting"
+            for dep in self.stages[name].deps:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+                visit(dep, path + (name,))
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, ())
+        return order
+
+    async def run(self, ctx: PipelineContext) -> Any:
+        """Run every stage as soon as its dependencies finish; return the output."""
+        start = time.time()
+        tasks: dict[str, asyncio.Task] = {}
+        # Stages are created in dependency order, so every dep task already exists
+        for name in self.order:
+            tasks[name] = asyncio.ensure_future(self._run_stage(self.stages[name], ctx, tasks))
+        try:
+            # The first required stage to fail ends the run right away
+            done, _ = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+            result = tasks[self.output].result()
+        except BaseException:
+            self.metrics.failures += 1
+            for task in tasks.values():
+                task.cancel()
+            # Let cancelled stages unwind (and their exceptions be retrieved)
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            ctx.release_context_caches()
+            self.metrics.runs += 1
+            self.metrics.seconds += time.time() - start
+            for stage_name, usage in ctx.usage.items():
+                self.metrics.stage(stage_name).add_usage(usage)
+        print(f"DEBUG: [TIME] Pipeline {self.name} took {time.time() - start:.2f}s")
+        self._log_context_cache_savings(ctx)
+        return result
+
+    def _log_context_cache_savings(self, ctx: PipelineContext) -> None:
+        """Report the prompt tokens this run did not have to re-process."""
+        cached = sum(usage["cached_tokens"] for usage in ctx.usage.values())
+        written = sum(usage["cache_write_tokens"] for usage in ctx.usage.values())
+        if cached or written:
+            print(
+                f"DEBUG: [CONTEXT CACHE] {self.name}: {cached} prompt tokens served from cache, "
+                f"{written} written to cache, {cached - written} net tokens saved"
+            )
+
+    async def _run_stage(
+        self, stage: Stage, ctx: PipelineContext, tasks: dict[str, asyncio.Task]
+    ) -> Any:
+        deps = {}
+        for dep in stage.deps:
+            deps[dep] = await tasks[dep]
+
+        metrics = self.metrics.stage(stage.name)
+        if stage.skip is not None and stage.skip(ctx, deps):
+            metrics.skipped += 1
+            return None
+
+        stage_start = time.time()
+        timeout = self.timeouts[stage.name]
+        if ctx.priority == "batch" and timeout > 0:
+            timeout = max(timeout, PIPELINE_BATCH_STAGE_TIMEOUT)
+        try:
+            if timeout > 0:
+                result = await self._execute_with_timeout(stage, ctx, deps, metrics, timeout)
+            else:
+                result = await self._execute(stage, ctx, deps, metrics)
+        except Exception as e:
+            metrics.failures += 1
+            if isinstance(e, StageTimeoutError):
+                metrics.timeouts += 1
+            if stage.optional:
+                print(f"ERROR: [PIPELINE] {self.name}.{stage.name} degraded: {e}")
+                ctx.degraded.append(stage.name)
+                if stage.event is not None:
+                    ctx.emit("degraded", DegradedStageEvent(stage=stage.event, error=str(e)))
+                return None
+            raise
+        finally:
+            ctx.timings[stage.name] = time.time() - stage_start
+            metrics.runs += 1
+            metrics.seconds += time.time() - stage_start
+        print(
+            f"DEBUG: [TIME] {self.name}.{stage.name} took {time.time() - stage_start:.2f}s"
+        )
+        if stage.event is not None:
+            ctx.emit(stage.event, result)
+        return result
+
+    async def _execute_with_timeout(
+        self,
+        stage: Stage,
+        ctx: PipelineContext,
+        deps: dict[str, Any],
+        metrics: StageMetrics,
+        timeout: float,
+    ) -> Any:
+        """Run the stage, cancelling it once its clock runs out (see `_StageClock`)."""
+        clock = _StageClock(timeout)
+        _stage_clock.set(clock)
+        # The task copies this context, so `ctx.run_with_file` finds the clock
+        task = asyncio.ensure_future(self._execute(stage, ctx, deps, metrics))
+        try:
+            while not task.done():
+                clock.changed.clear()
+                remaining = clock.remaining()
+                if remaining == 0:
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    raise StageTimeoutError(stage.name, timeout)
+                changed = asyncio.ensure_future(clock.changed.wait())
+                try:
+                    await asyncio.wait(
+                        {task, changed}, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                    )
+                finally:
+                    changed.cancel()
+            return task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+
+    @staticmethod
+    async def _execute(
+        stage: Stage, ctx: PipelineContext, deps: dict[str, Any], metrics: StageMetrics
+    ) -> Any:
+        """Run the stage through the per-stage cache when it has a cache spec."""
+        if stage.cache is None:
+            return await stage.run(ctx, deps)
+
+        cache = get_cache()
+        model_name, prompt = stage.cache.key(ctx, deps)
+        stage_key = make_stage_key(
+            stage.cache.name or stage.name, ctx.video_hash, model_name, prompt, upload_variant()
+        )
+        cached_result = await cache.aget(stage_key) if ctx.use_stage_cache else None
+        if cached_result is not None:
+            try:
+                result = stage.cache.schema.model_validate(cached_result)
+                metrics.cache_hits += 1
+                return result
+            except Exception as e:
+                print(f"CACHE TYPE MISMATCH for {stage_key}: {e}")
+                await cache.ainvalidate(stage_key)
+
+        result = await stage.run(ctx, deps)
+        await cache.aset(stage_key, result.model_dump())
+        return result
+
+    def stats(self) -> dict:
+        return self.metrics.stats()
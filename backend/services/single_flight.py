@@ -0,0 +1,56 @@
+"""
+Single-flight coalescing for concurrent async work.
+
+When many requests ask for the same expensive result at once (e.g. 30 users
+pasting the same trending reel), only the first one runs the work; the others
+await the same task and receive the same result - or the same exception.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Run at most one in-flight call per key and share its outcome with all callers."""
+
+    def __init__(self):
+        self.calls: dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await the result of `fn()` for `key`, joining an in-flight call if one exists.
+
+        The shared task is shielded, so a cancelled caller does not cancel the work
+        for the others. The key is released as soon as the task finishes, so later
+        calls (including retries after a failure) start fresh.
+        """
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.calls[key] = task
+            self.started += 1
+            task.add_done_callback(lambda t: self._release(key, t))
+        else:
+            self.coalesced += 1
+            logger.debug(f"Joining in-flight call for {key}")
+        return await asyncio.shield(task)
+
+    def _release(self, key: str, task: asyncio.Task) -> None:
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        # Mark the exception as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        """Counters for started and coalesced calls."""
+        return {
+            "in_flight": len(self.calls),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
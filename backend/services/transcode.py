@@ -0,0 +1,260 @@
+"""
+Low-bitrate upload proxies for Gemini.
+
+Gemini upload time and processing wait both scale with the size of the file,
+while the analyses only need a small, low-frame-rate rendition of the video.
+When TRANSCODE_ENABLED is set, `make_upload_proxy` writes such a proxy next to
+the original and the Gemini file registry uploads it instead. Everything that
+reads pixels locally (character frame extraction, probing) keeps using the
+original file.
+
+ffmpeg is used when it is on PATH; without it the original is uploaded. The
+OpenCV backend cannot control bitrate or carry the audio track, so it is only
+used when asked for explicitly (TRANSCODE_BACKEND=opencv): its proxies are
+video-only and the transcript and sentiment analyses lose the audio. A proxy
+that is not smaller than the original is discarded.
+
+The backend is chosen once per process. `upload_variant()` names the
+rendition that gets uploaded and is part of the upload registry and analysis
+cache keys, so results computed from one rendition are never served for
+another (e.g. after ffmpeg is installed, or the proxy settings change).
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import shutil
+import time
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+TRANSCODE_ENABLED = os.getenv("TRANSCODE_ENABLED", "false").lower() == "true"
+# "auto" or "ffmpeg" (ffmpeg if on PATH, else no proxy), or "opencv" (video-only proxies)
+TRANSCODE_BACKEND = os.getenv("TRANSCODE_BACKEND", "auto")
+TRANSCODE_MAX_HEIGHT = int(os.getenv("TRANSCODE_MAX_HEIGHT", "360"))
+# 0 keeps the source frame rate
+TRANSCODE_FPS = float(os.getenv("TRANSCODE_FPS", "10"))
+TRANSCODE_VIDEO_BITRATE = os.getenv("TRANSCODE_VIDEO_BITRATE", "400k")
+TRANSCODE_AUDIO_BITRATE = os.getenv("TRANSCODE_AUDIO_BITRATE", "48k")
+TRANSCODE_TIMEOUT = float(os.getenv("TRANSCODE_TIMEOUT", "120"))
+
+
+class TranscodeMetrics:
+    """Counters for proxies produced, skipped and failed, plus size savings."""
+
+    def __init__(self):
+        self.proxies = 0
+        self.skipped = 0
+        self.failures = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+        self.by_backend: dict[str, int] = {}
+
+    def stats(self) -> dict:
+        return {
+            "enabled": TRANSCODE_ENABLED,
+            "proxies": self.proxies,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "by_backend": dict(self.by_backend),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "size_ratio": self.bytes_out / self.bytes_in if self.bytes_in else 0.0,
+            "avg_seconds": self.seconds / self.proxies if self.proxies else 0.0,
+        }
+
+
+transcode_metrics = TranscodeMetrics()
+
+
+def proxy_path_for(video_path: str) -> str:
+    """Where the proxy for `video_path` is written."""
+    base, _ = os.path.splitext(video_path)
+    return f"{base}.proxy.mp4"
+
+
+@functools.cache
+def _select_backend() -> str | None:
+    if TRANSCODE_BACKEND == "opencv":
+        return "opencv"
+    if shutil.which("ffmpeg"):
+        return "ffmpeg"
+    # The OpenCV fallback would drop the audio track the analyses rely on
+    logger.warning("ffmpeg is not on PATH; uploading original videos without a proxy")
+    return None
+
+
+def upload_variant() -> str:
+    """What the Gemini upload of a video holds: "original", or the proxy backend and settings."""
+    backend = _select_backend() if TRANSCODE_ENABLED else None
+    if backend is None:
+        return "original"
+    variant = f"{backend}-{TRANSCODE_MAX_HEIGHT}p-{TRANSCODE_FPS:g}fps"
+    if backend == "ffmpeg":
+        variant += f"-{TRANSCODE_VIDEO_BITRATE}-{TRANSCODE_AUDIO_BITRATE}"
+    return variant
+
+
+async def _transcode_ffmpeg(
+    video_path: str,
+    output_path: str,
+    max_height: int,
+    fps: float,
+    video_bitrate: str,
+    audio_bitrate: str,
+) -> None:
+    filters = [f"scale=-2:'min({max_height},ih)'"]
+    if fps > 0:
+        filters.append(f"fps={fps:g}")
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", video_path,
+        "-vf", ",".join(filters),
+        "-c:v", "libx264", "-preset", "veryfast",
+        "-b:v", video_bitrate, "-maxrate", video_bitrate, "-bufsize", video_bitrate,
+        "-c:a", "aac", "-b:a", audio_bitrate, "-ac", "1",
+        "-movflags", "+faststart",
+        output_path,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), TRANSCODE_TIMEOUT)
+    except BaseException:
+        # Timeout or cancellation: do not leave ffmpeg running
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with {process.returncode}: {stderr.decode()[-500:]}")
+
+
+def _transcode_opencv(video_path: str, output_path: str, max_height: int, fps: float) -> None:
+    """Re-encode frames with OpenCV (blocking, video only)."""
+    cap = cv2.VideoCapture(video_path)
+    writer = None
+    try:
+        if not cap.isOpened():
+            raise RuntimeError(f"Failed to open video file: {video_path}")
+        source_fps = cap.get(cv2.CAP_PROP_FPS)
+        if source_fps <= 0:
+            raise RuntimeError(f"Invalid FPS: {source_fps}")
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        out_fps = min(fps, source_fps) if fps > 0 else source_fps
+        if height > max_height:
+            # Even dimensions keep encoders happy
+            out_height = max_height - max_height % 2
+            out_width = int(width * out_height / height) // 2 * 2
+        else:
+            out_width, out_height = width, height
+
+        writer = cv2.VideoWriter(
+            output_path, cv2.VideoWriter_fourcc(*"mp4v"), out_fps, (out_width, out_height)
+        )
+        if not writer.isOpened():
+            raise RuntimeError("OpenCV could not open a video writer")
+
+        # Keep every frame whose timestamp crosses the next output tick
+        step = source_fps / out_fps
+        next_frame = 0.0
+        index = 0
+        while True:
+            ret = cap.grab()
+            if not ret:
+                break
+            if index >= next_frame:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                if (out_width, out_height) != (width, height):
+                    frame = cv2.resize(
+                        frame, (out_width, out_height), interpolation=cv2.INTER_AREA
+                    )
+                writer.write(frame)
+                next_frame += step
+            index += 1
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.release()
+
+
+async def transcode(
+    video_path: str,
+    output_path: str,
+    backend: str,
+    max_height: int = TRANSCODE_MAX_HEIGHT,
+    fps: float = TRANSCODE_FPS,
+    video_bitrate: str = TRANSCODE_VIDEO_BITRATE,
+    audio_bitrate: str = TRANSCODE_AUDIO_BITRATE,
+) -> None:
+    """Write a downscaled rendition of `video_path` to `output_path` with `backend`."""
+    if backend == "ffmpeg":
+        await _transcode_ffmpeg(
+            video_path, output_path, max_height, fps, video_bitrate, audio_bitrate
+        )
+    else:
+        await asyncio.wait_for(
+            asyncio.to_thread(_transcode_opencv, video_path, output_path, max_height, fps),
+            TRANSCODE_TIMEOUT,
+        )
+
+
+async def make_upload_proxy(video_path: str) -> str | None:
+    """
+    Build the upload proxy for `video_path` if transcoding is enabled.
+
+    Returns the proxy path, or None when the original should be uploaded as is
+    (disabled, no backend, transcode failed, or the proxy is not smaller).
+    The caller owns the returned file and must remove it.
+    """
+    if not TRANSCODE_ENABLED:
+        return None
+    backend = _select_backend()
+    if backend is None:
+        return None
+
+    output_path = proxy_path_for(video_path)
+    start = time.time()
+    try:
+        await transcode(video_path, output_path, backend)
+        original_size = os.path.getsize(video_path)
+        proxy_size = os.path.getsize(output_path)
+    except Exception as e:
+        transcode_metrics.failures += 1
+        logger.warning(f"Upload proxy for {video_path} failed ({backend}): {e}")
+        remove_proxy(output_path)
+        return None
+    except BaseException:
+        remove_proxy(output_path)
+        raise
+    elapsed = time.time() - start
+
+    if proxy_size == 0 or proxy_size >= original_size:
+        transcode_metrics.skipped += 1
+        remove_proxy(output_path)
+        return None
+
+    transcode_metrics.proxies += 1
+    transcode_metrics.by_backend[backend] = transcode_metrics.by_backend.get(backend, 0) + 1
+    transcode_metrics.bytes_in += original_size
+    transcode_metrics.bytes_out += proxy_size
+    transcode_metrics.seconds += elapsed
+    print(
+        f"DEBUG: [TIME] Upload proxy ({backend}) took {elapsed:.2f}s: "
+        f"{original_size} -> {proxy_size} bytes"
+    )
+    return output_path
+
+
+def remove_proxy(proxy_path: str | None) -> None:
+    """Delete a proxy file, ignoring a missing one."""
+    if proxy_path and os.path.exists(proxy_path):
+        os.remove(proxy_path)
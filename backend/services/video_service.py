@@ -1,10 +1,47 @@
 import os
 import cv2
+import time
 import base64
 import asyncio
-from typing import List, Dict
+from dataclasses import dataclass
+from typing import Callable, List, Dict, Optional
 from models.video import EnhancedReelAnalysis, Character
 
+
+@dataclass
+class VideoProbe:
+    """Container properties read from a local video file."""
+
+    duration: float
+    fps: float
+    frame_count: int
+    width: int
+    height: int
+
+
+def probe_video(video_path: str) -> Optional[VideoProbe]:
+    """Read duration, fps, frame count and size of a video (blocking)."""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return VideoProbe(
+            duration=frame_count / fps if fps > 0 else 0.0,
+            fps=fps,
+            frame_count=frame_count,
+            width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+    finally:
+        cap.release()
+
+
+async def probe_video_async(video_path: str) -> Optional[VideoProbe]:
+    """Probe a video in a worker thread so the event loop keeps serving requests."""
+    return await asyncio.to_thread(probe_video, video_path)
+
 def _generate_seismograph_arrays(
     emotion_timeline: List[Dict], duration: float
 ) -> Dict[str, List[float]]:
@@ -46,36 +83,41 @@ def _generate_seismograph_arrays(
     return seismograph
 
 
-async def _extract_character_frames(
-    analysis: EnhancedReelAnalysis, video_path: str
-) -> EnhancedReelAnalysis:
-    """Extract frame images for characters with timestamps from video (SEQUENTIAL)."""
-    if not analysis.characters or not os.path.exists(video_path):
-        return analysis
+def extract_frames(
+    video_path: str,
+    timestamps: List[float],
+    fps: Optional[float] = None,
+    on_frame: Optional[Callable[[float, str], None]] = None,
+) -> Dict[float, str]:
+    """
+    Decode one JPEG frame per timestamp (blocking); returns {timestamp: base64 JPEG}.
+
+    `fps` may come from an earlier probe to skip reading it again. `on_frame` is
+    called with each frame as soon as it is encoded (from the calling thread).
+    """
+    frames: Dict[float, str] = {}
+    if not timestamps or not os.path.exists(video_path):
+        return frames
 
     try:
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             print(f"Failed to open video file: {video_path}")
-            return analysis
+            return frames
 
-        vid_fps = cap.get(cv2.CAP_PROP_FPS)
+        vid_fps = fps or cap.get(cv2.CAP_PROP_FPS)
         if vid_fps <= 0:
             print(f"Invalid FPS: {vid_fps}")
             cap.release()
-            return analysis
+            return frames
 
         # SEQUENTIAL EXTRACTION (MUCH FASTER than random seeking)
-        import time
         extractions_start = time.time()
-        
-        # Sort characters by timestamp to minimize seeking overhead
-        chars_to_process = [c for c in analysis.characters if c.timestamp is not None]
-        chars_to_process.sort(key=lambda x: x.timestamp)
 
-        for char in chars_to_process:
+        # Sort by timestamp to minimize seeking overhead
+        for timestamp in sorted(set(timestamps)):
             try:
-                frame_num = int(char.timestamp * vid_fps)
+                frame_num = int(timestamp * vid_fps)
                 # Moving forward is generally faster than jumping around
                 cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
                 ret, frame = cap.read()
@@ -99,14 +141,40 @@ async def _extract_character_frames(
                 _, buffer = cv2.imencode(
                     ".jpg", frame_resized, [cv2.IMWRITE_JPEG_QUALITY, 85]
                 )
-                char.frame_image_b64 = base64.b64encode(buffer).decode("utf-8")
+                frames[timestamp] = base64.b64encode(buffer).decode("utf-8")
+                if on_frame is not None:
+                    on_frame(timestamp, frames[timestamp])
             except Exception as e:
-                print(f"Failed to extract frame for char at {char.timestamp}s: {e}")
+                print(f"Failed to extract frame for char at {timestamp}s: {e}")
 
         print(f"DEBUG: [TIME] Sequential extraction took {time.time() - extractions_start:.2f}s")
         cap.release()
-        return analysis
+        return frames
 
     except Exception as e:
         print(f"Failed to extract character frames: {e}")
+        return frames
+
+
+async def _extract_character_frames(
+    analysis: EnhancedReelAnalysis,
+    video_path: str,
+    frames: Optional[Dict[float, str]] = None,
+) -> EnhancedReelAnalysis:
+    """
+    Attach frame images to characters with timestamps.
+
+    Uses `frames` when they were decoded ahead of time (see `extract_frames`);
+    otherwise decodes them in a worker thread.
+    """
+    if not analysis.characters:
         return analysis
+
+    timestamps = [c.timestamp for c in analysis.characters if c.timestamp is not None]
+    if frames is None:
+        frames = await asyncio.to_thread(extract_frames, video_path, timestamps)
+
+    for char in analysis.characters:
+        if char.timestamp is not None and char.timestamp in frames:
+            char.frame_image_b64 = frames[char.timestamp]
+    return analysis
@@ -12,19 +12,74 @@ from pytubefix.exceptions import (
     AgeRestrictedError,
     VideoPrivate,
     MembersOnly,
+    VideoRemovedByUploader,
+    VideoRemovedByYouTubeForViolatingTOS,
+    AccountTerminated,
+    VideoRegionBlocked,
     RegexMatchError
 )
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
+import asyncio
 import logging
+import os
 from io import BytesIO
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of YouTube downloads running at once (each occupies one worker thread)
+YOUTUBE_MAX_CONCURRENT_DOWNLOADS = int(os.getenv("YOUTUBE_MAX_CONCURRENT_DOWNLOADS", "4"))
+
+
+class YouTubeVideoUnavailableError(ValueError):
+    """A video that can never be downloaded (private, members-only, invalid URL)."""
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+# pytubefix errors that mean the video itself can never be fetched. Other
+# VideoUnavailable subclasses (BotDetection, PoTokenRequired, LoginRequired,
+# LiveStreamOffline, ...) depend on the session or the moment and are retried.
+PERMANENT_YOUTUBE_ERRORS = (
+    (AgeRestrictedError, "age_restricted"),
+    (VideoPrivate, "private"),
+    (MembersOnly, "private"),
+    (VideoRemovedByUploader, "removed"),
+    (VideoRemovedByYouTubeForViolatingTOS, "removed"),
+    (AccountTerminated, "account_terminated"),
+    (VideoRegionBlocked, "region_blocked"),
+)
+
+
+def permanent_failure_reason(error: Exception) -> Optional[str]:
+    """Error class for download failures that retrying will not fix, else None."""
+    if isinstance(error, YouTubeVideoUnavailableError):
+        return error.reason
+    for error_type, reason in PERMANENT_YOUTUBE_ERRORS:
+        if isinstance(error, error_type):
+            return reason
+    return None
+
+
+def _remove_partial(output_path: str) -> None:
+    """Delete a download target that will not be used, ignoring a missing file."""
+    try:
+        os.remove(output_path)
+    except FileNotFoundError:
+        pass
+
 
 class YouTubeDownloader:
     """Service for downloading YouTube videos and Shorts."""
 
-    def __init__(self):
+    def __init__(self, max_concurrent_downloads: int = YOUTUBE_MAX_CONCURRENT_DOWNLOADS):
+        # Blocking pytubefix downloads run here, off the event loop; the pool size
+        # caps how many YouTube fetches run concurrently
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_downloads, thread_name_prefix="youtube-download"
+        )
         self.supported_domains = [
             'youtube.com',
             'www.youtube.com',
@@ -71,6 +126,9 @@ class YouTubeDownloader:
         """
         Download a YouTube video and return bytes with metadata.
 
+        Blocks the calling thread and holds the whole video in memory; async code
+        should use `download_video` instead.
+
         Args:
             url: YouTube video URL
             max_quality: Maximum resolution (e.g., "720p", "480p")
@@ -83,10 +141,80 @@ class YouTubeDownloader:
             VideoUnavailable: When video cannot be accessed
             AgeRestrictedError: For age-restricted content
         """
+        buffer = BytesIO()
+        filename, metadata = self._download(url, max_quality, buffer)
+        video_bytes = buffer.getvalue()
+        logger.info(f"Downloaded {len(video_bytes)} bytes at {metadata['resolution']}")
+        return video_bytes, filename, metadata
+
+    def download_video_to_path(
+        self,
+        url: str,
+        output_path: str,
+        max_quality: str = "720p"
+    ) -> dict:
+        """
+        Download a YouTube video straight to `output_path`, chunk by chunk.
+
+        Args:
+            url: YouTube video URL
+            output_path: File to write the video to
+            max_quality: Maximum resolution (e.g., "720p", "480p")
+
+        Returns:
+            Metadata dict (a partial file is removed on failure)
+
+        Raises:
+            Same as download_video_bytes
+        """
+        try:
+            with open(output_path, "wb") as f:
+                filename, metadata = self._download(url, max_quality, f)
+        except BaseException:
+            _remove_partial(output_path)
+            raise
+        metadata['filename'] = filename
+        logger.info(
+            f"Downloaded {os.path.getsize(output_path)} bytes at {metadata['resolution']} to {output_path}"
+        )
+        return metadata
+
+    async def download_video(
+        self,
+        url: str,
+        output_path: str,
+        max_quality: str = "720p"
+    ) -> tuple[str, dict]:
+        """
+        Download a YouTube video to `output_path` without blocking the event loop.
+
+        The download runs in the downloader's bounded executor, so at most
+        YOUTUBE_MAX_CONCURRENT_DOWNLOADS fetches run at once; others queue.
+
+        If the caller is cancelled mid-download, the worker thread cannot be
+        interrupted; the file it finishes writing is deleted when it is done.
+
+        Returns:
+            Tuple of (output_path, metadata_dict)
+        """
+        future = self.executor.submit(
+            self.download_video_to_path, url, output_path, max_quality
+        )
+        try:
+            metadata = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(lambda _: _remove_partial(output_path))
+            raise
+        return output_path, metadata
+
+    def _download(self, url: str, max_quality: str, buffer) -> tuple[str, dict]:
+        """Write the best progressive stream <= max_quality into `buffer`."""
         url = self.normalize_url(url)
 
         if not self.is_youtube_url(url):
-            raise ValueError(f"Invalid YouTube URL: {url}")
+            raise YouTubeVideoUnavailableError(
+                f"Invalid YouTube URL: {url}", reason="invalid_url"
+            )
 
         try:
             video = YouTube(url)
@@ -131,15 +259,11 @@ class YouTubeDownloader:
             metadata['fps'] = stream.fps if stream.fps else None
             metadata['file_size'] = stream.filesize_mb
 
-            # Download video to bytes
-            buffer = BytesIO()
+            # Stream the video into the buffer chunk by chunk
             stream.stream_to_buffer(buffer)
-            video_bytes = buffer.getvalue()
 
             filename = f"{video.title}.mp4".replace('/', '-').replace('\\', '-')
-
-            logger.info(f"Downloaded {len(video_bytes)} bytes at {stream.resolution}")
-            return video_bytes, filename, metadata
+            return filename, metadata
 
         except AgeRestrictedError:
             logger.error(f"Age-restricted video: {url}")
@@ -149,10 +273,14 @@ class YouTubeDownloader:
             raise
         except (VideoPrivate, MembersOnly):
             logger.error(f"Video is private or members-only: {url}")
-            raise ValueError("Video is private or requires membership")
+            raise YouTubeVideoUnavailableError(
+                "Video is private or requires membership", reason="private"
+            )
         except RegexMatchError:
             logger.error(f"Invalid YouTube URL format: {url}")
-            raise ValueError("Invalid YouTube URL format")
+            raise YouTubeVideoUnavailableError(
+                "Invalid YouTube URL format", reason="invalid_url"
+            )
         except Exception as e:
             logger.exception(f"Failed to download video: {url}")
             raise ValueError(f"Failed to download video: {str(e)}")
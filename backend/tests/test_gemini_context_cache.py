@@ -0,0 +1,195 @@
+"""Context caching in the fan-out reel pipeline, against a stub Gemini client."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+import routes.video
+from services import gemini_context_cache, gemini_files, pipeline
+from services.gemini_context_cache import GeminiContextCacheRegistry
+from services.gemini_files import GeminiFileRegistry
+from services.pipeline import PipelineContext
+
+RESPONSES = {
+    "TranscriptAnalysis": {
+        "transcript": "hello",
+        "main_summary": "summary",
+        "commentary_summary": "commentary",
+        "possible_issues": [],
+    },
+    "CharacterAnalysis": {"characters": [{"gender": "male", "timestamp": 1.0}]},
+    "BiasAnalysis": {
+        "overall_score": 10,
+        "risk_level": "Low Risk",
+        "categories": [
+            {"label": "a", "score": 10, "strength": "Low", "description": "d", "detected": True}
+        ],
+    },
+}
+
+
+class StubCaches:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.created = []
+        self.deleted = []
+
+    async def create(self, model=None, config=None):
+        if self.fail:
+            raise RuntimeError("400 INVALID_ARGUMENT: content is too small to cache")
+        self.created.append((model, config))
+        return SimpleNamespace(
+            name=f"cachedContents/{len(self.created)}",
+            expire_time=None,
+            usage_metadata=SimpleNamespace(total_token_count=5000),
+        )
+
+    async def update(self, name=None, config=None):
+        return SimpleNamespace(name=name, expire_time=None)
+
+    async def delete(self, name=None):
+        self.deleted.append(name)
+
+
+class StubModels:
+    def __init__(self):
+        self.calls = []
+
+    async def generate_content(self, model=None, contents=None, config=None):
+        schema_name = config.response_schema.__name__
+        self.calls.append((schema_name, config.cached_content, contents))
+        return SimpleNamespace(
+            text=json.dumps(RESPONSES[schema_name]), candidates=[], usage_metadata=None
+        )
+
+
+class StubFiles:
+    def __init__(self):
+        self.uploaded = SimpleNamespace(
+            name="files/video", state="ACTIVE", uri="files/video", mime_type="video/mp4",
+            expiration_time=None,
+        )
+
+    async def upload(self, file=None, **kwargs):
+        return self.uploaded
+
+    async def get(self, name=None, **kwargs):
+        return self.uploaded
+
+    async def delete(self, name=None, **kwargs):
+        pass
+
+
+class StubStageCache:
+    async def aget(self, key):
+        return None
+
+    async def aset(self, key, value):
+        pass
+
+
+def _stub_client(fail_create: bool = False):
+    return SimpleNamespace(
+        aio=SimpleNamespace(
+            caches=StubCaches(fail_create), models=StubModels(), files=StubFiles()
+        )
+    )
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / "video.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 10, (64, 48))
+    for i in range(20):
+        writer.write(np.full((48, 64, 3), i * 10, np.uint8))
+    writer.release()
+    return path
+
+
+def _install(monkeypatch, client):
+    monkeypatch.setattr(routes.video, "client", client)
+    monkeypatch.setattr(gemini_files, "_file_registry", GeminiFileRegistry(client))
+    monkeypatch.setattr(
+        gemini_context_cache, "_context_cache_registry", GeminiContextCacheRegistry(client)
+    )
+    monkeypatch.setattr(pipeline, "get_cache", StubStageCache)
+
+
+def _run_reel(video_path: str):
+    ctx = PipelineContext(
+        video_path, "stub-video-hash", "test", use_stage_cache=False, use_context_cache=True
+    )
+
+    async def run():
+        analysis = await routes.video.REEL_PIPELINE.run(ctx)
+        # Remote deletions run in background tasks
+        await asyncio.sleep(0)
+        return analysis
+
+    return asyncio.run(run())
+
+
+def _calls_by_schema(client) -> dict:
+    return {name: (cached, contents) for name, cached, contents in client.aio.models.calls}
+
+
+def test_transcript_and_characters_share_one_context_cache(monkeypatch, video):
+    client = _stub_client()
+    _install(monkeypatch, client)
+
+    analysis = _run_reel(video)
+
+    assert analysis.main_summary == "summary"
+    assert len(client.aio.caches.created) == 1
+    calls = _calls_by_schema(client)
+    transcript_cache, transcript_contents = calls["TranscriptAnalysis"]
+    characters_cache, characters_contents = calls["CharacterAnalysis"]
+    assert transcript_cache == characters_cache == "cachedContents/1"
+    # The cache carries the video; only the prompt is sent
+    assert isinstance(transcript_contents, str) and isinstance(characters_contents, str)
+    # Bias runs on another model and sends the video inline
+    assert calls["BiasAnalysis"][0] is None
+    # The run held the only reference, so the cache is deleted when it ends
+    assert client.aio.caches.deleted == ["cachedContents/1"]
+
+
+def test_cache_is_deleted_on_last_release(monkeypatch):
+    client = _stub_client()
+    registry = GeminiContextCacheRegistry(client)
+    myfile = client.aio.files.uploaded
+
+    async def run():
+        first = await registry.acquire("hash", myfile, "model")
+        second = await registry.acquire("hash", myfile, "model")
+        assert first is second
+        registry.release(first)
+        await asyncio.sleep(0)
+        deleted_after_first = list(client.aio.caches.deleted)
+        registry.release(second)
+        await asyncio.sleep(0)
+        return deleted_after_first
+
+    assert asyncio.run(run()) == []
+    assert len(client.aio.caches.created) == 1
+    assert client.aio.caches.deleted == ["cachedContents/1"]
+    assert registry.stats()["active"] == 0
+
+
+def test_falls_back_to_inline_video_when_create_fails(monkeypatch, video):
+    client = _stub_client(fail_create=True)
+    _install(monkeypatch, client)
+
+    analysis = _run_reel(video)
+
+    assert analysis.main_summary == "summary"
+    assert analysis.degraded_stages == []
+    calls = _calls_by_schema(client)
+    for schema_name in ("TranscriptAnalysis", "CharacterAnalysis"):
+        cached_content, contents = calls[schema_name]
+        assert cached_content is None
+        assert contents[0] is client.aio.files.uploaded
+    assert client.aio.caches.deleted == []
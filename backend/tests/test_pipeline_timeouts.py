@@ -0,0 +1,61 @@
+"""Stage timeouts in the pipeline engine, against a stub Gemini file registry."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services import pipeline
+from services.pipeline import Pipeline, PipelineContext, Stage, StageTimeoutError
+
+
+class SlowUploadRegistry:
+    """Hands out the video's Gemini file after `upload_seconds`."""
+
+    def __init__(self, upload_seconds: float):
+        self.upload_seconds = upload_seconds
+
+    async def run_with_file(self, video_hash, file_path, fn):
+        await asyncio.sleep(self.upload_seconds)
+        return await fn(SimpleNamespace(name="files/1"))
+
+
+def _gemini_stage(call_seconds: float, timeout: float = 0.2) -> Stage:
+    async def run(ctx, deps):
+        async def generate(myfile):
+            await asyncio.sleep(call_seconds)
+            return myfile.name
+
+        return await ctx.run_with_file(generate)
+
+    return Stage("gemini", run, timeout=timeout)
+
+
+def _run(monkeypatch, stage: Stage, upload_seconds: float, priority: str = "interactive"):
+    monkeypatch.setattr(
+        pipeline, "get_file_registry", lambda: SlowUploadRegistry(upload_seconds)
+    )
+    ctx = PipelineContext("video.mp4", "hash", "test", priority=priority)
+    return asyncio.run(Pipeline("test", [stage], "gemini").run(ctx))
+
+
+def test_upload_wait_is_not_counted_against_the_stage(monkeypatch):
+    assert _run(monkeypatch, _gemini_stage(call_seconds=0.1), upload_seconds=0.3) == "files/1"
+
+
+def test_stage_times_out_after_its_file_is_available(monkeypatch):
+    with pytest.raises(StageTimeoutError):
+        _run(monkeypatch, _gemini_stage(call_seconds=0.5), upload_seconds=0.3)
+
+
+def test_local_stage_times_out_without_a_file(monkeypatch):
+    async def run(ctx, deps):
+        await asyncio.sleep(0.5)
+
+    with pytest.raises(StageTimeoutError):
+        _run(monkeypatch, Stage("gemini", run, timeout=0.2), upload_seconds=0)
+
+
+def test_batch_runs_get_the_longer_budget(monkeypatch):
+    monkeypatch.setattr(pipeline, "PIPELINE_BATCH_STAGE_TIMEOUT", 1.0)
+    assert _run(monkeypatch, _gemini_stage(call_seconds=0.5), 0.3, priority="batch") == "files/1"
@@ -0,0 +1,53 @@
+"""Which YouTube download failures are negatively cached by the /youtube endpoint."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from pytubefix.exceptions import BotDetection, PoTokenRequired, VideoPrivate
+
+import routes.video
+from cache import NegativeCache
+from models.video import YouTubeAnalysisRequest
+from services.youtube_downloader import get_youtube_downloader
+
+URL = "https://www.youtube.com/watch?v=abc123"
+
+
+@pytest.fixture
+def negative(monkeypatch):
+    negative = NegativeCache()
+    monkeypatch.setattr(
+        routes.video, "get_cache", lambda: SimpleNamespace(negative=negative)
+    )
+    return negative
+
+
+def _analyze_twice(monkeypatch, error: Exception) -> list[str]:
+    """Request the URL twice with every download failing; return the downloads made."""
+    downloads = []
+
+    def fail(url, output_path, max_quality="720p"):
+        downloads.append(url)
+        raise error
+
+    monkeypatch.setattr(get_youtube_downloader(), "download_video_to_path", fail)
+    request = YouTubeAnalysisRequest(video_url=URL)
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            asyncio.run(routes.video.analyze_youtube(request))
+    return downloads
+
+
+@pytest.mark.parametrize(
+    "error", [BotDetection("abc123"), PoTokenRequired("abc123", "WEB")]
+)
+def test_session_errors_are_retried(monkeypatch, negative, error):
+    assert len(_analyze_twice(monkeypatch, error)) == 2
+    assert negative.entries == {}
+
+
+def test_private_video_is_negatively_cached(monkeypatch, negative):
+    assert len(_analyze_twice(monkeypatch, VideoPrivate("abc123"))) == 1
+    assert negative.stats()["hits_by_class"] == {"private": 1}
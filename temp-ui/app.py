@@ -1,5 +1,6 @@
 import streamlit as st
 import requests
+import json
 import time
 from datetime import datetime
 
@@ -22,6 +23,43 @@ st.set_page_config(
 
 API_BASE_URL = "http://localhost:8000"
 
+# Progress bar position and status message for each streamed analysis event
+STREAM_PROGRESS = {
+    "download": (20, "☁️ **Uploading video for analysis...**"),
+    "upload": (35, "🔍 **Analyzing video content with AI...**"),
+    "transcript": (55, "📝 **Transcript ready, waiting for characters and bias...**"),
+    "characters": (70, "👥 **Characters identified...**"),
+    "bias": (85, "⚖️ **Bias analysis ready...**"),
+    "frame": (90, "🖼️ **Extracting character frames...**"),
+}
+
+
+def stream_analysis(url, payload, status_container, progress_bar, timeout=180):
+    """
+    POST to a streaming analysis endpoint, moving the progress bar as stages finish.
+
+    Returns (status_code, body) where body is the final analysis or an error dict.
+    """
+    with requests.post(url, json=payload, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            return response.status_code, response.json()
+
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "done":
+                    return 200, data
+                if event == "error":
+                    return data.get("status_code", 500), data
+                if event in STREAM_PROGRESS:
+                    percent, message = STREAM_PROGRESS[event]
+                    progress_bar.progress(percent)
+                    status_container.info(message)
+    return 500, {"detail": "Analysis stream ended unexpectedly"}
+
 # ==================== SIDEBAR: Recent Reels ====================
 with st.sidebar:
     st.header("📚 Recent Reels")
@@ -125,23 +163,18 @@ with tab1:
             try:
                 # Status: Downloading
                 status_container.info("⬇️ **Downloading reel from Instagram...**")
-                progress_bar.progress(20)
-                time.sleep(0.5)  # Brief pause for UI feedback
-                
-                # Status: Analyzing
-                status_container.info("🔍 **Analyzing video content with AI...**")
-                progress_bar.progress(50)
+                progress_bar.progress(5)
                 
-                # Make API request
-                response = requests.post(
-                    f"{API_BASE_URL}/analyze-video/reel",
-                    json={"post_url": reel_url},
-                    timeout=180  # 3 minute timeout for long videos
+                # Stream the analysis so progress follows the server's stages
+                status_code, result = stream_analysis(
+                    f"{API_BASE_URL}/analyze-video/reel/stream",
+                    {"post_url": reel_url},
+                    status_container,
+                    progress_bar,
+                    timeout=180  # 3 minutes without any event (the server sends keep-alives)
                 )
                 
-                progress_bar.progress(90)
-                
-                if response.status_code == 200:
+                if status_code == 200:
                     status_container.success("✅ **Analysis complete!**")
                     progress_bar.progress(100)
                     time.sleep(0.5)
@@ -165,8 +198,6 @@ with tab1:
                     # Clear status elements
                     status_container.empty()
                     progress_bar.empty()
-                    
-                    result = response.json()
 
                     st.divider()
 
@@ -412,7 +443,7 @@ with tab1:
                 else:
                     status_container.empty()
                     progress_bar.empty()
-                    error_detail = response.json().get('detail', 'Unknown error')
+                    error_detail = result.get('detail', 'Unknown error')
                     st.error(f"❌ Error: {error_detail}")
             
             except requests.exceptions.Timeout: